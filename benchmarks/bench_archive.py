@@ -0,0 +1,270 @@
+# ##### BEGIN GPL LICENSE BLOCK #####
+#
+# Part of the Blib package.
+# Blib benchmarks: Microbenchmarks of the archive layer.
+# Copyright (C) 2016  Luca Rood
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+
+# You should have received a copy of the GNU General Public License
+# along with this program.  If not, see <http://www.gnu.org/licenses/>.
+#
+# ##### END GPL LICENSE BLOCK #####
+
+"""
+Time the archive primitives of 'blib.utils' on generated corpora, and compare the results to a saved baseline.
+
+Corpora:
+    "small": Many small, compressible files.
+    "large": Few large files, half compressible.
+    "duplicates": Many files sharing few distinct contents, so most entries are links.
+
+Save a baseline, then check a change against it (exits with status 1 if any primitive got slower than the threshold):
+    python benchmarks/bench_archive.py --save baseline.json
+    python benchmarks/bench_archive.py --compare baseline.json --threshold 0.1
+
+Baselines are only meaningful on the same machine and Python version.
+"""
+
+import argparse
+import json
+import platform
+import random
+import sys
+import tempfile
+import zipfile as zf
+from os import path, makedirs
+from shutil import rmtree
+from time import perf_counter
+
+sys.path.insert(0, path.dirname(path.dirname(path.abspath(__file__))))
+
+from blib.utils import write, extract, files_equal, gen_crc, archive_sha1, get_path
+
+def random_data(rng, size, compressible=True):
+    """
+    Generate data of the given size.
+    
+    Args:
+        rng (random.Random): Random generator.
+        size (int): Size in bytes.
+        compressible (bool): Half of the data is repeated text if True, otherwise all of it is random.
+    
+    Returns:
+        bytes
+    """
+    
+    if compressible:
+        noise = size // 2
+        text = b"Blib benchmark corpus " * (((size - noise) // 22) + 1)
+        return rng.getrandbits(noise * 8).to_bytes(noise, "little") + text[:size - noise]
+    return rng.getrandbits(size * 8).to_bytes(size, "little")
+
+def make_corpus(name, directory, scale=1.0, seed=0):
+    """
+    Write the files of a corpus.
+    
+    Args:
+        name (str): "small", "large" or "duplicates".
+        directory (str): Directory in which to write the files.
+        scale (float): Factor applied to the number of files (small and duplicates) or to their size (large).
+        seed (int): Seed of the generated data.
+    
+    Returns:
+        list[str]: Paths of the files.
+    """
+    
+    rng = random.Random(seed)
+    makedirs(directory)
+    if name == "small":
+        contents = (random_data(rng, rng.randrange(1024, 4096)) for _ in range(max(1, int(2000 * scale))))
+    elif name == "large":
+        size = max(1, int(16 * 1048576 * scale))
+        contents = (random_data(rng, size) for _ in range(3))
+    elif name == "duplicates":
+        unique = [random_data(rng, 8192) for _ in range(20)]
+        contents = (rng.choice(unique) for _ in range(max(1, int(1000 * scale))))
+    else:
+        raise ValueError("unknown corpus '{}'".format(name))
+    
+    files = []
+    for i, data in enumerate(contents):
+        fpath = path.join(directory, "file{:05d}.bin".format(i))
+        out_file = open(fpath, 'wb')
+        out_file.write(data)
+        out_file.close()
+        files.append(fpath)
+    return files
+
+def measure(function, repeat, setup=None):
+    """
+    Time a function several times.
+    
+    Args:
+        function (function): Function to be timed, called with the value returned by 'setup'.
+        repeat (int): Number of runs.
+        setup (function or None): Function called before each run, outside of the timing.
+    
+    Returns:
+        dict: "min" and "mean" times, in milliseconds.
+    """
+    
+    times = []
+    for i in range(repeat):
+        arg = setup(i) if setup is not None else None
+        start = perf_counter()
+        function(arg)
+        times.append(perf_counter() - start)
+    return {"min": min(times) * 1000, "mean": sum(times) * 1000 / len(times)}
+
+def run_corpus(name, directory, repeat, scale):
+    """
+    Time all primitives on a corpus.
+    
+    Args:
+        name (str): Name of the corpus.
+        directory (str): Directory for the generated files.
+        repeat (int): Number of runs per primitive.
+        scale (float): Scale of the corpus (see 'make_corpus').
+    
+    Returns:
+        dict: Timings per primitive.
+    """
+    
+    files = make_corpus(name, path.join(directory, name), scale)
+    filepath = path.join(directory, name + ".blib")
+    results = {}
+    
+    def write_all(archive):
+        crcs = {}
+        for fpath in files:
+            write(archive, fpath, "data/" + path.basename(fpath), crcs)
+        archive.close()
+    
+    results["write"] = measure(write_all, repeat, lambda i: zf.ZipFile(filepath, 'w', zf.ZIP_DEFLATED))
+    
+    archive = zf.ZipFile(filepath, 'r')
+    names = archive.namelist()
+    
+    def resolve_all(arg):
+        for item in names:
+            get_path(archive, item)
+    
+    def extract_all(target):
+        for item in names:
+            extract(archive, item, target)
+    
+    def extract_dir(i):
+        target = path.join(directory, "{}_extract_{}".format(name, i))
+        makedirs(target)
+        return target
+    
+    def compare_all(arg):
+        for fpath in files:
+            file1 = open(fpath, 'rb')
+            file2 = open(fpath, 'rb')
+            files_equal(file1, file2)
+            file1.close()
+            file2.close()
+    
+    def crc_all(arg):
+        for fpath in files:
+            gen_crc(fpath)
+    
+    results["get_path"] = measure(resolve_all, repeat)
+    results["archive_sha1"] = measure(lambda arg: archive_sha1(archive), repeat)
+    results["extract"] = measure(extract_all, repeat, extract_dir)
+    results["files_equal"] = measure(compare_all, repeat)
+    results["gen_crc"] = measure(crc_all, repeat)
+    archive.close()
+    return results
+
+def compare(results, baseline, threshold, min_delta=1.0):
+    """
+    Find the primitives that got slower than a baseline.
+    
+    Args:
+        results (dict): Current results.
+        baseline (dict): Saved results.
+        threshold (float): Allowed relative slowdown (e.g. 0.1 for 10%).
+        min_delta (float): Allowed absolute slowdown in milliseconds, so that timing noise on very fast primitives is ignored.
+    
+    Returns:
+        list[str]: Descriptions of the regressions.
+    """
+    
+    regressions = []
+    for corpus, timings in results["corpora"].items():
+        for primitive, timing in timings.items():
+            try:
+                base = baseline["corpora"][corpus][primitive]["min"]
+            except KeyError:
+                continue
+            if timing["min"] > base * (1 + threshold) and timing["min"] - base > min_delta:
+                regressions.append("{} on {}: {:.2f} ms, baseline {:.2f} ms (+{:.0%})".format(
+                    primitive, corpus, timing["min"], base, timing["min"] / base - 1 if base > 0 else float("inf")))
+    return regressions
+
+def main(argv):
+    parser = argparse.ArgumentParser(description="Time the archive primitives of blib.utils.")
+    parser.add_argument("--corpora", nargs="+", default=["small", "large", "duplicates"], help="Corpora to run")
+    parser.add_argument("--scale", type=float, default=1.0, help="Corpus scale factor")
+    parser.add_argument("--repeat", type=int, default=5, help="Timed runs per primitive")
+    parser.add_argument("--output", help="Path of the JSON results, printed if omitted")
+    parser.add_argument("--save", help="Save the results as baseline to this path")
+    parser.add_argument("--compare", help="Compare the results to the baseline at this path")
+    parser.add_argument("--threshold", type=float, default=0.1, help="Allowed relative slowdown when comparing")
+    parser.add_argument("--min-delta", type=float, default=1.0, help="Allowed absolute slowdown in milliseconds")
+    args = parser.parse_args(argv)
+    
+    results = {
+        "python": platform.python_version(),
+        "platform": platform.platform(),
+        "scale": args.scale,
+        "repeat": args.repeat,
+        "corpora": {},
+    }
+    
+    directory = tempfile.mkdtemp(prefix="blib_bench_")
+    try:
+        for name in args.corpora:
+            results["corpora"][name] = run_corpus(name, directory, args.repeat, args.scale)
+    finally:
+        rmtree(directory)
+    
+    output = json.dumps(results, indent=2, sort_keys=True)
+    if args.output is None:
+        print(output)
+    else:
+        out_file = open(args.output, 'w', encoding="utf-8")
+        out_file.write(output + "\n")
+        out_file.close()
+    
+    if args.save is not None:
+        out_file = open(args.save, 'w', encoding="utf-8")
+        out_file.write(output + "\n")
+        out_file.close()
+    
+    if args.compare is not None:
+        base_file = open(args.compare, 'r', encoding="utf-8")
+        baseline = json.load(base_file)
+        base_file.close()
+        if (baseline.get("python"), baseline.get("scale")) != (results["python"], results["scale"]):
+            print("Warning: baseline was measured with a different Python version or scale", file=sys.stderr)
+        regressions = compare(results, baseline, args.threshold, args.min_delta)
+        for regression in regressions:
+            print("Regression: " + regression, file=sys.stderr)
+        if regressions:
+            return 1
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main(sys.argv[1:]))
@@ -0,0 +1,173 @@
+# ##### BEGIN GPL LICENSE BLOCK #####
+#
+# Part of the Blib package.
+# Blib benchmarks: End-to-end timing of the cycles subpackage.
+# Copyright (C) 2016  Luca Rood
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+
+# You should have received a copy of the GNU General Public License
+# along with this program.  If not, see <http://www.gnu.org/licenses/>.
+#
+# ##### END GPL LICENSE BLOCK #####
+
+"""
+Time 'generate_xml', 'bexport' and 'bimport' on synthetic materials, and write the results as JSON.
+
+Outside Blender, the stand-in bpy module from "benchmarks/stubs" is used:
+    python benchmarks/bench_cycles.py [--output results.json]
+
+From Blender, the real bpy module is used:
+    blender -b -P benchmarks/bench_cycles.py -- [--output results.json]
+
+Without case options, a predefined suite of cases is run, otherwise a single case with the given options.
+"""
+
+import argparse
+import json
+import platform
+import sys
+import tempfile
+from os import path
+from shutil import rmtree
+from time import perf_counter
+
+bench_dir = path.dirname(path.abspath(__file__))
+sys.path.insert(0, path.dirname(bench_dir))
+sys.path.insert(0, bench_dir)
+
+try:
+    import bpy
+    stub = False
+except ImportError:
+    sys.path.insert(0, path.join(bench_dir, "stubs"))
+    import bpy
+    stub = True
+
+from blib.cycles import bexport, bimport, generate_xml
+from blib.cycles.version import version
+from blib.stats import Stats
+from synthetic import make_material
+
+suite = [
+    {"name": "small", "nodes": 10, "depth": 0, "images": 1, "frames": 0},
+    {"name": "medium", "nodes": 50, "depth": 1, "images": 4, "frames": 10},
+    {"name": "large", "nodes": 200, "depth": 3, "images": 16, "frames": 50},
+]
+
+def timings(times):
+    """
+    Summarize repeated measurements.
+    
+    Args:
+        times (list[float]): Measured times, in seconds.
+    
+    Returns:
+        dict: "min", "mean" and "max" times, in milliseconds.
+    """
+    
+    return {
+        "min": min(times) * 1000,
+        "mean": sum(times) * 1000 / len(times),
+        "max": max(times) * 1000,
+    }
+
+def run_case(case, repeat, directory):
+    """
+    Time the export and import of a synthetic material.
+    
+    Args:
+        case (dict): Name and 'benchmarks.synthetic.make_material' options of the case.
+        repeat (int): Number of times each function is timed.
+        directory (str): Directory for the generated files.
+    
+    Returns:
+        dict: The case, with the timings of each function, the phases of the last export and import, and the file size.
+    """
+    
+    options = {key: val for key, val in case.items() if key != "name"}
+    mat = make_material(directory, case["name"], **options)
+    filepath = path.join(directory, case["name"] + ".blib")
+    result = dict(case)
+    
+    times = []
+    for i in range(repeat):
+        start = perf_counter()
+        generate_xml(mat, blib=True)
+        times.append(perf_counter() - start)
+    result["generate_xml"] = timings(times)
+    
+    times = []
+    for i in range(repeat):
+        export_stats = Stats()
+        start = perf_counter()
+        bexport(mat, filepath, stats=export_stats)
+        times.append(perf_counter() - start)
+    result["bexport"] = timings(times)
+    result["export_stats"] = export_stats.as_dict()
+    result["file_size"] = path.getsize(filepath)
+    
+    times = []
+    for i in range(repeat):
+        import_stats = Stats()
+        resource_path = path.join(directory, "resources_{}_{}".format(case["name"], i))
+        start = perf_counter()
+        bimport(filepath, resource_path, plan_cache=False, stats=import_stats)
+        times.append(perf_counter() - start)
+    result["bimport"] = timings(times)
+    result["import_stats"] = import_stats.as_dict()
+    
+    return result
+
+def main(argv):
+    parser = argparse.ArgumentParser(description="Time the cycles subpackage on synthetic materials.")
+    parser.add_argument("--nodes", type=int, help="Generated nodes per node tree")
+    parser.add_argument("--depth", type=int, help="Node group nesting depth")
+    parser.add_argument("--images", type=int, help="Number of images")
+    parser.add_argument("--frames", type=int, help="Image sequence length")
+    parser.add_argument("--repeat", type=int, default=5, help="Timed runs per function")
+    parser.add_argument("--output", help="Path of the JSON results, printed if omitted")
+    args = parser.parse_args(argv)
+    
+    options = {key: getattr(args, key) for key in ("nodes", "depth", "images", "frames")}
+    if all(val is None for val in options.values()):
+        cases = suite
+    else:
+        case = {"name": "custom", "nodes": 20, "depth": 0, "images": 1, "frames": 0}
+        case.update((key, val) for key, val in options.items() if val is not None)
+        cases = [case]
+    
+    results = {
+        "blib": str(version),
+        "python": platform.python_version(),
+        "blender": ".".join(str(v) for v in bpy.app.version),
+        "stub": stub,
+        "repeat": args.repeat,
+        "cases": [],
+    }
+    
+    directory = tempfile.mkdtemp(prefix="blib_bench_")
+    try:
+        for case in cases:
+            results["cases"].append(run_case(case, args.repeat, directory))
+    finally:
+        rmtree(directory)
+    
+    output = json.dumps(results, indent=2, sort_keys=True)
+    if args.output is None:
+        print(output)
+    else:
+        out_file = open(args.output, 'w', encoding="utf-8")
+        out_file.write(output + "\n")
+        out_file.close()
+
+if __name__ == "__main__":
+    main(sys.argv[sys.argv.index("--") + 1:] if "--" in sys.argv else sys.argv[1:])
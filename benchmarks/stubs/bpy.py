@@ -0,0 +1,858 @@
+# ##### BEGIN GPL LICENSE BLOCK #####
+#
+# Part of the Blib package.
+# Blib benchmarks: Stand-in for Blender's bpy module.
+# Copyright (C) 2016  Luca Rood
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+
+# You should have received a copy of the GNU General Public License
+# along with this program.  If not, see <http://www.gnu.org/licenses/>.
+#
+# ##### END GPL LICENSE BLOCK #####
+
+"""
+Minimal stand-in for Blender's bpy module, so that the cycles subpackage can be run outside Blender.
+
+Only the parts of the API used by Blib are implemented, after Blender 2.79 (group interfaces in
+'NodeTree.inputs' and 'NodeTree.outputs'), with a small set of shader node types. Properties are
+type checked and floats rounded to single precision like in Blender, but nothing is rendered or drawn,
+so timings measured with it only reflect the cost of Blib itself.
+
+'reset' drops all datablocks, as if a new .blend file had been loaded.
+"""
+
+import os
+import struct
+import types as _pytypes
+
+def _f32(val):
+    """Round to single precision, as Blender stores float properties."""
+    return struct.unpack("<f", struct.pack("<f", float(val)))[0]
+
+_BLEND_DIR = os.getcwd()
+
+class bpy_prop_array(list):
+    """List standing in for bpy_prop_array (reported as a builtin type, like the real one)."""
+    pass
+
+bpy_prop_array.__module__ = "builtins"
+
+class Vector(list):
+    pass
+
+Vector.__module__ = "mathutils"
+
+def _rw(name, conv=None):
+    def fget(self):
+        return self._d[name]
+    def fset(self, val):
+        if conv is not None:
+            try:
+                val = conv(val)
+            except (TypeError, ValueError):
+                raise TypeError("bpy_struct: item.attr = val: {} expected".format(name))
+        self._d[name] = val
+    return property(fget, fset)
+
+def _ro(name):
+    return property(lambda self: self._d[name])
+
+def _array(size):
+    def conv(val):
+        val = [_f32(v) for v in val]
+        if len(val) != size:
+            raise ValueError("sequence length mismatch")
+        return bpy_prop_array(val)
+    return conv
+
+def _bool(val):
+    if not isinstance(val, (bool, int)):
+        raise TypeError("bool expected")
+    return bool(val)
+
+def _float(val):
+    if isinstance(val, str):
+        raise TypeError("float expected")
+    return _f32(val)
+
+def _int(val):
+    if isinstance(val, (str, float)):
+        raise TypeError("int expected")
+    return int(val)
+
+def _str(val):
+    if not isinstance(val, str):
+        raise TypeError("str expected")
+    return val
+
+def _enum(items):
+    def conv(val):
+        if val not in items:
+            raise TypeError("enum '{}' not found in {}".format(val, sorted(items)))
+        return val
+    return conv
+
+class _Prop(object):
+    def __init__(self, ptype):
+        self.type = ptype
+
+class _RNA(object):
+    def __init__(self, properties):
+        self.properties = properties
+
+class bpy_struct(object):
+    __slots__ = ("_d",)
+    _enums = ()
+    
+    def __init__(self, **values):
+        object.__setattr__(self, "_d", dict(values))
+    
+    def __dir__(self):
+        return [n for n in object.__dir__(self) if not n.startswith("_") or n.startswith("__")]
+    
+    @property
+    def bl_rna(self):
+        return _RNA({name: _Prop('ENUM') for name in self._enums})
+
+class ID(bpy_struct):
+    __slots__ = ()
+    name = _rw("name", _str)
+    users = property(lambda self: 1)
+    
+    def __getitem__(self, key):
+        return self._d.setdefault("_idprops", {})[key]
+    
+    def __setitem__(self, key, val):
+        self._d.setdefault("_idprops", {})[key] = val
+    
+    def __contains__(self, key):
+        return key in self._d.setdefault("_idprops", {})
+    
+    def get(self, key, default=None):
+        return self._d.setdefault("_idprops", {}).get(key, default)
+
+class _Collection(object):
+    def __init__(self, items=None):
+        self._items = list(items) if items else []
+    
+    def __iter__(self):
+        return iter(list(self._items))
+    
+    def __len__(self):
+        return len(self._items)
+    
+    def __getitem__(self, key):
+        if isinstance(key, str):
+            for item in self._items:
+                if item.name == key:
+                    return item
+            raise KeyError(key)
+        return self._items[key]
+    
+    def __contains__(self, item):
+        if isinstance(item, str):
+            return any(i.name == item for i in self._items)
+        return item in self._items
+    
+    def get(self, key, default=None):
+        try:
+            return self[key]
+        except KeyError:
+            return default
+    
+    def _unique(self, name):
+        names = {item.name for item in self._items}
+        if name not in names:
+            return name
+        i = 1
+        while "{}.{:03d}".format(name, i) in names:
+            i += 1
+        return "{}.{:03d}".format(name, i)
+
+#Sockets
+
+_SOCKET_IDNAMES = {
+    'VALUE': "NodeSocketFloat",
+    'INT': "NodeSocketInt",
+    'BOOLEAN': "NodeSocketBool",
+    'VECTOR': "NodeSocketVector",
+    'STRING': "NodeSocketString",
+    'RGBA': "NodeSocketColor",
+    'SHADER': "NodeSocketShader",
+}
+_SOCKET_TYPES = {v: k for k, v in _SOCKET_IDNAMES.items()}
+
+def _default_for(stype):
+    if stype == 'VALUE':
+        return 0.0
+    if stype == 'INT':
+        return 0
+    if stype == 'BOOLEAN':
+        return False
+    if stype == 'VECTOR':
+        return _array(3)([0.0, 0.0, 0.0])
+    if stype == 'RGBA':
+        return _array(4)([0.8, 0.8, 0.8, 1.0])
+    if stype == 'STRING':
+        return ""
+    return None
+
+def _value_conv(stype):
+    return {
+        'VALUE': _float,
+        'INT': _int,
+        'BOOLEAN': _bool,
+        'VECTOR': _array(3),
+        'RGBA': _array(4),
+        'STRING': _str,
+    }.get(stype)
+
+class NodeSocket(bpy_struct):
+    __slots__ = ()
+    name = _rw("name", _str)
+    identifier = _ro("identifier")
+    hide = _rw("hide", _bool)
+    hide_value = _rw("hide_value", _bool)
+    enabled = _ro("enabled")
+    link_limit = _rw("link_limit", _int)
+    show_expanded = _rw("show_expanded", _bool)
+    is_output = _ro("is_output")
+    bl_idname = _ro("bl_idname")
+    node = _ro("node")
+    
+    def __init__(self, node, name, stype, is_output, identifier=None, default=None):
+        bpy_struct.__init__(self, name=name, identifier=identifier or name, hide=False,
+                            hide_value=False, enabled=True, link_limit=1 if not is_output else 4095,
+                            show_expanded=False, is_output=is_output, node=node,
+                            bl_idname=_SOCKET_IDNAMES.get(stype, "NodeSocketVirtual"), type=stype)
+        if stype not in {'SHADER', 'CUSTOM'}:
+            self._d["default_value"] = _default_for(stype) if default is None else default
+    
+    @property
+    def type(self):
+        return self._d["type"]
+    
+    @type.setter
+    def type(self, val):
+        self._d["type"] = _enum(set(_SOCKET_IDNAMES))(val)
+    
+    def __dir__(self):
+        names = [n for n in bpy_struct.__dir__(self) if n != "default_value"]
+        if "default_value" in self._d:
+            names.append("default_value")
+        return names
+    
+    @property
+    def default_value(self):
+        try:
+            return self._d["default_value"]
+        except KeyError:
+            raise AttributeError("'NodeSocket' object has no attribute 'default_value'")
+    
+    @default_value.setter
+    def default_value(self, val):
+        if "default_value" not in self._d:
+            raise AttributeError("'NodeSocket' object has no attribute 'default_value'")
+        self._d["default_value"] = _value_conv(self._d["type"])(val)
+    
+    @property
+    def is_linked(self):
+        tree = self.node.id_data
+        return any(l.to_socket is self or l.from_socket is self for l in tree.links)
+
+class NodeSocketInterface(bpy_struct):
+    __slots__ = ()
+    name = _rw("name", _str)
+    identifier = _ro("identifier")
+    type = _ro("type")
+    bl_socket_idname = _ro("bl_socket_idname")
+    
+    def __init__(self, name, stype, identifier):
+        bpy_struct.__init__(self, name=name, type=stype, identifier=identifier,
+                            bl_socket_idname=_SOCKET_IDNAMES[stype])
+
+class _SocketList(_Collection):
+    pass
+
+class NodeTreeInterface(_Collection):
+    """Group interface (tree.inputs / tree.outputs)."""
+    
+    def __init__(self, tree, is_output):
+        _Collection.__init__(self)
+        self._tree = tree
+        self._is_output = is_output
+    
+    def new(self, type, name):
+        stype = _SOCKET_TYPES.get(type)
+        if stype is None:
+            raise TypeError("unknown socket type '{}'".format(type))
+        self._tree._socket_uid += 1
+        sock = NodeSocketInterface(name, stype, "Socket_{}".format(self._tree._socket_uid))
+        self._items.append(sock)
+        return sock
+    
+    def remove(self, sock):
+        self._items.remove(sock)
+    
+    def clear(self):
+        del self._items[:]
+
+#Curves and ramps
+
+class CurveMapPoint(bpy_struct):
+    __slots__ = ()
+    location = _rw("location", _array(2))
+    handle_type = _rw("handle_type", _enum({'AUTO', 'AUTO_CLAMPED', 'VECTOR'}))
+    select = _rw("select", _bool)
+
+class _Points(_Collection):
+    def new(self, position, value):
+        point = CurveMapPoint(location=_array(2)([position, value]),
+                              handle_type='AUTO', select=False)
+        self._items.append(point)
+        self._items.sort(key=lambda p: p.location[0])
+        return point
+
+class CurveMap(bpy_struct):
+    __slots__ = ()
+    points = _ro("points")
+    extend = _ro("extend")
+
+class CurveMapping(bpy_struct):
+    __slots__ = ()
+    curves = _ro("curves")
+    use_clip = _rw("use_clip", _bool)
+    clip_min_x = _rw("clip_min_x", _float)
+    
+    def update(self):
+        pass
+
+def _curve_mapping(count):
+    curves = []
+    for i in range(count):
+        points = _Points()
+        points.new(0.0, 0.0)
+        points.new(1.0, 1.0)
+        curves.append(CurveMap(points=points, extend='EXTRAPOLATED'))
+    return CurveMapping(curves=curves, use_clip=True, clip_min_x=0.0)
+
+class ColorRampElement(bpy_struct):
+    __slots__ = ()
+    position = _rw("position", _float)
+    color = _rw("color", _array(4))
+    alpha = _rw("alpha", _float)
+
+class _Elements(_Collection):
+    def new(self, position):
+        elem = ColorRampElement(position=_f32(position), color=_array(4)([0.0, 0.0, 0.0, 1.0]), alpha=1.0)
+        self._items.append(elem)
+        self._items.sort(key=lambda e: e.position)
+        return elem
+    
+    def remove(self, elem):
+        self._items.remove(elem)
+
+class ColorRamp(bpy_struct):
+    __slots__ = ()
+    _enums = ("interpolation", "color_mode", "hue_interpolation")
+    elements = _ro("elements")
+    interpolation = _rw("interpolation", _enum({'EASE', 'CARDINAL', 'LINEAR', 'B_SPLINE', 'CONSTANT'}))
+    color_mode = _rw("color_mode", _enum({'RGB', 'HSV', 'HSL'}))
+    hue_interpolation = _rw("hue_interpolation", _enum({'NEAR', 'FAR', 'CW', 'CCW'}))
+
+def _color_ramp():
+    elements = _Elements()
+    black = elements.new(0.0)
+    white = elements.new(1.0)
+    white.color = [1.0, 1.0, 1.0, 1.0]
+    return ColorRamp(elements=elements, interpolation='LINEAR', color_mode='RGB', hue_interpolation='NEAR')
+
+class ImageUser(bpy_struct):
+    __slots__ = ()
+    frame_duration = _rw("frame_duration", _int)
+    frame_offset = _rw("frame_offset", _int)
+    frame_start = _rw("frame_start", _int)
+    use_auto_refresh = _rw("use_auto_refresh", _bool)
+    use_cyclic = _rw("use_cyclic", _bool)
+    fields_per_frame = _rw("fields_per_frame", _int)
+    frame_current = _ro("frame_current")
+
+#Nodes
+
+V, I, B, C, S, SH, VEC = 'VALUE', 'INT', 'BOOLEAN', 'RGBA', 'STRING', 'SHADER', 'VECTOR'
+
+_NODE_SPECS = {
+    # bl_idname: (type, label, inputs, outputs, {prop: (default, conv)})
+    "ShaderNodeOutputMaterial": ('OUTPUT_MATERIAL', "Material Output",
+                                 [("Surface", SH), ("Volume", SH), ("Displacement", V)], [],
+                                 {"is_active_output": (True, _bool)}),
+    "ShaderNodeBsdfDiffuse": ('BSDF_DIFFUSE', "Diffuse BSDF",
+                              [("Color", C), ("Roughness", V), ("Normal", VEC)], [("BSDF", SH)], {}),
+    "ShaderNodeBsdfGlossy": ('BSDF_GLOSSY', "Glossy BSDF",
+                             [("Color", C), ("Roughness", V), ("Normal", VEC)], [("BSDF", SH)],
+                             {"distribution": ('GGX', _enum({'SHARP', 'BECKMANN', 'GGX', 'ASHIKHMIN_SHIRLEY'}))}),
+    "ShaderNodeMixShader": ('MIX_SHADER', "Mix Shader",
+                            [("Fac", V), ("Shader", SH), ("Shader", SH)], [("Shader", SH)], {}),
+    "ShaderNodeMixRGB": ('MIX_RGB', "Mix",
+                         [("Fac", V), ("Color1", C), ("Color2", C)], [("Color", C)],
+                         {"blend_type": ('MIX', _enum({'MIX', 'ADD', 'MULTIPLY', 'SUBTRACT', 'SCREEN', 'OVERLAY'})),
+                          "use_clamp": (False, _bool)}),
+    "ShaderNodeMath": ('MATH', "Math", [("Value", V), ("Value", V)], [("Value", V)],
+                       {"operation": ('ADD', _enum({'ADD', 'SUBTRACT', 'MULTIPLY', 'DIVIDE', 'POWER'})),
+                        "use_clamp": (False, _bool)}),
+    "ShaderNodeTexNoise": ('TEX_NOISE', "Noise Texture",
+                           [("Vector", VEC), ("Scale", V), ("Detail", V), ("Distortion", V)],
+                           [("Color", C), ("Fac", V)], {}),
+    "ShaderNodeTexCoord": ('TEX_COORD', "Texture Coordinate", [],
+                           [("Generated", VEC), ("Normal", VEC), ("UV", VEC), ("Object", VEC)],
+                           {"from_dupli": (False, _bool)}),
+    "ShaderNodeRGBCurve": ('CURVE_RGB', "RGB Curves", [("Fac", V), ("Color", C)], [("Color", C)], {}),
+    "ShaderNodeVectorCurve": ('CURVE_VEC', "Vector Curves", [("Fac", V), ("Vector", VEC)], [("Vector", VEC)], {}),
+    "ShaderNodeValToRGB": ('VALTORGB', "ColorRamp", [("Fac", V)], [("Color", C), ("Alpha", V)], {}),
+    "ShaderNodeTexImage": ('TEX_IMAGE', "Image Texture", [("Vector", VEC)], [("Color", C), ("Alpha", V)],
+                           {"color_space": ('COLOR', _enum({'COLOR', 'NONE'})),
+                            "projection": ('FLAT', _enum({'FLAT', 'BOX', 'SPHERE', 'TUBE'})),
+                            "interpolation": ('Linear', _enum({'Linear', 'Closest', 'Cubic', 'Smart'})),
+                            "extension": ('REPEAT', _enum({'REPEAT', 'EXTEND', 'CLIP'}))}),
+    "ShaderNodeTexEnvironment": ('TEX_ENVIRONMENT', "Environment Texture", [("Vector", VEC)], [("Color", C)],
+                                 {"color_space": ('COLOR', _enum({'COLOR', 'NONE'})),
+                                  "projection": ('EQUIRECTANGULAR', _enum({'EQUIRECTANGULAR', 'MIRROR_BALL'}))}),
+    "ShaderNodeGroup": ('GROUP', "Group", [], [], {}),
+    "NodeGroupInput": ('GROUP_INPUT', "Group Input", [], [], {}),
+    "NodeGroupOutput": ('GROUP_OUTPUT', "Group Output", [], [], {"is_active_output": (True, _bool)}),
+    "NodeFrame": ('FRAME', "Frame", [], [], {"label_size": (20, _int), "shrink": (True, _bool)}),
+    "NodeReroute": ('REROUTE', "Reroute", [("Input", C)], [("Output", C)], {}),
+    "ShaderNodeScript": ('SCRIPT', "Script", [], [],
+                         {"mode": ('INTERNAL', _enum({'INTERNAL', 'EXTERNAL'})),
+                          "filepath": ("", _str), "bytecode": ("", _str), "bytecode_hash": ("", _str),
+                          "use_auto_update": (False, _bool)}),
+}
+
+class Node(bpy_struct):
+    __slots__ = ()
+    name = _rw("name", _str)
+    label = _rw("label", _str)
+    width = _rw("width", _float)
+    width_hidden = _rw("width_hidden", _float)
+    height = _rw("height", _float)
+    hide = _rw("hide", _bool)
+    mute = _rw("mute", _bool)
+    select = _rw("select", _bool)
+    show_options = _rw("show_options", _bool)
+    show_preview = _rw("show_preview", _bool)
+    show_texture = _rw("show_texture", _bool)
+    use_custom_color = _rw("use_custom_color", _bool)
+    color = _rw("color", _array(3))
+    location = _rw("location", lambda v: Vector(float(x) for x in v))
+    type = _ro("type")
+    bl_idname = _ro("bl_idname")
+    bl_static_type = _ro("bl_static_type")
+    bl_label = _ro("bl_label")
+    id_data = _ro("id_data")
+    shading_compatibility = _ro("shading_compatibility")
+    
+    def __init__(self, tree, idname):
+        ntype, label, inputs, outputs, props = _NODE_SPECS[idname]
+        bpy_struct.__init__(self, name=label, label="", width=140.0, width_hidden=42.0, height=100.0,
+                            hide=False, mute=False, select=True, show_options=True, show_preview=False,
+                            show_texture=False, use_custom_color=False, color=_array(3)([0.6, 0.6, 0.6]),
+                            location=Vector([0.0, 0.0]), type=ntype, bl_idname=idname, bl_static_type=ntype,
+                            bl_label=label, id_data=tree, parent=None,
+                            shading_compatibility={'OLD_SHADING', 'NEW_SHADING'})
+        self._d["inputs"] = _SocketList([NodeSocket(self, n, t, False, "{}_{}".format(n, i) if i else n)
+                                         for i, (n, t) in enumerate(inputs)])
+        self._d["outputs"] = _SocketList([NodeSocket(self, n, t, True, "{}_{}".format(n, i) if i else n)
+                                          for i, (n, t) in enumerate(outputs)])
+        self._d["_conv"] = {}
+        for prop, (default, conv) in props.items():
+            self._d[prop] = default
+            self._d["_conv"][prop] = conv
+    
+    def __dir__(self):
+        return bpy_struct.__dir__(self) + list(self._d["_conv"])
+    
+    def __getattr__(self, name):
+        try:
+            return self._d[name] if name in self._d["_conv"] else object.__getattribute__(self, name)
+        except KeyError:
+            raise AttributeError(name)
+    
+    def __setattr__(self, name, val):
+        conv = self._d["_conv"].get(name)
+        if conv is not None:
+            try:
+                self._d[name] = conv(val)
+            except (TypeError, ValueError) as e:
+                raise TypeError(str(e))
+        else:
+            object.__setattr__(self, name, val)
+    
+    @property
+    def parent(self):
+        return self._d["parent"]
+    
+    @parent.setter
+    def parent(self, val):
+        if val is not None and not isinstance(val, Node):
+            raise TypeError("Node expected")
+        self._d["parent"] = val
+    
+    @property
+    def inputs(self):
+        return self._d["inputs"]
+    
+    @property
+    def outputs(self):
+        return self._d["outputs"]
+    
+    @property
+    def bl_rna(self):
+        return _RNA({name: _Prop('ENUM') for name, conv in self._d["_conv"].items()
+                     if conv.__name__ == "conv" and name not in {"filepath", "bytecode", "bytecode_hash"}})
+
+def _sync_sockets(node, sockets, interface, is_output, extend):
+    """Keep a node's socket list in step with a group interface."""
+    wanted = [(s.identifier, s.name, s.type) for s in interface]
+    current = {s.identifier: s for s in sockets._items if s.identifier != "__extend__"}
+    items = []
+    for ident, name, stype in wanted:
+        sock = current.get(ident)
+        if sock is None or sock.type != stype:
+            sock = NodeSocket(node, name, stype, is_output, ident)
+        sock._d["name"] = name
+        items.append(sock)
+    if extend:
+        ext = [s for s in sockets._items if s.identifier == "__extend__"]
+        items.append(ext[0] if ext else NodeSocket(node, "", 'CUSTOM', is_output, "__extend__"))
+    sockets._items[:] = items
+
+class NodeGroupInput(Node):
+    __slots__ = ()
+    
+    @property
+    def outputs(self):
+        _sync_sockets(self, self._d["outputs"], self.id_data.inputs, True, True)
+        return self._d["outputs"]
+
+class NodeGroupOutput(Node):
+    __slots__ = ()
+    
+    @property
+    def inputs(self):
+        _sync_sockets(self, self._d["inputs"], self.id_data.outputs, False, True)
+        return self._d["inputs"]
+
+class ShaderNodeGroup(Node):
+    __slots__ = ()
+    
+    @property
+    def node_tree(self):
+        return self._d.get("node_tree")
+    
+    @node_tree.setter
+    def node_tree(self, val):
+        self._d["node_tree"] = val
+    
+    @property
+    def inputs(self):
+        if self.node_tree is not None:
+            _sync_sockets(self, self._d["inputs"], self.node_tree.inputs, False, False)
+        return self._d["inputs"]
+    
+    @property
+    def outputs(self):
+        if self.node_tree is not None:
+            _sync_sockets(self, self._d["outputs"], self.node_tree.outputs, True, False)
+        return self._d["outputs"]
+
+class NodeFrame(Node):
+    __slots__ = ()
+    text = _rw("text")
+
+class ShaderNodeScript(Node):
+    __slots__ = ()
+    script = _rw("script")
+
+class _ImageNode(Node):
+    __slots__ = ()
+    image = _rw("image")
+    image_user = _ro("image_user")
+
+class _CurveNode(Node):
+    __slots__ = ()
+    mapping = _ro("mapping")
+
+class _RampNode(Node):
+    __slots__ = ()
+    color_ramp = _ro("color_ramp")
+
+_NODE_CLASSES = {
+    "NodeGroupInput": NodeGroupInput,
+    "NodeGroupOutput": NodeGroupOutput,
+    "ShaderNodeGroup": ShaderNodeGroup,
+    "NodeFrame": NodeFrame,
+    "ShaderNodeScript": ShaderNodeScript,
+    "ShaderNodeTexImage": _ImageNode,
+    "ShaderNodeTexEnvironment": _ImageNode,
+    "ShaderNodeRGBCurve": _CurveNode,
+    "ShaderNodeVectorCurve": _CurveNode,
+    "ShaderNodeValToRGB": _RampNode,
+}
+
+class _Nodes(_Collection):
+    def __init__(self, tree):
+        _Collection.__init__(self)
+        self._tree = tree
+    
+    def new(self, type):
+        if type not in _NODE_SPECS:
+            raise RuntimeError("Node type {} undefined".format(type))
+        node = _NODE_CLASSES.get(type, Node)(self._tree, type)
+        node._d["name"] = self._unique(node.name)
+        if type in {"ShaderNodeTexImage", "ShaderNodeTexEnvironment"}:
+            node._d["image"] = None
+            node._d["image_user"] = ImageUser(frame_duration=1, frame_offset=0, frame_start=1,
+                                              use_auto_refresh=False, use_cyclic=False,
+                                              fields_per_frame=2, frame_current=1)
+        elif type == "ShaderNodeRGBCurve":
+            node._d["mapping"] = _curve_mapping(4)
+        elif type == "ShaderNodeVectorCurve":
+            node._d["mapping"] = _curve_mapping(3)
+        elif type == "ShaderNodeValToRGB":
+            node._d["color_ramp"] = _color_ramp()
+        elif type == "NodeFrame":
+            node._d["text"] = None
+        elif type == "ShaderNodeScript":
+            node._d["script"] = None
+        self._items.append(node)
+        return node
+    
+    def remove(self, node):
+        self._tree.links._items[:] = [l for l in self._tree.links._items
+                                      if l.from_node is not node and l.to_node is not node]
+        self._items.remove(node)
+    
+    def clear(self):
+        del self._tree.links._items[:]
+        del self._items[:]
+
+class NodeLink(bpy_struct):
+    __slots__ = ()
+    from_node = _ro("from_node")
+    from_socket = _ro("from_socket")
+    to_node = _ro("to_node")
+    to_socket = _ro("to_socket")
+    is_valid = property(lambda self: True)
+
+class _Links(_Collection):
+    def __init__(self, tree):
+        _Collection.__init__(self)
+        self._tree = tree
+    
+    def new(self, output, input):
+        if not output.is_output or input.is_output:
+            raise RuntimeError("Invalid link direction")
+        self._items[:] = [l for l in self._items if l.to_socket is not input]
+        link = NodeLink(from_node=output.node, from_socket=output, to_node=input.node, to_socket=input)
+        self._items.append(link)
+        return link
+    
+    def remove(self, link):
+        self._items.remove(link)
+    
+    def clear(self):
+        del self._items[:]
+
+#ID types
+
+class NodeTree(ID):
+    __slots__ = ()
+    type = _ro("type")
+    bl_idname = _ro("bl_idname")
+    nodes = _ro("nodes")
+    links = _ro("links")
+    inputs = _ro("inputs")
+    outputs = _ro("outputs")
+    
+    def __init__(self, name, bl_idname="ShaderNodeTree"):
+        ID.__init__(self, name=name, type='SHADER', bl_idname=bl_idname)
+        self._d["_socket_uid"] = 0
+        self._d["nodes"] = _Nodes(self)
+        self._d["links"] = _Links(self)
+        self._d["inputs"] = NodeTreeInterface(self, False)
+        self._d["outputs"] = NodeTreeInterface(self, True)
+    
+    @property
+    def _socket_uid(self):
+        return self._d["_socket_uid"]
+    
+    @_socket_uid.setter
+    def _socket_uid(self, val):
+        self._d["_socket_uid"] = val
+
+class ShaderNodeTree(NodeTree):
+    __slots__ = ()
+
+class CyclesMaterialSettings(bpy_struct):
+    __slots__ = ()
+    _enums = ("volume_sampling", "volume_interpolation")
+    sample_as_light = _rw("sample_as_light", _bool)
+    use_transparent_shadow = _rw("use_transparent_shadow", _bool)
+    homogeneous_volume = _rw("homogeneous_volume", _bool)
+    volume_sampling = _rw("volume_sampling", _enum({'DISTANCE', 'EQUIANGULAR', 'MULTIPLE_IMPORTANCE'}))
+    volume_interpolation = _rw("volume_interpolation", _enum({'LINEAR', 'CUBIC'}))
+
+class Material(ID):
+    __slots__ = ()
+    diffuse_color = _rw("diffuse_color", _array(3))
+    specular_color = _rw("specular_color", _array(3))
+    alpha = _rw("alpha", _float)
+    specular_hardness = _rw("specular_hardness", _int)
+    pass_index = _rw("pass_index", _int)
+    cycles = _ro("cycles")
+    node_tree = _ro("node_tree")
+    
+    def __init__(self, name):
+        ID.__init__(self, name=name, diffuse_color=_array(3)([0.8, 0.8, 0.8]),
+                    specular_color=_array(3)([1.0, 1.0, 1.0]), alpha=1.0, specular_hardness=50,
+                    pass_index=0, use_nodes=False, node_tree=None,
+                    cycles=CyclesMaterialSettings(sample_as_light=True, use_transparent_shadow=True,
+                                                  homogeneous_volume=False, volume_sampling='DISTANCE',
+                                                  volume_interpolation='LINEAR'))
+    
+    @property
+    def use_nodes(self):
+        return self._d["use_nodes"]
+    
+    @use_nodes.setter
+    def use_nodes(self, val):
+        self._d["use_nodes"] = _bool(val)
+        if val and self._d["node_tree"] is None:
+            tree = ShaderNodeTree("Shader Nodetree")
+            out = tree.nodes.new("ShaderNodeOutputMaterial")
+            diff = tree.nodes.new("ShaderNodeBsdfDiffuse")
+            tree.links.new(diff.outputs[0], out.inputs[0])
+            self._d["node_tree"] = tree
+
+class PackedFile(bpy_struct):
+    __slots__ = ()
+    data = _ro("data")
+    size = property(lambda self: len(self._d["data"]))
+
+class Image(ID):
+    __slots__ = ()
+    filepath = _rw("filepath", _str)
+    source = _rw("source", _enum({'FILE', 'SEQUENCE', 'MOVIE', 'GENERATED', 'VIEWER'}))
+    packed_file = _ro("packed_file")
+    
+    def __init__(self, name, filepath="", source='FILE'):
+        ID.__init__(self, name=name, filepath=filepath, source=source, packed_file=None)
+    
+    def pack(self):
+        with open(path.abspath(self.filepath), 'rb') as f:
+            self._d["packed_file"] = PackedFile(data=f.read())
+    
+    def unpack(self, method='USE_LOCAL'):
+        self._d["packed_file"] = None
+
+class Text(ID):
+    __slots__ = ()
+    filepath = _rw("filepath", _str)
+    
+    def __init__(self, name, filepath=""):
+        ID.__init__(self, name=name, filepath=filepath, body="")
+    
+    def from_string(self, string):
+        self._d["body"] = _str(string)
+    
+    def as_string(self):
+        return self._d["body"]
+
+class _IDCollection(_Collection):
+    def _add(self, item):
+        item._d["name"] = self._unique(item.name)
+        self._items.append(item)
+        return item
+    
+    def remove(self, item, do_unlink=True):
+        self._items.remove(item)
+
+class _Materials(_IDCollection):
+    def new(self, name):
+        return self._add(Material(name))
+
+class _NodeGroups(_IDCollection):
+    def new(self, name, type):
+        return self._add(ShaderNodeTree(name, type))
+
+class _Images(_IDCollection):
+    def load(self, filepath, check_existing=False):
+        if not os.path.isfile(filepath):
+            raise RuntimeError("Error: Cannot read '{}'".format(filepath))
+        return self._add(Image(os.path.basename(filepath), filepath))
+    
+    def new(self, name, width, height, alpha=False):
+        return self._add(Image(name, source='GENERATED'))
+
+class _Texts(_IDCollection):
+    def new(self, name):
+        return self._add(Text(name))
+    
+    def load(self, filepath, internal=False):
+        with open(filepath, 'r', encoding="utf-8") as f:
+            body = f.read()
+        txt = self._add(Text(os.path.basename(filepath), "" if internal else filepath))
+        txt.from_string(body)
+        return txt
+
+class BlendData(object):
+    def __init__(self):
+        self.materials = _Materials()
+        self.node_groups = _NodeGroups()
+        self.images = _Images()
+        self.texts = _Texts()
+
+data = BlendData()
+
+def reset():
+    """Drop all datablocks, as if a new .blend file had been loaded."""
+    data.__init__()
+
+#bpy.path
+
+class _PathModule(object):
+    @staticmethod
+    def abspath(p):
+        if p.startswith("//"):
+            return os.path.join(_BLEND_DIR, p[2:])
+        return p
+    
+    @staticmethod
+    def basename(p):
+        if p.startswith("//"):
+            p = p[2:]
+        return os.path.basename(p)
+
+path = _PathModule()
+
+types = _pytypes.SimpleNamespace(
+    Material=Material,
+    ShaderNodeTree=ShaderNodeTree,
+    NodeTree=NodeTree,
+    ShaderNodeScript=ShaderNodeScript,
+    Image=Image,
+    Text=Text,
+    ID=ID,
+    Node=Node,
+)
+
+app = _pytypes.SimpleNamespace(version=(2, 79, 0))
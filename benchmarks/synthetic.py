@@ -0,0 +1,177 @@
+# ##### BEGIN GPL LICENSE BLOCK #####
+#
+# Part of the Blib package.
+# Blib benchmarks: Synthetic Cycles materials.
+# Copyright (C) 2016  Luca Rood
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+
+# You should have received a copy of the GNU General Public License
+# along with this program.  If not, see <http://www.gnu.org/licenses/>.
+#
+# ##### END GPL LICENSE BLOCK #####
+
+"""Generation of synthetic Cycles materials of configurable size, for benchmarking."""
+
+import random
+import struct
+import zlib
+from os import path, makedirs
+
+import bpy
+
+filler_types = ["ShaderNodeMath", "ShaderNodeMixRGB", "ShaderNodeTexNoise", "ShaderNodeRGBCurve", "ShaderNodeValToRGB"]
+
+def png(filepath, width, height, seed=0):
+    """
+    Write a small RGB PNG image.
+    
+    Args:
+        filepath (str): Path of the image file.
+        width (int): Width in pixels.
+        height (int): Height in pixels.
+        seed (int): Seed of the pixel values, so that images with different seeds have different content.
+    """
+    
+    def chunk(tag, data):
+        return struct.pack(">I", len(data)) + tag + data + struct.pack(">I", zlib.crc32(tag + data) & 0xffffffff)
+    
+    rng = random.Random(seed)
+    rows = b"".join(b"\x00" + bytes(rng.randrange(256) for _ in range(width * 3)) for _ in range(height))
+    data = b"\x89PNG\r\n\x1a\n"
+    data += chunk(b"IHDR", struct.pack(">IIBBBBB", width, height, 8, 2, 0, 0, 0))
+    data += chunk(b"IDAT", zlib.compress(rows))
+    data += chunk(b"IEND", b"")
+    
+    img_file = open(filepath, 'wb')
+    img_file.write(data)
+    img_file.close()
+
+def fill_tree(tree, nodes, rng):
+    """
+    Add a chain of linked nodes with randomized settings to a node tree.
+    
+    Args:
+        tree (bpy.types.NodeTree): The node tree.
+        nodes (int): Number of nodes.
+        rng (random.Random): Random generator.
+    
+    Returns:
+        list[bpy.types.Node]: The new nodes, in chain order.
+    """
+    
+    chain = []
+    for i in range(nodes):
+        node = tree.nodes.new(filler_types[i % len(filler_types)])
+        node.location = (i * 200.0, rng.uniform(-300.0, 300.0))
+        if node.bl_idname == "ShaderNodeMath":
+            node.operation = rng.choice(['ADD', 'MULTIPLY', 'POWER'])
+            node.inputs[1].default_value = rng.uniform(0.0, 10.0)
+        elif node.bl_idname == "ShaderNodeMixRGB":
+            node.blend_type = rng.choice(['MIX', 'ADD', 'MULTIPLY'])
+            node.inputs[2].default_value = [rng.random(), rng.random(), rng.random(), 1.0]
+        elif node.bl_idname == "ShaderNodeTexNoise":
+            node.inputs[1].default_value = rng.uniform(1.0, 20.0)
+        elif node.bl_idname == "ShaderNodeRGBCurve":
+            node.mapping.curves[3].points.new(rng.uniform(0.2, 0.8), rng.random())
+        elif node.bl_idname == "ShaderNodeValToRGB":
+            node.color_ramp.elements.new(rng.uniform(0.2, 0.8)).color = [rng.random(), rng.random(), rng.random(), 1.0]
+        
+        if chain:
+            tree.links.new(chain[-1].outputs[0], node.inputs[0])
+        chain.append(node)
+    return chain
+
+def make_group(name, nodes, depth, rng):
+    """
+    Create a node group with one value input and output, nesting groups down to the given depth.
+    
+    Args:
+        name (str): Name of the group.
+        nodes (int): Number of nodes in each group.
+        depth (int): Number of nested levels, including this group.
+        rng (random.Random): Random generator.
+    
+    Returns:
+        bpy.types.ShaderNodeTree
+    """
+    
+    grp = bpy.data.node_groups.new(name, "ShaderNodeTree")
+    inp = grp.nodes.new("NodeGroupInput")
+    out = grp.nodes.new("NodeGroupOutput")
+    grp.inputs.new("NodeSocketFloat", "Value")
+    grp.outputs.new("NodeSocketColor", "Color")
+    
+    chain = fill_tree(grp, nodes, rng)
+    if depth > 1:
+        sub = grp.nodes.new("ShaderNodeGroup")
+        sub.node_tree = make_group(name + "_sub", nodes, depth - 1, rng)
+        chain.insert(0, sub)
+        if len(chain) > 1:
+            grp.links.new(sub.outputs[0], chain[1].inputs[0])
+    if chain:
+        grp.links.new(inp.outputs[0], chain[0].inputs[0])
+        grp.links.new(chain[-1].outputs[0], out.inputs[0])
+    return grp
+
+def make_material(directory, name="Synthetic", nodes=20, depth=0, images=1, frames=0, seed=0):
+    """
+    Create a Cycles material with generated nodes, groups and images.
+    
+    Args:
+        directory (str): Directory in which to write the image files.
+        name (str): Name of the material.
+        nodes (int): Number of generated nodes in the material, and in each node group.
+        depth (int): Nesting depth of node groups, 0 for no groups.
+        images (int): Number of image texture nodes, each with its own image.
+        frames (int): Length of an image sequence used by an extra image texture node, 0 for no sequence.
+        seed (int): Seed of the generated settings and image content.
+    
+    Returns:
+        bpy.types.Material
+    """
+    
+    rng = random.Random(seed)
+    mat = bpy.data.materials.new(name)
+    mat.use_nodes = True
+    tree = mat.node_tree
+    tree.nodes.clear()
+    
+    out = tree.nodes.new("ShaderNodeOutputMaterial")
+    shader = tree.nodes.new("ShaderNodeBsdfDiffuse")
+    tree.links.new(shader.outputs[0], out.inputs[0])
+    chain = fill_tree(tree, nodes, rng)
+    if chain:
+        tree.links.new(chain[-1].outputs[0], shader.inputs[0])
+    
+    if depth > 0:
+        gnode = tree.nodes.new("ShaderNodeGroup")
+        gnode.node_tree = make_group(name + "_group", nodes, depth, rng)
+        if chain:
+            tree.links.new(gnode.outputs[0], chain[0].inputs[0])
+    
+    for i in range(images):
+        ipath = path.join(directory, "{}_{}.png".format(name, i))
+        png(ipath, 16, 16, seed * 1000 + i)
+        tex = tree.nodes.new("ShaderNodeTexImage")
+        tex.image = bpy.data.images.load(ipath)
+    
+    if frames > 0:
+        seq_dir = path.join(directory, name + "_seq")
+        makedirs(seq_dir, exist_ok=True)
+        for frame in range(1, frames + 1):
+            png(path.join(seq_dir, "frame{:04d}.png".format(frame)), 8, 8, seed * 1000 + frame)
+        tex = tree.nodes.new("ShaderNodeTexImage")
+        tex.image = bpy.data.images.load(path.join(seq_dir, "frame0001.png"))
+        tex.image.source = 'SEQUENCE'
+        tex.image_user.frame_duration = frames
+    
+    return mat
@@ -18,9 +18,25 @@
 #
 # ##### END GPL LICENSE BLOCK #####
 
-"""Blender Library manipulation package as per the Blib standard."""
+"""
+Blender Library manipulation package as per the Blib standard.
+
+Submodules are imported when first accessed (e.g. 'blib.manifest'), so using one does not load the others.
+"""
 
 from .version import version as ver
+from .utils import lazy_package
+
+lazy_package(__name__, {
+    "archive": (".archive", None),
+    "cache": (".cache", None),
+    "cycles": (".cycles", None),
+    "imageinfo": (".imageinfo", None),
+    "manifest": (".manifest", None),
+    "remote": (".remote", None),
+    "report": (".report", None),
+    "stats": (".stats", None),
+})
 
 __all__ = []
 __version__ = ver.decorated
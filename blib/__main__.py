@@ -0,0 +1,309 @@
+# ##### BEGIN GPL LICENSE BLOCK #####
+#
+# Part of the Blib package.
+# Blib command line: Headless operations on Blib files.
+# Copyright (C) 2016  Luca Rood
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+
+# You should have received a copy of the GNU General Public License
+# along with this program.  If not, see <http://www.gnu.org/licenses/>.
+#
+# ##### END GPL LICENSE BLOCK #####
+
+"""
+Headless operations on Blib files, without Blender.
+
+Usage:
+    python -m blib inspect FILE...
+    python -m blib verify [--jobs N] PATH...
+    python -m blib repack [--prune] [--store] SOURCE DESTINATION
+    python -m blib dedup-report PATH...
+    python -m blib index [--output FILE] PATH...
+
+Paths can be files or directories, which are searched recursively for .blib files.
+Results are printed as JSON. Commands checking files exit with status 1 if any of them is invalid.
+"""
+
+import argparse
+import json
+import sys
+import zipfile as zf
+from concurrent.futures import ThreadPoolExecutor
+from os import path, walk, cpu_count
+
+from .archive import verify, repack
+from .manifest import read_manifest
+from .utils import EntryIndex
+from .exceptions import BlibException
+
+def find_files(paths):
+    """
+    Expand directories to the .blib files they contain.
+    
+    Args:
+        paths (list[str]): Paths to files or directories.
+    
+    Returns:
+        list[str]: Paths to files, directories being searched recursively.
+    """
+    
+    files = []
+    for fpath in paths:
+        if path.isdir(fpath):
+            for root, dirs, names in walk(fpath):
+                dirs.sort()
+                files.extend(path.join(root, name) for name in sorted(names) if name.endswith(".blib"))
+        else:
+            files.append(fpath)
+    return files
+
+def verify_file(filepath, threads=None):
+    """
+    Check the checksum and the integrity of all entries of a .blib file.
+    
+    Args:
+        filepath (str): Path to the .blib file.
+        threads (int or None): Number of threads checking the entries, None to use one per core.
+    
+    Returns:
+        dict: "path", "valid" and "error" (None if valid).
+    """
+    
+    result = {"path": filepath, "valid": False, "error": None}
+    try:
+        archive = zf.ZipFile(filepath, 'r')
+    except (OSError, zf.BadZipFile) as e:
+        result["error"] = str(e)
+        return result
+    
+    try:
+        checksum = archive.comment.decode("utf-8").split(" ")[0]
+        verify(archive, checksum, threads)
+    except (BlibException, UnicodeDecodeError) as e:
+        result["error"] = str(e)
+    else:
+        result["valid"] = True
+    finally:
+        archive.close()
+    return result
+
+def referenced_entries(filepath):
+    """
+    List the entries of a .blib file that are referenced by its structure.
+    
+    Args:
+        filepath (str): Path to the .blib file.
+    
+    Returns:
+        list[str]: "structure.xml" and the paths of the referenced resources.
+    """
+    
+    manifest = read_manifest(filepath)
+    names = ["structure.xml"]
+    archive = zf.ZipFile(filepath, 'r')
+    index = EntryIndex(archive)
+    archive.close()
+    
+    for image in manifest["images"]:
+        if image["source"] == 'SEQUENCE':
+            seq_dir = path.dirname(image["path"])
+            names.extend(seq_dir + "/" + name for name in index.listdir(seq_dir))
+        else:
+            names.append(image["path"])
+    for resource in manifest["texts"] + manifest["scripts"]:
+        if resource["path"] is not None:
+            names.append(resource["path"])
+    return [name for name in dict.fromkeys(names) if name in index]
+
+def dedup_report(files):
+    """
+    Find data stored more than once across .blib files (duplicates within a file are already stored as links).
+    
+    Args:
+        files (list[str]): Paths to the .blib files.
+    
+    Returns:
+        dict: "files", "stored_bytes" (compressed size of all data), "duplicate_bytes" (compressed size
+            of the data that is stored again in another file), "duplicates" (list of duplicated data,
+            with "crc", "size", "compress_size" and "entries", largest waste first), and "errors"
+            (list of the files that could not be read, with "path" and "error").
+    """
+    
+    stored = {}
+    total = 0
+    errors = []
+    for filepath in files:
+        try:
+            archive = zf.ZipFile(filepath, 'r')
+        except (OSError, zf.BadZipFile) as e:
+            errors.append({"path": filepath, "error": str(e)})
+            continue
+        for info in archive.infolist():
+            if info.file_size == 0 and info.comment: #Link to data in the same file
+                continue
+            total += info.compress_size
+            stored.setdefault((info.CRC, info.file_size), []).append((filepath, info.filename, info.compress_size))
+        archive.close()
+    
+    duplicates = []
+    for (crc, size), entries in stored.items():
+        if len({entry[0] for entry in entries}) > 1:
+            duplicates.append({
+                "crc": format(crc, '08x'),
+                "size": size,
+                "compress_size": min(entry[2] for entry in entries),
+                "waste": sum(entry[2] for entry in entries) - min(entry[2] for entry in entries),
+                "entries": [{"path": entry[0], "entry": entry[1]} for entry in entries],
+            })
+    duplicates.sort(key=lambda dup: dup["waste"], reverse=True)
+    
+    return {
+        "files": len(files),
+        "stored_bytes": total,
+        "duplicate_bytes": sum(dup["waste"] for dup in duplicates),
+        "duplicates": duplicates,
+        "errors": errors,
+    }
+
+def index_entry(filepath):
+    """
+    Summarize a .blib file for a library index.
+    
+    Args:
+        filepath (str): Path to the .blib file.
+    
+    Returns:
+        dict: "path", "size", "mtime", and the main manifest fields ("checksum", "version", "subtype", "name",
+            "groups", "images", "texts", "scripts"), or "error" if the file is not a valid Blib file.
+    """
+    
+    entry = {"path": filepath}
+    try:
+        entry["size"] = path.getsize(filepath)
+        entry["mtime"] = path.getmtime(filepath)
+        manifest = read_manifest(filepath)
+    except (BlibException, OSError, KeyError, ValueError) as e: #Missing, unreadable or malformed file
+        entry["error"] = str(e)
+        return entry
+    
+    entry["checksum"] = manifest["checksum"]
+    entry["version"] = manifest["version"]
+    entry["subtype"] = manifest["subtype"]
+    if manifest["main"] is not None:
+        entry["name"] = manifest["main"]["name"]
+    elif manifest["groups"]:
+        entry["name"] = manifest["groups"][-1]["name"]
+    else:
+        entry["name"] = None
+    entry["groups"] = [grp["name"] for grp in manifest["groups"]]
+    entry["images"] = len(manifest["images"])
+    entry["texts"] = len(manifest["texts"])
+    entry["scripts"] = len(manifest["scripts"])
+    return entry
+
+def output(data, filepath=None):
+    """
+    Print data as JSON, or write it to a file.
+    
+    Args:
+        data: JSON serializable data.
+        filepath (str or None): Path of the output file, None to print.
+    """
+    
+    text = json.dumps(data, indent=2, sort_keys=True)
+    if filepath is None:
+        print(text)
+    else:
+        out_file = open(filepath, 'w', encoding="utf-8")
+        out_file.write(text + "\n")
+        out_file.close()
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(prog="python -m blib", description="Headless operations on Blib files.")
+    commands = parser.add_subparsers(dest="command")
+    commands.required = True
+    
+    cmd = commands.add_parser("inspect", help="Print the manifest of .blib or .xml files")
+    cmd.add_argument("paths", nargs="+")
+    
+    cmd = commands.add_parser("verify", help="Check the checksum and integrity of .blib files")
+    cmd.add_argument("paths", nargs="+")
+    cmd.add_argument("--jobs", type=int, default=None, help="Files checked in parallel, one per core by default")
+    
+    cmd = commands.add_parser("repack", help="Copy a .blib file without recompressing its entries")
+    cmd.add_argument("source")
+    cmd.add_argument("destination")
+    cmd.add_argument("--prune", action="store_true", help="Only keep the entries referenced by the structure")
+    cmd.add_argument("--store", action="store_true", help="Don't compress entries that need to be written anew")
+    
+    cmd = commands.add_parser("dedup-report", help="Report data stored more than once across .blib files")
+    cmd.add_argument("paths", nargs="+")
+    
+    cmd = commands.add_parser("index", help="Summarize all .blib files of a library")
+    cmd.add_argument("paths", nargs="+")
+    cmd.add_argument("--output", help="Path of the index file, printed if omitted")
+    
+    args = parser.parse_args(argv)
+    
+    if args.command == "inspect":
+        results = []
+        status = 0
+        for filepath in find_files(args.paths):
+            try:
+                manifest = read_manifest(filepath)
+            except (BlibException, OSError, KeyError, ValueError) as e:
+                manifest = {"error": str(e)}
+                status = 1
+            manifest["path"] = filepath
+            results.append(manifest)
+        output(results)
+        return status
+    
+    elif args.command == "verify":
+        files = find_files(args.paths)
+        jobs = args.jobs or cpu_count() or 1
+        if len(files) == 1: #Spread the entries of the single file across threads instead
+            results = [verify_file(files[0])]
+        else:
+            with ThreadPoolExecutor(max(1, jobs)) as pool:
+                results = list(pool.map(lambda filepath: verify_file(filepath, 1), files))
+        output(results)
+        return 0 if all(result["valid"] for result in results) else 1
+    
+    elif args.command == "repack":
+        try:
+            names = referenced_entries(args.source) if args.prune else None
+            repack(args.source, args.destination, names, not args.store)
+            sizes = path.getsize(args.source), path.getsize(args.destination)
+        except (BlibException, OSError, KeyError, ValueError, zf.BadZipFile) as e:
+            output({"source": args.source, "error": str(e)})
+            return 1
+        output({
+            "source": args.source,
+            "destination": args.destination,
+            "source_size": sizes[0],
+            "destination_size": sizes[1],
+        })
+        return 0
+    
+    elif args.command == "dedup-report":
+        report = dedup_report(find_files(args.paths))
+        output(report)
+        return 1 if report["errors"] else 0
+    
+    elif args.command == "index":
+        entries = [index_entry(filepath) for filepath in find_files(args.paths)]
+        output({"files": entries}, args.output)
+        return 0 if all("error" not in entry for entry in entries) else 1
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,475 @@
+# ##### BEGIN GPL LICENSE BLOCK #####
+#
+# Part of the Blib package.
+# Blib archive: Low level operations on Blib archives.
+# Copyright (C) 2016  Luca Rood
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+
+# You should have received a copy of the GNU General Public License
+# along with this program.  If not, see <http://www.gnu.org/licenses/>.
+#
+# ##### END GPL LICENSE BLOCK #####
+
+"""
+Low level operations on Blib archives, working on the compressed data directly.
+
+None of these depend on Blender, so they can be used to manipulate libraries headlessly.
+"""
+
+import zlib
+import zipfile as zf
+from hashlib import sha1
+from os import cpu_count, remove
+from threading import Event, Lock, Thread
+
+from .utils import archive_sha1, get_path, write, read_raw, write_raw, remove_entry
+from .exceptions import InvalidBlibFile
+
+CHUNK_SIZE = 1048576
+
+def check_entry(archive, info, stop=None):
+    """
+    Check the integrity of an archive entry, by decompressing it in chunks and comparing its crc32 hash.
+    
+    Args:
+        archive (zipfile.ZipFile): The archive containing the entry, open for reading.
+        info (zipfile.ZipInfo): Info of the entry to be checked.
+        stop (threading.Event or None): Event that aborts the check when set (the entry is then considered valid).
+    
+    Returns:
+        bool: True if the entry is valid.
+    """
+    
+    if info.flag_bits & 0x1: #Encrypted entries are never written by Blib
+        return False
+    
+    try:
+        with archive.open(info) as entry: #Checks the local header, and the crc32 hash once fully read
+            while entry.read(CHUNK_SIZE):
+                if stop is not None and stop.is_set():
+                    return True
+    except (zf.BadZipFile, zlib.error, NotImplementedError, OSError, EOFError):
+        return False
+    return True
+
+def verify(archive, checksum=None, threads=None):
+    """
+    Check the integrity of all entries of an archive, spreading them across a thread pool.
+    
+    Decompression and crc32 hashing release the GIL, so this scales with the available cores.
+    Each thread reads through its own handle of the archive, and all threads stop at the first broken entry.
+    
+    Args:
+        archive (zipfile.ZipFile): The archive to be checked.
+        checksum (str or None): Checksum stored in the archive comment, compared against 'blib.utils.archive_sha1'
+            before any entry is read. None to skip the comparison.
+        threads (int or None): Number of threads, None to use one per core.
+    
+    Raises:
+        blib.exeptions.InvalidBlibFile: If the checksum does not match, if an entry is broken,
+            or if entries could not be checked because the archive could not be opened again.
+    """
+    
+    if checksum is not None and archive_sha1(archive).hexdigest() != checksum:
+        raise InvalidBlibFile("Checksum does not match, file may be broken or have been altered")
+    
+    infos = sorted(archive.infolist(), key=lambda info: info.compress_size, reverse=True)
+    if archive.filename is None: #No path to open more handles from
+        threads = 1
+    elif threads is None:
+        threads = cpu_count() or 1
+    threads = max(1, min(threads, len(infos)))
+    
+    queue = iter(infos)
+    lock = Lock()
+    stop = Event()
+    broken = []
+    
+    def worker():
+        try:
+            handle = archive if archive.filename is None else zf.ZipFile(archive.filename, 'r')
+        except (OSError, zf.BadZipFile): #Leave the entries to the other threads
+            return
+        try:
+            while not stop.is_set():
+                with lock:
+                    info = next(queue, None)
+                if info is None:
+                    return
+                if not check_entry(handle, info, stop):
+                    broken.append(info.filename)
+                    stop.set()
+        finally:
+            if handle is not archive:
+                handle.close()
+    
+    if threads == 1:
+        worker()
+    else:
+        pool = [Thread(target=worker) for _ in range(threads)]
+        for thread in pool:
+            thread.start()
+        for thread in pool:
+            thread.join()
+    
+    if broken:
+        raise InvalidBlibFile("File is broken, '{}' is corrupted".format(broken[0]))
+    unchecked = next(queue, None) #Left by threads that could not open the archive
+    if unchecked is not None:
+        raise InvalidBlibFile("File could not be read, '{}' was not checked".format(unchecked.filename))
+
+def copy_info(info, arcname):
+    """
+    Create info for a new entry, describing the same data as an existing entry.
+    
+    Args:
+        info (zipfile.ZipInfo): Info of the existing entry.
+        arcname (str): Path of the new entry inside the archive.
+    
+    Returns:
+        zipfile.ZipInfo
+    """
+    
+    new = zf.ZipInfo(arcname, info.date_time)
+    new.compress_type = info.compress_type
+    new.create_system = info.create_system
+    new.external_attr = info.external_attr
+    new.CRC = info.CRC
+    new.file_size = info.file_size
+    return new
+
+class Repack(object):
+    """
+    Build a new archive out of entries of existing archives, copying their compressed data and crc32 hashes verbatim.
+    
+    Entries are never decompressed or recompressed, so merging, splitting or pruning libraries is bound by I/O.
+    Links (empty entries whose comment points to the entry holding the data) are preserved:
+    data that was already copied, from the same or any other archive, is only linked to.
+    The archive checksum is computed from the copied crc32 hashes when closing.
+    
+    Args:
+        filepath (str): Path to the new archive.
+        compress (bool): Use compression for data written with 'Repack.write'
+            (copied entries keep their own compression).
+    
+    Attributes:
+        filepath (str): Path to the new archive.
+        archive (zipfile.ZipFile): The archive being built.
+    """
+    
+    def __init__(self, filepath, compress=True):
+        compression = zf.ZIP_DEFLATED if compress else zf.ZIP_STORED
+        self.filepath = filepath
+        self.archive = zf.ZipFile(filepath, 'w', compression)
+        self._crcs = {}
+        self._digests = {}
+        self._copied = {}
+        self._sources = []
+        self._meta = None
+    
+    def _link(self, arcname, zpath):
+        self.archive.writestr(arcname, b"")
+        self.archive.getinfo(arcname).comment = zpath.encode("utf-8")
+    
+    def copy(self, archive, name, arcname=None):
+        """
+        Copy an entry from an existing archive.
+        
+        Args:
+            archive (zipfile.ZipFile): The archive from which to copy.
+            name (str): Path of the entry inside the source archive.
+            arcname (str or None): Path of the entry inside the new archive, None to keep the same path.
+        
+        Raises:
+            KeyError: If the entry, or the entry it links to, is not in the source archive.
+        """
+        
+        if arcname is None:
+            arcname = name
+        
+        if archive not in self._sources:
+            self._sources.append(archive)
+            if self._meta is None:
+                meta = archive.comment.decode("utf-8").split(" ", 1)
+                if len(meta) == 2:
+                    self._meta = meta[1]
+        
+        target = get_path(archive, name)
+        key = (self._sources.index(archive), target)
+        if key in self._copied: #Data already copied from this archive
+            self._link(arcname, self._copied[key])
+            return
+        
+        info = archive.getinfo(target)
+        data = read_raw(archive, info)
+        digest = (info.compress_type, info.file_size, sha1(data).digest())
+        
+        if info.CRC in self._crcs:
+            for zpath in self._crcs[info.CRC]:
+                if self._digests.get(zpath) == digest: #Same data copied from another archive
+                    self._link(arcname, zpath)
+                    self._copied[key] = zpath
+                    return
+            self._crcs[info.CRC].append(arcname)
+        else:
+            self._crcs[info.CRC] = [arcname]
+        
+        write_raw(self.archive, copy_info(info, arcname), data)
+        self._digests[arcname] = digest
+        self._copied[key] = arcname
+    
+    def copy_all(self, archive, names=None, prefix=""):
+        """
+        Copy several entries from an existing archive.
+        
+        Args:
+            archive (zipfile.ZipFile): The archive from which to copy.
+            names (iterable[str] or None): Paths of the entries to be copied, None to copy all entries.
+            prefix (str): Prefix prepended to the paths of the entries inside the new archive.
+        """
+        
+        if names is None:
+            names = archive.namelist()
+        for name in names:
+            self.copy(archive, name, prefix + name)
+    
+    def write(self, source, destination):
+        """
+        Write new data to the archive, same as 'blib.utils.write'.
+        
+        Args:
+            source (str or bytes): The path to the file to be written or the data itself.
+            destination (str): The path within the archive to which the data should written.
+        """
+        
+        write(self.archive, source, destination, self._crcs)
+    
+    def close(self, meta=None):
+        """
+        Write the archive checksum and close the archive.
+        
+        Args:
+            meta (str or None): Blib meta-data to be stored after the checksum (e.g. "cycles 0.1.6 0.1.6").
+                None to keep the meta-data of the first archive copied from.
+        """
+        
+        if meta is None:
+            meta = self._meta
+        checksum = archive_sha1(self.archive).hexdigest()
+        if meta:
+            self.archive.comment = (checksum + " " + meta).encode("utf-8")
+        else:
+            self.archive.comment = checksum.encode("utf-8")
+        self.archive.close()
+    
+    def abort(self):
+        """
+        Close and delete the unfinished archive, so that no valid-looking partial archive is left behind.
+        """
+        
+        try:
+            self.archive.close()
+        except (OSError, ValueError, zf.BadZipFile):
+            pass
+        try:
+            remove(self.filepath)
+        except OSError:
+            pass
+
+def repack(source, filepath, names=None, compress=True):
+    """
+    Copy entries of an archive to a new archive, without recompressing them.
+    
+    Can be used to prune unused resources from a library, or to split it,
+    by calling it once per part with the appropriate entries.
+    
+    Args:
+        source (str): Path to the existing archive.
+        filepath (str): Path to the new archive.
+        names (iterable[str] or None): Paths of the entries to be copied, None to copy all entries.
+        compress (bool): Use compression for entries that need to be written anew.
+    
+    Raises:
+        KeyError: If an entry is not in the source archive (the new archive is then deleted).
+    """
+    
+    archive = zf.ZipFile(source, 'r')
+    try:
+        pack = Repack(filepath, compress)
+        try:
+            pack.copy_all(archive, names)
+        except BaseException:
+            pack.abort()
+            raise
+        pack.close()
+    finally:
+        archive.close()
+
+class Update(object):
+    """
+    Add, replace or remove entries of an existing archive in place, without rewriting its other entries.
+    
+    New data is appended after the existing entries, and the central directory is rewritten when closing.
+    The deduplication state is rebuilt from the crc32 hashes and link comments of the central directory,
+    so new data identical to existing data is stored as a link, and the archive checksum is recomputed
+    from the crc32 hashes, without reading any unchanged data.
+    
+    The data of replaced and removed entries is left in the file, unreferenced, until the archive is repacked
+    (see 'repack'). Replacing an entry that others link to moves its previous data to the first of those links.
+    The archive is broken if the update is interrupted before closing. If it fails, 'abort' closes the archive
+    with its previous checksum, so that a partially applied update is reported when verifying it.
+    
+    Args:
+        filepath (str): Path to the existing archive.
+        compress (bool): Use compression for the new data.
+    
+    Attributes:
+        archive (zipfile.ZipFile): The archive being updated, open for appending.
+        unreferenced (int): Compressed size of the data left unreferenced in the file so far.
+    """
+    
+    def __init__(self, filepath, compress=True):
+        compression = zf.ZIP_DEFLATED if compress else zf.ZIP_STORED
+        self.archive = zf.ZipFile(filepath, 'a', compression)
+        self.unreferenced = 0
+        self._crcs = {}
+        self._links = {}
+        
+        meta = self.archive.comment.decode("utf-8").split(" ", 1)
+        self._meta = meta[1] if len(meta) == 2 else None
+        for info in self.archive.infolist():
+            if info.file_size == 0 and info.comment: #Link to identical data
+                self._links.setdefault(info.comment.decode("utf-8"), []).append(info.filename)
+            else:
+                self._crcs.setdefault(info.CRC, []).append(info.filename)
+    
+    def _relink(self, name, target):
+        self.archive.getinfo(name).comment = target.encode("utf-8")
+        self._links.setdefault(target, []).append(name)
+    
+    def _drop(self, name):
+        info = remove_entry(self.archive, name)
+        links = self._links.pop(name, [])
+        
+        if info.file_size == 0 and info.comment:
+            target = info.comment.decode("utf-8")
+            self._links[target].remove(name)
+            for link in links:
+                self._relink(link, target)
+            return
+        
+        self._crcs[info.CRC].remove(name)
+        if not self._crcs[info.CRC]:
+            del self._crcs[info.CRC]
+        
+        if links: #Keep the data the links point to, under the first of them
+            heir = links[0]
+            remove_entry(self.archive, heir)
+            write_raw(self.archive, copy_info(info, heir), read_raw(self.archive, info))
+            self._crcs.setdefault(info.CRC, []).append(heir)
+            for link in links[1:]:
+                self._relink(link, heir)
+        self.unreferenced += info.compress_size
+    
+    def write(self, source, destination):
+        """
+        Add an entry, or replace it if it exists, same as 'blib.utils.write'.
+        
+        Args:
+            source (str or bytes): The path to the file to be written or the data itself.
+            destination (str): The path within the archive to which the data should written.
+        """
+        
+        try:
+            self.archive.getinfo(destination)
+        except KeyError:
+            pass
+        else:
+            self._drop(destination)
+        
+        write(self.archive, source, destination, self._crcs)
+        info = self.archive.getinfo(destination)
+        if info.file_size == 0 and info.comment:
+            self._links.setdefault(info.comment.decode("utf-8"), []).append(destination)
+    
+    def remove(self, name):
+        """
+        Remove an entry.
+        
+        Args:
+            name (str): Path of the entry inside the archive.
+        
+        Raises:
+            KeyError: If the entry is not in the archive.
+        """
+        
+        self.archive.getinfo(name) #Raises KeyError if missing
+        self._drop(name)
+    
+    def close(self, meta=None):
+        """
+        Write the archive checksum and the central directory, and close the archive.
+        
+        Args:
+            meta (str or None): Blib meta-data to be stored after the checksum (e.g. "cycles 0.1.6 0.1.6").
+                None to keep the existing meta-data.
+        """
+        
+        if meta is None:
+            meta = self._meta
+        checksum = archive_sha1(self.archive).hexdigest()
+        if meta:
+            self.archive.comment = (checksum + " " + meta).encode("utf-8")
+        else:
+            self.archive.comment = checksum.encode("utf-8")
+        self.archive.close()
+    
+    def abort(self):
+        """
+        Close the archive without signing the changes made so far, keeping its previous checksum.
+        """
+        
+        try:
+            self.archive.close()
+        except (OSError, ValueError, zf.BadZipFile):
+            pass
+
+def update(filepath, entries=None, remove=(), compress=True):
+    """
+    Add, replace or remove entries of an existing archive in place (see 'Update').
+    
+    Args:
+        filepath (str): Path to the existing archive.
+        entries (dict or None): Source (file path or data) per destination path of the entries to be added or replaced.
+        remove (iterable[str]): Paths of the entries to be removed.
+        compress (bool): Use compression for the new data.
+    
+    Returns:
+        int: Compressed size of the data left unreferenced in the file.
+    
+    Raises:
+        KeyError: If an entry to be removed is not in the archive.
+        OSError: If a source file can't be read.
+            The changes applied before the error are not signed, so the checksum of the archive no longer matches.
+    """
+    
+    upd = Update(filepath, compress)
+    try:
+        for name in remove:
+            upd.remove(name)
+        for destination, source in (entries or {}).items():
+            upd.write(source, destination)
+    except BaseException:
+        upd.abort()
+        raise
+    upd.close()
+    return upd.unreferenced
@@ -0,0 +1,295 @@
+# ##### BEGIN GPL LICENSE BLOCK #####
+#
+# Part of the Blib package.
+# Blib cache: Caching of exported resources, for incremental re-exports.
+# Copyright (C) 2016  Luca Rood
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+
+# You should have received a copy of the GNU General Public License
+# along with this program.  If not, see <http://www.gnu.org/licenses/>.
+#
+# ##### END GPL LICENSE BLOCK #####
+
+"""Caching of exported resources, for incremental re-exports."""
+
+import zlib
+import zipfile as zf
+from binascii import crc32
+from collections import OrderedDict
+from hashlib import sha1
+from os import stat
+from time import localtime, time
+
+from .utils import write_raw
+
+DEFAULT_MAX_SIZE = 268435456
+
+class CachedResource(object):
+    """
+    Compressed data of a resource, as it is stored in an archive.
+    
+    Attributes:
+        fingerprint (tuple): (path, size, mtime) of the source file, or None if the source was data.
+        crc (int): crc32 hash of the uncompressed data.
+        digest (bytes): sha1 digest of the uncompressed data.
+        file_size (int): Size of the uncompressed data.
+        compress_type (int): Compression method of the data (zipfile.ZIP_DEFLATED or zipfile.ZIP_STORED).
+        data (bytes): The compressed data.
+    """
+    
+    __slots__ = ("fingerprint", "crc", "digest", "file_size", "compress_type", "data")
+    
+    def __init__(self, fingerprint, crc, digest, file_size, compress_type, data):
+        self.fingerprint = fingerprint
+        self.crc = crc
+        self.digest = digest
+        self.file_size = file_size
+        self.compress_type = compress_type
+        self.data = data
+
+def compress_resource(source, compress_type, fingerprint=None, stats=None):
+    """
+    Hash and compress a resource, reading the source only once.
+    
+    Args:
+        source (str or bytes): The path to the file, or the data itself.
+        compress_type (int): Compression method (zipfile.ZIP_DEFLATED or zipfile.ZIP_STORED).
+        fingerprint (tuple or None): Fingerprint of the source file, to be stored with the resource.
+        stats (blib.stats.Stats or None): Started stats in which to record the "hash" and "compress" phases,
+            and the bytes read from the source file. None to not record them.
+    
+    Returns:
+        blib.cache.CachedResource
+    """
+    
+    if compress_type == zf.ZIP_DEFLATED:
+        compressor = zlib.compressobj(zlib.Z_DEFAULT_COMPRESSION, zlib.DEFLATED, -15)
+    elif compress_type == zf.ZIP_STORED:
+        compressor = None
+    else:
+        raise ValueError("unsupported compression method '{}'".format(compress_type))
+    
+    crc = crc32(b"")
+    checksum = sha1()
+    size = 0
+    chunks = []
+    
+    f = open(source, 'rb') if isinstance(source, str) else None
+    while True:
+        if f is None:
+            data = source if size == 0 else b""
+        else:
+            data = f.read(1048576)
+        if not data:
+            break
+        crc = crc32(data, crc)
+        checksum.update(data)
+        size += len(data)
+        if stats is not None: #Reading is timed with hashing
+            stats.lap("hash")
+        chunks.append(compressor.compress(data) if compressor else data)
+        if stats is not None:
+            stats.lap("compress")
+    if f is not None:
+        f.close()
+    
+    if compressor:
+        chunks.append(compressor.flush())
+    if stats is not None:
+        if f is not None:
+            stats.add("bytes_read", size)
+        stats.lap("compress")
+    return CachedResource(fingerprint, crc, checksum.digest(), size, compress_type, b"".join(chunks))
+
+class ExportCache(object):
+    """
+    Cache of compressed resources and written archives, for incremental re-exports.
+    
+    Source files are identified by their (path, size, mtime) fingerprint, and resources given as data
+    by their sha1 digest, so unchanged resources are reused without reading the source again.
+    Archives whose structure and resources are unchanged since they were last written with this cache,
+    and which were not modified since, are not rewritten at all. That check only compares fingerprints,
+    so nothing is compressed for archives that are current.
+    
+    The same instance should be passed to every export that is meant to benefit from the cache.
+    
+    Args:
+        max_size (int or None): Maximum total size (in bytes) of the compressed data kept in the cache
+            (256 MiB by default). Least recently used resources are dropped first. None for no limit.
+    
+    Attributes:
+        max_size (int or None): Maximum total size of the compressed data kept in the cache.
+        size (read-only[int]): Current total size of the compressed data kept in the cache.
+    """
+    
+    def __init__(self, max_size=DEFAULT_MAX_SIZE):
+        self.max_size = max_size
+        self._resources = OrderedDict()
+        self._archives = {}
+        self._size = 0
+    
+    def __len__(self):
+        return len(self._resources)
+    
+    @property
+    def size(self):
+        return self._size
+    
+    def clear(self):
+        """Drop all cached resources and archive records."""
+        self._resources.clear()
+        self._archives.clear()
+        self._size = 0
+    
+    def get(self, source, compress_type, stats=None):
+        """
+        Get the compressed resource for a source, compressing it only if it is not cached or has changed.
+        
+        Args:
+            source (str or bytes): The path to the file, or the data itself.
+            compress_type (int): Compression method (zipfile.ZIP_DEFLATED or zipfile.ZIP_STORED).
+            stats (blib.stats.Stats or None): Same as in 'compress_resource'.
+        
+        Returns:
+            blib.cache.CachedResource
+        """
+        
+        if isinstance(source, str):
+            st = stat(source)
+            fingerprint = (source, st.st_size, st.st_mtime_ns)
+            key = (source, compress_type)
+        else:
+            fingerprint = None
+            key = (sha1(source).digest(), compress_type)
+        if stats is not None:
+            stats.lap("hash")
+        
+        res = self._resources.get(key)
+        if res is not None and res.fingerprint == fingerprint:
+            self._resources.move_to_end(key)
+            return res
+        
+        if res is not None:
+            self._remove(key)
+        res = compress_resource(source, compress_type, fingerprint, stats)
+        self._resources[key] = res
+        self._size += len(res.data)
+        
+        if self.max_size is not None:
+            while self._size > self.max_size and len(self._resources) > 1:
+                self._remove(next(iter(self._resources)))
+        return res
+    
+    def _remove(self, key):
+        res = self._resources.pop(key)
+        self._size -= len(res.data)
+    
+    def write(self, archive, source, destination, crcs, digests, stats=None):
+        """
+        Cached equivalent of 'blib.utils.write'.
+        
+        Identical data is detected by comparing sha1 digests, instead of reading both files.
+        
+        Args:
+            archive (zipfile.ZipFile): The archive to which to write the data.
+            source (str or bytes): The path to the file to be written or the data itself.
+            destination (str): The path within the archive to which the data should written.
+            crcs (dict): A dictionary containing crc32 hashes to all files in archive.
+                Same dict should be passed every time you write to the same archive.
+            digests (dict): A dictionary containing sha1 digests of all files in archive.
+                Same dict should be passed every time you write to the same archive.
+            stats (blib.stats.Stats or None): Started stats in which to record the "hash", "compress" and "write" phases,
+                and the bytes read from the source file. None to not record them.
+        """
+        
+        res = self.get(source, archive.compression, stats)
+        if res.crc in crcs:
+            for zpath in crcs[res.crc]:
+                if digests.get(zpath) == res.digest:
+                    archive.writestr(destination, b"")
+                    archive.getinfo(destination).comment = zpath.encode("utf-8")
+                    if stats is not None:
+                        stats.lap("write")
+                    return
+            crcs[res.crc].append(destination)
+        else:
+            crcs[res.crc] = [destination]
+        
+        digests[destination] = res.digest
+        info = zf.ZipInfo(destination, localtime(time())[:6])
+        info.compress_type = res.compress_type
+        info.external_attr = 0o600 << 16
+        info.CRC = res.crc
+        info.file_size = res.file_size
+        write_raw(archive, info, res.data)
+        if stats is not None:
+            stats.lap("write")
+    
+    def signature(self, xml, resources, compress_type):
+        """
+        Generate a signature of the content of an archive, from the fingerprints of its resources.
+        
+        Source files are identified by their (path, size, mtime) fingerprint and data by its sha1 digest,
+        so nothing is compressed, and files are not read.
+        
+        Args:
+            xml (bytes): The archive structure.
+            resources (list[tuple]): List of (source, destination) pairs of the resources in the archive.
+            compress_type (int): Compression method of the archive.
+        
+        Returns:
+            str: Hex digest identifying the content.
+        """
+        
+        checksum = sha1(xml)
+        checksum.update(str(compress_type).encode("utf-8"))
+        for source, destination in resources:
+            checksum.update(destination.encode("utf-8"))
+            if isinstance(source, str):
+                st = stat(source)
+                checksum.update("\0{}\0{}\0{}\0".format(source, st.st_size, st.st_mtime_ns).encode("utf-8"))
+            else:
+                checksum.update(sha1(source).digest())
+        return checksum.hexdigest()
+    
+    def is_current(self, filepath, signature):
+        """
+        Check if an archive was written with this cache, with the same signature, and not modified since.
+        
+        Args:
+            filepath (str): Path to the archive.
+            signature (str): Signature of the content about to be written.
+        
+        Returns:
+            bool
+        """
+        
+        record = self._archives.get(filepath)
+        if record is None or record[0] != signature:
+            return False
+        try:
+            st = stat(filepath)
+        except OSError:
+            return False
+        return record[1:] == (st.st_size, st.st_mtime_ns)
+    
+    def set_current(self, filepath, signature):
+        """
+        Record that an archive has just been written with the given signature.
+        
+        Args:
+            filepath (str): Path to the archive.
+            signature (str): Signature of the content that was written.
+        """
+        
+        st = stat(filepath)
+        self._archives[filepath] = (signature, st.st_size, st.st_mtime_ns)
@@ -19,13 +19,29 @@
 #
 # ##### END GPL LICENSE BLOCK #####
 
-"""Cycles export/import as per the Blib standard."""
+"""
+Cycles export/import as per the Blib standard.
+
+The export and import functions depend on Blender, and are only imported when first accessed,
+so the bpy independent modules of this package (e.g. 'utils' and 'plan') can be used outside Blender.
+"""
+
+from sys import version_info
 
-from .bexport import bexport
-from .bimport import bimport
-from .generate_xml import generate_xml
 from .version import version as ver
+from ..utils import lazy_package
+
+attributes = {
+    "bexport": (".bexport", "bexport"),
+    "bimport": (".bimport", "bimport"),
+    "generate_xml": (".generate_xml", "generate_xml"),
+    "ImportSession": (".session", "ImportSession"),
+}
+if version_info >= (3, 5): #Async syntax
+    attributes["bexport_async"] = (".aio", "bexport_async")
+    attributes["bimport_async"] = (".aio", "bimport_async")
+lazy_package(__name__, attributes)
 
-__all__ = ["bexport", "bimport", "generate_xml"]
+__all__ = sorted(attributes)
 __version__ = ver.decorated
 __author__ = 'Luca Rood'
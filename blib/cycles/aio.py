@@ -0,0 +1,107 @@
+# ##### BEGIN GPL LICENSE BLOCK #####
+#
+# Part of the Blib package.
+# Blib cycles aio: Asynchronous export and import of Cycles materials.
+# Copyright (C) 2016  Luca Rood
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+
+# You should have received a copy of the GNU General Public License
+# along with this program.  If not, see <http://www.gnu.org/licenses/>.
+#
+# ##### END GPL LICENSE BLOCK #####
+
+"""
+Asynchronous export and import of Cycles materials and node groups (requires Python 3.5).
+
+The archive work of an export or import (file I/O, hashing, compression, verification and extraction)
+runs in an executor, and only the Blender operations run on the event loop's thread, which must be
+the thread Blender runs on. Other tasks of the loop make progress while archives are being processed:
+    
+    materials = await asyncio.gather(bimport_async(path_a), bimport_async(path_b))
+
+Imports sharing a session should not run concurrently, as the session's resource state is not locked.
+Phase times recorded in 'blib.stats.Stats' include the time spent waiting for other tasks.
+"""
+
+import asyncio
+
+from .bexport import export_steps
+from .bimport import import_steps
+
+async def run_steps_async(steps, executor=None):
+    """
+    Run an operation split into steps, with the steps that don't use Blender in an executor.
+    
+    Same as 'blib.utils.run_steps', but each yielded step runs in the executor,
+    while the operation itself resumes on the event loop's thread.
+    
+    Args:
+        steps (generator): The operation, yielding (function, args) pairs, and returning its result.
+        executor (concurrent.futures.Executor or None): Executor running the steps, None for the loop's default executor.
+    
+    Returns:
+        The result of the operation.
+    """
+    
+    if hasattr(asyncio, "get_running_loop"):
+        loop = asyncio.get_running_loop()
+    else: #Python < 3.7, where the event loop of the current thread is the one running this coroutine
+        loop = asyncio.get_event_loop()
+    result = None
+    try:
+        while True:
+            func, args = steps.send(result)
+            result = await loop.run_in_executor(executor, func, *args)
+    except StopIteration as e:
+        return e.value
+    finally:
+        steps.close()
+
+async def bexport_async(asset, filepath, executor=None, **options):
+    """
+    Export a Cycles material or node group to a .blib file, writing the archive in an executor.
+    
+    Args:
+        asset (bpy.types.Material or bpy.types.ShaderNodeTree): The asset to be exported.
+        filepath (str): Path to save the file.
+        executor (concurrent.futures.Executor or None): Executor writing the archive, None for the loop's default executor.
+        **options: Same as 'blib.cycles.bexport'.
+    
+    Returns:
+        Same as 'blib.cycles.bexport'.
+    
+    Raises:
+        Same as 'blib.cycles.bexport'.
+    """
+    
+    return await run_steps_async(export_steps(asset, filepath, **options), executor)
+
+async def bimport_async(filepath, executor=None, **options):
+    """
+    Import a Cycles material or node group from a .blib or .xml file, processing the archive in an executor.
+    
+    Opening, verifying and compiling the file, and extracting the images run in the executor.
+    With "lazy_images", images are extracted on the loop's thread when first used instead.
+    
+    Args:
+        filepath (str): Path to .blib or .xml file.
+        executor (concurrent.futures.Executor or None): Executor processing the archive, None for the loop's default executor.
+        **options: Same as 'blib.cycles.bimport'.
+    
+    Returns:
+        Same as 'blib.cycles.bimport'.
+    
+    Raises:
+        Same as 'blib.cycles.bimport'.
+    """
+    
+    return await run_steps_async(import_steps(filepath, **options), executor)
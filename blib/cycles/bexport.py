@@ -21,128 +21,162 @@
 
 import bpy
 
-import re
 import zipfile as zf
-from os import path, listdir
+from os import path
 
 from .version import version, compatible
 from .generate_xml import generate_xml
 from .utils import check_asset
-from ..utils import archive_sha1, write
+from ..utils import archive_sha1, write, run_steps
+from ..stats import Stats
+from ..report import Report
 
-def file_int(f):
-    return int(re.sub(r".*?([0-9]+)$", r"\1", f))
-
-def find_range(files, val, lower):
-    low = 0
-    high = len(files) - 1
-    while files[low] <= val and files[high] >= val:
-        if low == high:
-            mid = low
-        else:
-            mid = low + ((val - files[low]) * (high - low)) // (files[high] - files[low])
-        
-        val = files[mid]
-        if files[mid] < val:
-            low = mid + 1
-        elif files[mid] > val:
-            high = mid - 1
-        else:
-            return mid
+def write_archive(filepath, xml, resources, compression, cache, stats):
+    """
+    Write the structure and resources of an export to a .blib file, without using Blender.
+    
+    Args:
+        filepath (str): Absolute path to save the file.
+        xml (bytes): The structure.
+        resources (list[tuple]): (source, destination) pairs of the resources, source being a file path or data.
+        compression (int): Compression method (zipfile.ZIP_DEFLATED or zipfile.ZIP_STORED).
+        cache (blib.cache.ExportCache or None): Same as in 'bexport'.
+        stats (blib.stats.Stats): Stats in which to record the "signature", "hash", "compress", "write", "checksum"
+            and "close" phases.
+    """
+    
+    if cache is not None:
+        signature = cache.signature(xml, resources, compression)
+        stats.lap("signature")
+        if cache.is_current(filepath, signature): #Nothing changed since last export, keep existing file
+            return
+    
+    archive = zf.ZipFile(filepath, 'w', compression) #Create archive
+    archive.writestr('structure.xml', xml) #Write XML to archive
+    stats.lap("write")
+    crcs = {}
+    digests = {}
     
-    if lower:
-        if val < files[0]:
-            return 0
+    #Write resources to archive
+    for source, destination in resources:
+        if cache is None:
+            write(archive, source, destination, crcs, stats)
         else:
-            if files[mid] > val:
-                return mid
-            else:
-                return mid + 1
-    else:
-        if val > files[-1]:
-            return len(files) - 1
+            cache.write(archive, source, destination, crcs, digests, stats)
+    stats.lap("write")
+    
+    checksum = archive_sha1(archive)
+    stats.lap("checksum")
+    
+    for info in archive.infolist():
+        if info.file_size == 0 and info.comment: #Link to identical data
+            stats.add("bytes_deduplicated", archive.getinfo(info.comment.decode("utf-8")).file_size)
         else:
-            if files[mid] < val:
-                return mid
-            else:
-                return mid - 1
+            stats.add("bytes_stored", info.file_size)
+            stats.add("bytes_written", info.compress_size)
+    
+    comment = checksum.hexdigest() + " cycles " + str(version) + " " + str(compatible)
+    
+    archive.comment = comment.encode("utf-8")
+    
+    archive.close()
+    
+    if cache is not None:
+        cache.set_current(filepath, signature)
+    stats.lap("close")
 
-def bexport(asset, filepath, imgi_export=True, imge_export=True, seq_export=True, mov_export=True,
-        txti_export=True, txte_export=True, script_export=True, optimize_file=False, compress=True):
+def export_steps(asset, filepath, imgi_export=True, imge_export=True, seq_export=True, mov_export=True,
+                 txti_export=True, txte_export=True, script_export=True, optimize_file=False, compress=True, cache=None, report=None,
+                 stats=None, return_report=False):
     """
-    Export a Cycles material or node group to a .blib file.
-    
-    Args:
-        asset (bpy.types.Material or bpy.types.ShaderNodeTree): The asset to be exported,
-            has to be Cycles object, no other renderers supported.
-        filepath (str): Path to save the file.
-        imgi_export (bool): Export images that are packed in .blend file.
-        imge_export (bool): Export images that are externally saved.
-        seq_export (bool): Export image sequences.
-        mov_export (bool): Export movies.
-        txti_export (bool): Export texts that are packed in .blend file.
-        txte_export (bool): Export texts that are externally saved.
-        script_export (bool): Export scripts that are referenced by path in "script" node.
-        optimize_file (bool): Optimize file, by not including variables qual to None or "".
-        compress (bool): Use compression on the zip container.
+    Export a Cycles material or node group, as a generator of steps (see 'blib.utils.run_steps').
     
-    Raises:
-        blib.exeptions.InvalidObject: If the 'asset' argument is not a Cycles material or node tree.
+    Same arguments as 'bexport'. Writing the archive is yielded as a step that doesn't use Blender.
     """
     
     check_asset(asset, True)
     
     filepath = bpy.path.abspath(filepath) #Ensure path is absolute
+    stats = Stats() if stats is None else stats
+    stats.start("export", filepath)
+    failed = Report() if report is None else report
     xml, imgs, txts = generate_xml(asset, imgi_export, imge_export, seq_export, mov_export, txti_export,
-                                   txte_export, script_export, optimize_file, True, False, False) #Generate XML
+                                   txte_export, script_export, optimize_file, True, False, False, failed, stats) #Generate XML
+    if report is None:
+        for line in failed.summary("exported"):
+            print(line)
+    stats.lap("xml")
     compression = zf.ZIP_DEFLATED if compress else zf.ZIP_STORED
-    archive = zf.ZipFile(filepath, 'w', compression) #Create archive
-    archive.writestr('structure.xml', xml) #Write XML to archive
-    crcs = {}
+    resources = []
     
-    #Write text files to archive
+    #List text files
     for txt in txts:
         if "text" in txt:
-            write(archive, txt["text"].as_string().encode("utf-8"), txt["destination"], crcs)
+            resources.append((txt["text"].as_string().encode("utf-8"), txt["destination"]))
         else:
-            write(archive, txt["source"], txt["destination"], crcs)
+            resources.append((txt["source"], txt["destination"]))
     
-    #Write images to archive
+    #List images
     for img in imgs:
         if img["image"].source == 'SEQUENCE':
             ### Image sequence code
-            p, f = path.split(bpy.path.abspath(img["image"].filepath))
-            n, e = path.splitext(f)
-            base = re.sub(r"[0-9]+$", "", n)
-            files = [path.splitext(fil)[0] for fil in listdir(p) if path.isfile(path.join(p, fil)) and \
-                     re.match(r"^" + re.escape(base) + r"[0-9]+" + re.escape(e) + r"$", fil)]
-            files.sort(key=file_int)
-            files_int = [file_int(fil) for fil in files]
-            start = find_range(files_int, img["range"][0], True)
-            end = find_range(files_int, img["range"][1], False)
-            for i in range(start, end + 1):
-                source = path.join(p, files[i] + e)
-                destination = img["destination"] + "/" + files[i] + e
-                write(archive, source, destination, crcs)
-            
-            if not img["destination"] + "/" + bpy.path.basename(img["image"].filepath) in archive.namelist():
-                source = bpy.path.abspath(img["image"].filepath)
-                destination = img["destination"] + "/" + bpy.path.basename(img["image"].filepath)
-                write(archive, source, destination, crcs)
+            p = path.dirname(bpy.path.abspath(img["image"].filepath))
+            for fil in img["frames"]: #Frames listed by 'generate_xml', including the one the image points to
+                source = path.join(p, fil)
+                destination = img["destination"] + "/" + fil
+                resources.append((source, destination))
         else:
             if img["image"].packed_file is None:
                 source = bpy.path.abspath(img["image"].filepath)
                 destination = img["destination"]
-                write(archive, source, destination, crcs)
+                resources.append((source, destination))
             else:
                 source = img["image"].packed_file.data
                 destination = img["destination"]
-                write(archive, source, destination, crcs)
+                resources.append((source, destination))
     
-    checksum = archive_sha1(archive)
+    stats.lap("scan")
     
-    comment = checksum.hexdigest() + " cycles " + str(version) + " " + str(compatible)
+    yield write_archive, (filepath, xml, resources, compression, cache, stats)
+    stats.finish()
+    if return_report:
+        return failed
+
+def bexport(asset, filepath, imgi_export=True, imge_export=True, seq_export=True, mov_export=True,
+        txti_export=True, txte_export=True, script_export=True, optimize_file=False, compress=True, cache=None, report=None,
+        stats=None, return_report=False):
+    """
+    Export a Cycles material or node group to a .blib file.
     
-    archive.comment = comment.encode("utf-8")
+    Args:
+        asset (bpy.types.Material or bpy.types.ShaderNodeTree): The asset to be exported,
+            has to be Cycles object, no other renderers supported.
+        filepath (str): Path to save the file.
+        imgi_export (bool): Export images that are packed in .blend file.
+        imge_export (bool): Export images that are externally saved.
+        seq_export (bool): Export image sequences.
+        mov_export (bool): Export movies.
+        txti_export (bool): Export texts that are packed in .blend file.
+        txte_export (bool): Export texts that are externally saved.
+        script_export (bool): Export scripts that are referenced by path in "script" node.
+        optimize_file (bool): Optimize file, by not including variables qual to None or "".
+        compress (bool): Use compression on the zip container.
+        cache (blib.cache.ExportCache or None): Cache to reuse compressed resources from previous exports.
+            Unchanged resources are not read again, and if the whole archive is unchanged, it is not rewritten.
+            None to disable caching.
+        report (blib.report.Report or None): Report in which to record failures.
+            None to print a summary of the failures to the console instead.
+        stats (blib.stats.Stats or None): Stats in which to record the time of each phase ("xml", "scan", "signature",
+            "hash", "compress", "write", "checksum", "close"), and the bytes and structure counters.
+            None to only report to 'blib.stats.callbacks'.
+        return_report (bool): Return the report of the failures (the passed report, or a new one).
     
-    archive.close()
+    Returns:
+        blib.report.Report or None: The report of the failures with "return_report", None otherwise.
+    
+    Raises:
+        blib.exeptions.InvalidObject: If the 'asset' argument is not a Cycles material or node tree.
+    """
+    
+    return run_steps(export_steps(asset, filepath, imgi_export, imge_export, seq_export, mov_export, txti_export, txte_export,
+                                  script_export, optimize_file, compress, cache, report, stats, return_report))
@@ -23,30 +23,559 @@ import bpy
 
 import re
 import zipfile as zf
-import xml.etree.cElementTree as ET
-from ast import literal_eval
-from os import path, listdir, makedirs, remove
-from shutil import rmtree
+import xml.etree.ElementTree as ET
+from binascii import crc32
+from os import path, makedirs, remove, cpu_count
+from shutil import rmtree, copyfileobj
+from threading import Lock, Thread
 
 from .version import version
-from ..utils import files_equal, archive_sha1, fail, extract, get_path
-from ..utils import Version, ResourceDir
+from .plan import compile_structure, cache as shared_plans
+from ..utils import files_equal, archive_sha1, fail, extract, get_path, run_steps
+from ..utils import Version, ResourceDir, FrameIndex, EntryIndex
+from ..archive import verify
+from ..remote import is_url, extension, open_archive, RemoteFile
+from ..report import Report
+from ..stats import Stats
 from ..exceptions import InvalidBlibFile, BlibVersionError, BlibTypeError
 
-def extract_image(archive, source, destination, path_dict, failed):
+def extract_jobs(archive, jobs, threads=None):
+    """
+    Extract files from an archive, spreading them across a thread pool.
+    
+    Each thread reads through its own handle of the archive, so decompression and disk writes overlap across cores.
+    
+    Args:
+        archive (zipfile.ZipFile): The archive from which to extract.
+        jobs (list[tuple]): (source, destination) pairs, source being the resolved path inside the archive,
+            and destination the path of the file to be written.
+        threads (int or None): Number of threads, None to use one per core.
+    
+    Returns:
+        set: Destinations that failed to be extracted (their partially written files are deleted),
+            including all remaining ones if no thread could open the archive.
+    """
+    
+    if archive.filename is None: #No path to open more handles from
+        threads = 1
+    elif threads is None:
+        threads = cpu_count() or 1
+    threads = max(1, min(threads, len(jobs)))
+    
+    queue = iter(jobs)
+    lock = Lock()
+    broken = set()
+    
+    def worker():
+        try:
+            handle = archive if threads == 1 else zf.ZipFile(archive.filename, 'r')
+        except (OSError, zf.BadZipFile): #Leave the jobs to the other threads
+            return
+        try:
+            while True:
+                with lock:
+                    job = next(queue, None)
+                if job is None:
+                    return
+                written = False
+                try:
+                    with handle.open(job[0], 'r') as src:
+                        with open(job[1], 'wb') as dst:
+                            written = True
+                            copyfileobj(src, dst)
+                except (KeyError, OSError, zf.BadZipFile):
+                    broken.add(job[1])
+                    if written: #Don't leave a partial file behind
+                        try:
+                            remove(job[1])
+                        except OSError:
+                            pass
+        finally:
+            if handle is not archive:
+                handle.close()
+    
+    if threads == 1:
+        worker()
+    else:
+        pool = [Thread(target=worker) for _ in range(threads)]
+        for thread in pool:
+            thread.start()
+        for thread in pool:
+            thread.join()
+    
+    for job in queue: #Left by threads that could not open the archive
+        broken.add(job[1])
+    return broken
+
+def tag(datablock, checksum, value, key="blib_name"):
+    """
+    Tag a datablock with the checksum of the archive it was imported from.
+    
+    Args:
+        datablock (bpy.types.ID): The imported datablock.
+        checksum (str): Verified checksum of the archive.
+        value (str): Identifier of the datablock within the archive (e.g. its name in the structure).
+        key (str): Custom property holding the identifier.
+    """
+    
+    datablock["blib_checksum"] = checksum
+    datablock[key] = value
+
+def find_tagged(collection, checksum, key="blib_name"):
+    """
+    Find the datablocks that were imported from an archive.
+    
+    Args:
+        collection (bpy.types.bpy_prop_collection): Datablocks to search (e.g. bpy.data.node_groups).
+        checksum (str or None): Verified checksum of the archive, None to find datablocks from any archive.
+        key (str): Custom property holding the identifiers.
+    
+    Returns:
+        dict: Datablocks by identifier.
+    """
+    
+    tagged = {}
+    for datablock in collection:
+        if (checksum is None or datablock.get("blib_checksum") == checksum) and datablock.get(key) is not None:
+            tagged[datablock[key]] = datablock
+    return tagged
+
+def tag_scripts(scripts, checksum):
+    if checksum is not None:
+        for spath, script in scripts.items():
+            if not isinstance(script, str): #Internal script text, not a file path
+                tag(script, checksum, spath, "blib_path")
+
+class ResourceHashes(object):
+    """
+    crc32 hashes of the image resources, as stored in the "list.sfv" file of the images resource directory.
+    
+    The file is read on first use, and only written back by 'save' if the hashes have changed,
+    so several imports sharing an instance read and write it only once.
+    
+    Args:
+        root (str): Path to the images resource directory.
+    
+    Attributes:
+        root (str): Path to the images resource directory.
+        hashes (read-only[dict]): Paths of the resources (relative to 'root') per crc32 hash (as hex string).
+    """
+    
+    def __init__(self, root):
+        self.root = root
+        self._hashes = None
+        self._backup = None
+        self._update = False
+    
+    @property
+    def hashes(self):
+        if self._hashes is None:
+            self._load()
+        return self._hashes
+    
+    def _load(self):
+        self._hashes = {}
+        hash_path = path.join(self.root, "list.sfv")
+        if path.isfile(hash_path):
+            sfv = re.compile(r"(.*) (.*?)$")
+            hash_file = open(hash_path, 'r', encoding="utf-8")
+            for line in hash_file:
+                key = sfv.sub(r"\2", line).strip()
+                val = sfv.sub(r"\1", line).strip()
+                if key in self._hashes and val in self._hashes[key]:
+                    self._update = True
+                else:
+                    self._hashes.setdefault(key, []).append(val)
+            hash_file.close()
+        self._backup = {key: list(vals) for key, vals in self._hashes.items()}
+    
+    def save(self):
+        """Write the hashes to the "list.sfv" file, if they were loaded and have changed."""
+        
+        if self._hashes is not None and (self._hashes != self._backup or self._update):
+            hash_path = path.join(self.root, "list.sfv")
+            hash_file = open(hash_path, 'w', encoding="utf-8")
+            for key in self._hashes:
+                for val in self._hashes[key]:
+                    hash_file.write(val + " " + key + "\n")
+            hash_file.close()
+            self._backup = {key: list(vals) for key, vals in self._hashes.items()}
+            self._update = False
+
+class TextDir(object):
+    """
+    Directory in which the text and script files of imports are saved, shared by the imports of a session.
+    
+    Files are saved to a single numbered directory of the texts resources, created when first needed.
+    A file whose name is already taken there (by a text with other content) is saved to a new numbered directory.
+    
+    Args:
+        resource_path (str or None): Custom path to save external resources or None to keep the default path.
+    """
+    
+    def __init__(self, resource_path):
+        self._resource_path = resource_path
+        self._dirs = [ResourceDir("texts", resource_path)]
+    
+    def path(self, name):
+        """
+        Get the directory in which to save a file.
+        
+        Args:
+            name (str): Name of the file.
+        
+        Returns:
+            str: Path to the directory.
+        """
+        
+        for res_dir in self._dirs:
+            if not res_dir or not path.exists(path.join(str(res_dir), name)):
+                return str(res_dir)
+        self._dirs.append(ResourceDir("texts", self._resource_path))
+        return str(self._dirs[-1])
+
+class ImageImporter(object):
+    """
+    Extracts the images of a Blib archive and loads them in Blender, each only once.
+    
+    Extraction is planned first, then run on a worker pool (see 'extract_jobs'),
+    and the images are loaded in Blender on the calling thread once their files are ready.
+    Sequence frames are only extracted within the frame window set in 'windows' (plus the frame the image points to).
+    
+    Args:
+        archive (zipfile.ZipFile): The archive containing the images.
+        ximgs (list[blib.cycles.plan.ResourcePlan]): The images of the import plan.
+        resource_path (str or None): Custom path to save external resources or None to keep the default path.
+        failed (blib.report.Report): Report in which to record failures.
+        imgi_import, imge_import, seq_import, mov_import, img_embed, img_merge: Same as in 'bimport'.
+        threads (int or None): Number of extraction threads, None to use one per core.
+        index (blib.utils.EntryIndex or None): Index of the archive entries, None to build it when first needed.
+        hashes (blib.cycles.bimport.ResourceHashes or None): Shared resource hashes, saved by their owner.
+            None to use hashes of this importer's own, saved on 'close'.
+    
+    Attributes:
+        windows (dict): [start, end] frame window per image name (see 'frame_windows').
+            All frames are extracted for sequences without a window.
+        index (blib.utils.EntryIndex or None): Index of the archive entries.
+        checksum (str or None): Verified checksum of the archive, to tag loaded images with. None to not tag them.
+        stats (blib.stats.Stats or None): Stats in which to count extracted and deduplicated bytes.
+        reused (dict): Existing images by name, used instead of importing the images again.
+    """
+    
+    def __init__(self, archive, ximgs, resource_path, failed, imgi_import=True, imge_import=True, seq_import=True,
+                 mov_import=True, img_embed=False, img_merge=True, threads=None, index=None, hashes=None):
+        self.archive = archive
+        self.failed = failed
+        self.windows = {}
+        self.imgi_import = imgi_import
+        self.imge_import = imge_import
+        self.seq_import = seq_import
+        self.mov_import = mov_import
+        self.img_embed = img_embed
+        self.img_merge = img_merge
+        self.threads = threads
+        self.index = index
+        self.checksum = None
+        self.stats = None
+        self.reused = {}
+        self._ximgs = {ximg.attrib["name"]: ximg for ximg in ximgs}
+        self._images = {}
+        self._img_dir = ResourceDir("images", resource_path)
+        self._tmp_dir = ResourceDir("tmp", resource_path)
+        self._path_dict = {}
+        self._pending = set()
+        self._unregistered = {}
+        self._tmp_files = []
+        self._own_hashes = hashes is None
+        self._hashes = ResourceHashes(self._img_dir.root) if hashes is None else hashes
+    
+    def __iter__(self):
+        return iter(self._ximgs)
+    
+    def get(self, name):
+        """
+        Get an image, extracting and loading it if it was not yet requested.
+        
+        Args:
+            name (str): Name of the image in the structure.
+        
+        Returns:
+            bpy.types.Image or None: The loaded image, or None if it is not imported, or failed to be imported.
+        """
+        
+        if name not in self._images:
+            self.prefetch([name])
+        return self._images[name]
+    
+    def prefetch(self, names):
+        """
+        Extract and load several images at once, so that all their files are extracted in parallel.
+        
+        Args:
+            names (iterable[str]): Names of the images in the structure.
+        """
+        
+        self.load(self.extract(names))
+    
+    def extract(self, names):
+        """
+        Extract the files of several images in parallel, without loading them in Blender (see 'load').
+        
+        Doesn't use Blender, so it can run outside of the main thread.
+        
+        Args:
+            names (iterable[str]): Names of the images in the structure.
+        
+        Returns:
+            list[tuple]: (name, plan, path) of the extracted images, to be passed to 'load'.
+        """
+        
+        planned = []
+        jobs = []
+        for name in names:
+            if name in self._images:
+                continue
+            if name in self.reused:
+                self._images[name] = self.reused[name]
+                continue
+            ximg = self._ximgs.get(name)
+            if ximg is None or not self._wanted(ximg):
+                self._images[name] = None
+                continue
+            
+            ipath, img_jobs = self._plan(ximg)
+            if ipath is None:
+                self._images[name] = None
+            else:
+                planned.append((name, ximg, ipath, img_jobs))
+                jobs.extend(img_jobs)
+        
+        broken = extract_jobs(self.archive, jobs, self.threads) if jobs else set()
+        self._pending.clear()
+        
+        #Only register the hashes of merged images once their files are fully written
+        hash_dict = self._hashes.hashes if self._unregistered else None
+        for d_path, crc in self._unregistered.items():
+            if d_path not in broken:
+                hash_dict.setdefault(crc, []).append(path.relpath(d_path, self._img_dir.root))
+        self._unregistered.clear()
+        
+        if self.stats is not None:
+            for s_path, d_path in jobs:
+                if d_path not in broken:
+                    info = self.archive.getinfo(s_path)
+                    self.stats.add("bytes_read", info.compress_size)
+                    self.stats.add("bytes_written", info.file_size)
+        
+        extracted = []
+        for name, ximg, ipath, img_jobs in planned:
+            for job in img_jobs:
+                if job[1] in broken:
+                    fail(self.failed, "images", "extract image '{}', unknown reason".format(job[0]))
+            if ipath in broken:
+                if ximg.attrib["source"] == 'SEQUENCE':
+                    rmtree(path.dirname(ipath))
+                self._images[name] = None
+            else:
+                extracted.append((name, ximg, ipath))
+        return extracted
+    
+    def load(self, extracted):
+        """
+        Load extracted images in Blender.
+        
+        Args:
+            extracted (list[tuple]): The images returned by 'extract'.
+        """
+        
+        for name, ximg, ipath in extracted:
+            self._images[name] = self._load(ximg, ipath)
+            if self._images[name] is not None and self.checksum is not None:
+                tag(self._images[name], self.checksum, name)
+    
+    def _wanted(self, ximg):
+        source = ximg.attrib["source"]
+        if source in {'FILE', 'GENERATED'}:
+            if ximg.attrib["origin"] == "internal":
+                return self.imgi_import
+            else:
+                return self.imge_import
+        elif source == 'SEQUENCE':
+            return self.seq_import
+        elif source == 'MOVIE':
+            return self.mov_import
+        return True
+    
+    def _embed(self, ximg):
+        return ximg.attrib["source"] in {'FILE', 'GENERATED'} and \
+               (self.img_embed or (self.img_embed is None and ximg.attrib["origin"] == "internal"))
+    
+    def _extract(self, source, directory, jobs):
+        try:
+            s_path = get_path(self.archive, source)
+        except KeyError:
+            fail(self.failed, "images", "import image '{}', file is missing".format(source))
+            return None
+        
+        d_path = path.join(directory, path.basename(source))
+        self._path_dict[source] = d_path
+        self._pending.add(d_path)
+        jobs.append((s_path, d_path))
+        return d_path
+    
+    def _plan(self, ximg):
+        jobs = []
+        if self._embed(ximg): #Write image to temporary folder, to be packed in Blender
+            ipath = self._extract(ximg.attrib["path"], str(self._tmp_dir), jobs)
+            if ipath is not None:
+                self._tmp_files.append(ipath)
+        elif ximg.attrib["source"] == 'SEQUENCE': #Write frames to resource folder
+            ipath = self._plan_sequence(ximg, jobs)
+        elif self.img_merge: #Use existing image in resources if available
+            ipath = self._merge(ximg, jobs)
+        else: #Use image in archive, even if duplicate
+            ipath = self._extract(ximg.attrib["path"], str(self._img_dir), jobs)
+        return ipath, jobs
+    
+    def _load(self, ximg, ipath):
+        try:
+            img = bpy.data.images.load(ipath)
+        except:
+            fail(self.failed, "images", "import image '{}', unknown reason".format(ximg.attrib["path"]))
+            return None
+        
+        img.source = ximg.attrib["source"]
+        if self._embed(ximg):
+            try:
+                img.pack()
+            except:
+                bpy.data.images.remove(img)
+                fail(self.failed, "images", "pack image '{}', unknown reason".format(ximg.attrib["path"]))
+                return None
+            img.filepath = ""
+        return img
+    
+    def _frames(self, ximg):
+        if self.index is None: #List the archive only once
+            self.index = EntryIndex(self.archive)
+        
+        seq_dir, base = ximg.attrib["path"].rsplit("/", 1)
+        names = self.index.listdir(seq_dir)
+        window = self.windows.get(ximg.attrib["name"])
+        if window is not None:
+            names = FrameIndex(seq_dir, names).find_range(base, window[0], window[1])
+            if base not in names:
+                names.append(base)
+        return [seq_dir + "/" + name for name in names]
+    
+    def _plan_sequence(self, ximg, jobs):
+        dir_name = ximg.attrib["path"].split("/")[-2]
+        seq_path = path.join(str(self._img_dir), dir_name)
+        seq_jobs = []
+        ipath = None
+        for frame in self._frames(ximg):
+            fpath = self._extract(frame, seq_path, seq_jobs)
+            if frame == ximg.attrib["path"]:
+                ipath = fpath
+                if ipath is None:
+                    break
+        if ipath is not None:
+            makedirs(seq_path)
+            jobs.extend(seq_jobs)
+        return ipath
+    
+    def _merge(self, ximg, jobs):
+        try:
+            comment = self.archive.getinfo(ximg.attrib["path"]).comment.decode("utf-8")
+            img_path = get_path(self.archive, ximg.attrib["path"])
+        except KeyError:
+            fail(self.failed, "images", "import image '{}', file is missing".format(ximg.attrib["path"]))
+            return None
+        
+        com_path = self._path_dict.get(comment, "") if comment != "" else ""
+        if com_path != "" and path.basename(path.dirname(com_path)) != "tmp":
+            self._path_dict[ximg.attrib["path"]] = com_path
+            return com_path
+        
+        #Check if files match and set path to appropriate image
+        hash_dict = self._hashes.hashes
+        info = self.archive.getinfo(img_path)
+        crc = format(info.CRC, 'x')
+        if crc in hash_dict:
+            i = 0
+            while i < len(hash_dict[crc]):
+                val = hash_dict[crc][i]
+                fpath = path.join(self._img_dir.root, val)
+                if fpath in self._pending: #Not extracted yet, and archive duplicates are already links
+                    pass
+                elif path.isfile(fpath):
+                    if path.getsize(fpath) == info.file_size:
+                        ffile = open(fpath, 'rb')
+                        zfile = self.archive.open(img_path, 'r')
+                        equal = files_equal(ffile, zfile)
+                        ffile.close()
+                        zfile.close()
+                        if equal:
+                            self._path_dict[ximg.attrib["path"]] = fpath
+                            if self.stats is not None:
+                                self.stats.add("bytes_deduplicated", info.file_size)
+                            return fpath
+                else:
+                    hash_dict[crc].remove(val)
+                    i -= 1
+                i += 1
+        
+        ipath = self._extract(ximg.attrib["path"], str(self._img_dir), jobs)
+        if ipath is not None: #Registered in the hashes by 'extract', if it succeeds
+            self._unregistered[ipath] = crc
+        return ipath
+    
+    def close(self):
+        """Remove the temporary files of this importer, and update the resource hash file if it has changed and is not shared."""
+        
+        for fpath in self._tmp_files: #Other imports may be using the same temporary directory
+            if path.isfile(fpath):
+                remove(fpath)
+        
+        if self._own_hashes:
+            self._hashes.save()
+
+def text_key(archive, xtxt, dest):
+    """
+    Identify the content of a text, to share it across imports.
+    
+    Args:
+        archive (zipfile.ZipFile or None): The archive containing the text, None if it is stored in the structure.
+        xtxt (blib.cycles.plan.ResourcePlan): The text.
+        dest (str): "int" or "ext", how the text is imported.
+    
+    Returns:
+        tuple or None: (dest, crc32, size, name) of the text, None if it is missing.
+    """
+    
+    if archive is None:
+        data = (xtxt.text or "").encode("utf-8")
+        return (dest, crc32(data), len(data), xtxt.attrib["name"])
     try:
-        ipath = extract(archive, source, destination)
+        info = archive.getinfo(get_path(archive, xtxt.attrib["path"]))
     except KeyError:
-        fail(failed, "images", "import image '{}', file is missing".format(source))
         return None
-    else:
-        path_dict[source] = ipath
-        return ipath
+    return (dest, info.CRC, info.file_size, xtxt.attrib["name"])
 
-def import_texts(orig, dest, xtxt, txts, failed, archive, txt_dir, txt_paths=None):
+def import_texts(orig, dest, xtxt, txts, failed, archive, txt_dir, txt_paths=None, shared=None):
+    key = None if shared is None else text_key(archive, xtxt, dest)
+    if key is not None and key in shared: #Same text already imported by another import of the session
+        txt, tpath = shared[key]
+        if tpath is None or path.isfile(tpath):
+            txts[xtxt.attrib["name"]] = txt
+            if txt_paths is not None:
+                txt_paths[xtxt.attrib["path"]] = txt if tpath is None else tpath
+            return
+    
+    tpath = None
     if orig == "xml": #From XML
         if dest == "ext": #To external
-            tpath = path.join(str(txt_dir), xtxt.attrib["name"])
+            tpath = path.join(txt_dir.path(xtxt.attrib["name"]), xtxt.attrib["name"])
             tfile = open(tpath, 'w', encoding="utf-8")
             tfile.write(xtxt.text)
             tfile.close()
@@ -74,7 +603,7 @@ def import_texts(orig, dest, xtxt, txts, failed, archive, txt_dir, txt_paths=Non
     elif orig == "zip": #From Zip
         if dest == "ext":  #To external
             try:
-                tpath = extract(archive, xtxt.attrib["path"], str(txt_dir))
+                tpath = extract(archive, xtxt.attrib["path"], txt_dir.path(path.basename(xtxt.attrib["path"])))
             except KeyError:
                 fail(failed, "texts", "import text '{}', file is missing".format(xtxt.attrib["name"]))
             else:
@@ -88,9 +617,9 @@ def import_texts(orig, dest, xtxt, txts, failed, archive, txt_dir, txt_paths=Non
                         txt_paths[xtxt.attrib["path"]] = tpath
         
         elif dest == "int": #To internal
-            tpath = get_path(archive, xtxt.attrib["path"])
+            spath = get_path(archive, xtxt.attrib["path"])
             try:
-                tfile = archive.open(tpath, 'r')
+                tfile = archive.open(spath, 'r')
             except KeyError:
                 fail(failed, "texts", "import text '{}', file is missing".format(xtxt.attrib["name"]))
             else:
@@ -105,23 +634,86 @@ def import_texts(orig, dest, xtxt, txts, failed, archive, txt_dir, txt_paths=Non
                     if txt_paths is not None:
                         txt_paths[xtxt.attrib["path"]] = txt
                 tfile.close()
+    
+    if key is not None and xtxt.attrib["name"] in txts:
+        shared[key] = (txts[xtxt.attrib["name"]], tpath)
 
-def set_attributes(asset, xelement, failed):
-    for attr in xelement.attrib:
-        if not attr.startswith("blib_") and \
-           not (attr == "name" and isinstance(asset, bpy.types.Material)) and \
-           not (attr == "mode" and isinstance(asset, bpy.types.ShaderNodeScript)):
-            try:
-                val = literal_eval(xelement.attrib[attr])
-            except (ValueError, SyntaxError):
-                val = xelement.attrib[attr]
-            
-            try:
-                setattr(asset, attr, val)
-            except:
-                fail(failed, "attributes", "set attribute '{}' on object '{}'".format(attr, asset.name))
+def set_attributes(asset, attributes, failed):
+    for attr in attributes.invalid:
+        fail(failed, "attributes", "read attribute '{}' on object '{}'".format(attr, asset.name))
+    
+    for attr, val in attributes.values:
+        try:
+            setattr(asset, attr, val)
+        except:
+            fail(failed, "attributes", "set attribute '{}' on object '{}'".format(attr, asset.name))
+
+socket_idnames = {
+    'VALUE': "NodeSocketFloat",
+    'INT': "NodeSocketInt",
+    'BOOLEAN': "NodeSocketBool",
+    'VECTOR': "NodeSocketVector",
+    'STRING': "NodeSocketString",
+    'RGBA': "NodeSocketColor",
+    'SHADER': "NodeSocketShader",
+}
+
+def new_socket(tree, in_out, ty, name):
+    """
+    Create a socket of a group interface directly.
+    
+    Args:
+        tree (bpy.types.NodeTree): The node group.
+        in_out (str): 'INPUT' or 'OUTPUT'.
+        ty (str): Socket type (e.g. 'VALUE').
+        name (str): Socket name.
+    
+    Returns:
+        The new interface socket.
+    """
+    
+    if hasattr(tree, "interface"): #Blender 4.0+
+        sock = tree.interface.new_socket(name, in_out=in_out, socket_type=socket_idnames[ty])
+    elif in_out == 'INPUT':
+        sock = tree.inputs.new(socket_idnames[ty], name)
+    else:
+        sock = tree.outputs.new(socket_idnames[ty], name)
+    
+    if ty == 'VECTOR' and in_out == 'INPUT' and hasattr(sock, "hide_value"):
+        sock.hide_value = True
+    return sock
+
+def make_sockets(tree, inp, out, group_inputs, group_outputs):
+    """
+    Create the interface of a node group, with exactly the declared sockets.
+    
+    Sockets are created directly through the interface API when the Blender version provides it,
+    otherwise by linking reroute nodes to the group input and output nodes (see 'route_sockets').
+    
+    Args:
+        tree (bpy.types.NodeTree): The node group, with an empty interface.
+        inp (bpy.types.NodeGroupInput): The group input node.
+        out (bpy.types.NodeGroupOutput or None): The group output node, None if 'group_outputs' is None.
+        group_inputs (list[tuple] or None): (type, name) of the input sockets.
+        group_outputs (list[tuple] or None): (type, name) of the output sockets.
+    """
+    
+    sockets = (group_inputs or []) + (group_outputs or [])
+    direct = hasattr(tree, "interface") or (hasattr(tree, "inputs") and hasattr(tree.inputs, "new"))
+    if not direct or any(ty not in socket_idnames for ty, name in sockets):
+        route_sockets(tree, inp, out, group_inputs, group_outputs)
+        return
+    
+    if group_inputs is not None:
+        for ty, name in group_inputs:
+            new_socket(tree, 'INPUT', ty, name)
+    
+    if group_outputs is not None:
+        for ty, name in group_outputs:
+            new_socket(tree, 'OUTPUT', ty, name)
 
-def make_sockets(tree, inp, out, xinpn, xoutn):
+def route_sockets(tree, inp, out, group_inputs, group_outputs):
+    """Create the interface of a node group by linking reroute nodes, for Blender versions without an interface API."""
     types = ['VALUE', 'INT', 'BOOLEAN', 'VECTOR', 'STRING', 'RGBA', 'SHADER']
     routes = {}
     outs = {}
@@ -139,67 +731,106 @@ def make_sockets(tree, inp, out, xinpn, xoutn):
         tree.inputs.remove(tree.inputs[i])
         outs[ty] = inp.outputs[i]
     
-    if xinpn is not None:
-        xouts = xinpn.find("outputs")
-        if xouts is not None:
-            for i, xout in enumerate(xouts):
-                tree.links.new(inp.outputs[i + len(types)], routes[xout.attrib["type"]].inputs[0])
-                tree.links.new(outs[xout.attrib["type"]], routes[xout.attrib["type"]].inputs[0])
-                tree.inputs[i + len(types)].name = xout.attrib["name"]
-    
-    if xoutn is not None:
-        xinps = xoutn.find("inputs")
-        if xinps is not None:
-            for i, xinp in enumerate(xinps):
-                link = tree.links.new(outs[xinp.attrib["type"]], out.inputs[i])
-                tree.outputs[i].name = xinp.attrib["name"]
+    if group_inputs is not None:
+        for i, (ty, name) in enumerate(group_inputs):
+            tree.links.new(inp.outputs[i + len(types)], routes[ty].inputs[0])
+            tree.links.new(outs[ty], routes[ty].inputs[0])
+            tree.inputs[i + len(types)].name = name
+    
+    if group_outputs is not None:
+        for i, (ty, name) in enumerate(group_outputs):
+            link = tree.links.new(outs[ty], out.inputs[i])
+            tree.outputs[i].name = name
     
     for route in routes.values():
         tree.nodes.remove(route)
         tree.inputs.remove(tree.inputs[0])
 
-def set_grp_io(xinp, xout, inp, out, tree):
-    if xinp is not None or xout is not None:
+def set_grp_io(group_inputs, group_outputs, inp, out, tree):
+    if group_inputs is not None or group_outputs is not None:
         inp = tree.nodes.new("NodeGroupInput") if inp is None else inp
-        make_sockets(tree, inp, out, xinp, xout)
-        if xinp is None:
+        make_sockets(tree, inp, out, group_inputs, group_outputs)
+        if group_inputs is None:
             tree.nodes.remove(inp)
 
-def build_tree(xnodes, xlinks, tree, resources, txt_embed, txt_dir, blib, script_import, archive, failed):
+def script_key(archive, item, mode):
+    """
+    Identify the content of a script in an archive, to share it across imports.
+    
+    Args:
+        archive (zipfile.ZipFile): The archive containing the script.
+        item (str): The path to the script inside the archive.
+        mode (str): 'INTERNAL' or 'EXTERNAL', how the script is imported.
+    
+    Returns:
+        tuple or None: (mode, crc32, size, file name) of the script, None if it is missing.
+    """
+    
+    try:
+        info = archive.getinfo(get_path(archive, item))
+    except KeyError:
+        return None
+    return (mode, info.CRC, info.file_size, path.basename(item))
+
+def count_tree(tplan, stats):
+    """
+    Count the nodes, links and attribute values of a node tree plan.
+    
+    Args:
+        tplan (blib.cycles.plan.TreePlan): The node tree plan.
+        stats (blib.stats.Stats): Stats in which to add the counts.
+    """
+    
+    attributes = [tplan.attributes, tplan.cycles]
+    for nplan in tplan.nodes:
+        attributes.append(nplan.attributes)
+        attributes.append(nplan.image_user)
+        attributes.append(nplan.ramp_attributes)
+        attributes.extend(nplan.inputs)
+        attributes.extend(nplan.outputs)
+    stats.add("nodes", len(tplan.nodes))
+    stats.add("links", len(tplan.links))
+    stats.add("attributes", sum(len(attrs.values) for attrs in attributes if attrs is not None))
+
+def build_tree(tplan, tree, resources, txt_embed, txt_dir, blib, script_import, archive, failed, stats, phase):
     imgs = resources["images"]
     txts = resources["texts"]
     txt_paths = resources["text_paths"]
     scripts = resources["scripts"]
     grps = resources["groups"]
-    xinp = None
-    xout = None
+    shared = resources["shared_scripts"]
     inp = None
     out = None
     nodes = {}
     
-    for n_i, xnode in enumerate(xnodes):
-        node = tree.nodes.new(xnode.attrib["bl_idname"])
-        if node.type == 'GROUP' and "blib_node_tree" in xnode.attrib:
-            node.node_tree = grps[xnode.attrib["blib_node_tree"]]
+    for nplan in tplan.nodes:
+        node = tree.nodes.new(nplan.bl_idname)
+        if node.type == 'GROUP' and nplan.node_tree is not None:
+            node.node_tree = grps[nplan.node_tree]
         elif node.type == 'SCRIPT':
-            if xnode.attrib["mode"] == 'INTERNAL':
+            if nplan.mode == 'INTERNAL':
                 node.mode = 'INTERNAL'
-                if "blib_script" in xnode.attrib:
-                    scr = xnode.attrib["blib_script"]
+                if nplan.script is not None:
+                    scr = nplan.script
                     if scr in txts:
                         node.script = txts[scr]
             else:
-                if blib and script_import and "blib_filepath" in xnode.attrib:
-                    blib_path = xnode.attrib["blib_filepath"]
+                if blib and script_import and nplan.filepath is not None:
+                    blib_path = nplan.filepath
                     if txt_embed == True:
                         node.mode = 'INTERNAL'
+                        key = script_key(archive, blib_path, node.mode)
                         if blib_path in scripts:
                             node.script = scripts[blib_path]
                         elif blib_path in txt_paths:
                             node.script = txt_paths[blib_path]
                             scripts[blib_path] = txt_paths[blib_path]
+                        elif key in shared:
+                            script = shared[key]
+                            scripts[blib_path] = script
+                            node.script = script
                         else:
-                            spath = get_path(archive, xnode.attrib["blib_filepath"])
+                            spath = get_path(archive, blib_path)
                             try:
                                 sfile = archive.open(spath, 'r')
                             except KeyError:
@@ -213,44 +844,48 @@ def build_tree(xnodes, xlinks, tree, resources, txt_embed, txt_dir, blib, script
                                     fail(failed, "scripts", "import script '{}', unknown reason".format(blib_path))
                                 else:
                                     scripts[blib_path] = script
+                                    shared[key] = script
                                     node.script = script
                                 sfile.close()
                     else:
                         node.mode = 'EXTERNAL'
+                        key = script_key(archive, blib_path, node.mode)
                         if blib_path in scripts:
                             node.filepath = scripts[blib_path]
                         elif blib_path in txt_paths:
                             node.filepath = txt_paths[blib_path]
                             scripts[blib_path] = txt_paths[blib_path]
+                        elif key in shared and path.isfile(shared[key]):
+                            spath = shared[key]
+                            scripts[blib_path] = spath
+                            node.filepath = spath
                         else:
                             try:
-                                spath = extract(archive, blib_path, str(txt_dir))
+                                spath = extract(archive, blib_path, txt_dir.path(path.basename(blib_path)))
                             except KeyError:
                                 fail(failed, "scripts", "import script '{}', file is missing".format(blib_path))
                             else:
                                 scripts[blib_path] = spath
+                                shared[key] = spath
                                 node.filepath = spath
         elif node.type == 'FRAME':
-            if "blib_text" in xnode.attrib:
-                txt = xnode.attrib["blib_text"]
+            if nplan.text is not None:
+                txt = nplan.text
                 if txt in txts:
                     node.text = txts[txt]
         elif node.type == 'GROUP_INPUT':
-            xinp = xnode
             inp = node
         elif node.type == 'GROUP_OUTPUT':
-            xout = xnode
             out = node
         elif hasattr(node, "image_user"):
-            if "blib_image" in xnode.attrib:
-                img = xnode.attrib["blib_image"]
-                if img in imgs:
-                    node.image = imgs[img]
-                ximageuser = xnode.find("image_user")
-                set_attributes(node.image_user, ximageuser, failed)
+            if nplan.image is not None:
+                img = nplan.image
+                if imgs.get(img) is not None:
+                    node.image = imgs.get(img)
+                if nplan.image_user is not None:
+                    set_attributes(node.image_user, nplan.image_user, failed)
         elif hasattr(node, "mapping") and hasattr(node.mapping, "curves"):
-            xcurvedata = xnode.find("curve_data")
-            curvedata = literal_eval(xcurvedata.text)
+            curvedata = nplan.curves or []
             for c_i, curve in enumerate(curvedata):
                 for p_i, point in enumerate(curve):
                     if p_i == 0 or p_i == len(curve) - 1:
@@ -260,10 +895,9 @@ def build_tree(xnodes, xlinks, tree, resources, txt_embed, txt_dir, blib, script
                         node.mapping.curves[c_i].points.new(point[0][0], point[0][1])
                         node.mapping.curves[c_i].points[p_i].handle_type = point[1]
             node.mapping.update()
-        elif hasattr(node, "color_ramp"):
-            xrampdata = xnode.find("ramp_data")
-            rampdata = literal_eval(xrampdata.text)
-            set_attributes(node.color_ramp, xrampdata, failed)
+        elif hasattr(node, "color_ramp") and nplan.ramp is not None:
+            rampdata = nplan.ramp
+            set_attributes(node.color_ramp, nplan.ramp_attributes, failed)
             for e_i, element in enumerate(rampdata):
                 if e_i == 0 or e_i == len(rampdata) - 1:
                     node.color_ramp.elements[e_i].position = element[0]
@@ -271,395 +905,386 @@ def build_tree(xnodes, xlinks, tree, resources, txt_embed, txt_dir, blib, script
                 else:
                     node.color_ramp.elements.new(element[0])
                     node.color_ramp.elements[e_i].color = element[1]
-        nodes[xnode.attrib["name"]] = node
+        nodes[nplan.name] = node
+    stats.lap(phase)
     
-    set_grp_io(xinp, xout, inp, out, tree)
+    set_grp_io(tplan.group_inputs, tplan.group_outputs, inp, out, tree)
     
-    if xlinks is not None:
-        for xlink in xlinks:
-            n_from = nodes[xlink.attrib["from_node"]]
-            n_to = nodes[xlink.attrib["to_node"]]
-            s_from = int(xlink.attrib["from_socket"])
-            s_to = int(xlink.attrib["to_socket"])
-            try:
-                tree.links.new(n_from.outputs[s_from], n_to.inputs[s_to])
-            except IndexError:
-                s_nodes = []
-                if (s_from >= len(n_from.outputs) and n_from.type == 'SCRIPT' and
-                   ((n_from.mode == 'EXTERNAL' and n_from.filepath == "") or (n_from.mode == 'INTERNAL' and n_from.script is None))):
-                    s_nodes.append(("from", n_from.name))
-                
-                if (s_to >= len(n_to.inputs) and n_to.type == 'SCRIPT' and
-                   ((n_to.mode == 'EXTERNAL' and n_to.filepath == "") or (n_to.mode == 'INTERNAL' and n_to.script is None))):
-                    s_nodes.append(("to", n_to.name))
-                
-                if len(s_nodes) > 0:
-                    for s_node in s_nodes:
-                        fail(failed, "links", "link {} '{}', because an OSL script is missing".format(s_node[0], s_node[1]))
-                else:
-                    raise
+    for lplan in tplan.links:
+        n_from = nodes[lplan.from_node]
+        n_to = nodes[lplan.to_node]
+        s_from = lplan.from_socket
+        s_to = lplan.to_socket
+        try:
+            tree.links.new(n_from.outputs[s_from], n_to.inputs[s_to])
+        except IndexError:
+            s_nodes = []
+            if (s_from >= len(n_from.outputs) and n_from.type == 'SCRIPT' and
+               ((n_from.mode == 'EXTERNAL' and n_from.filepath == "") or (n_from.mode == 'INTERNAL' and n_from.script is None))):
+                s_nodes.append(("from", n_from.name))
+            
+            if (s_to >= len(n_to.inputs) and n_to.type == 'SCRIPT' and
+               ((n_to.mode == 'EXTERNAL' and n_to.filepath == "") or (n_to.mode == 'INTERNAL' and n_to.script is None))):
+                s_nodes.append(("to", n_to.name))
+            
+            if len(s_nodes) > 0:
+                for s_node in s_nodes:
+                    fail(failed, "links", "link {} '{}', because an OSL script is missing".format(s_node[0], s_node[1]))
+            else:
+                raise
+    stats.lap("links")
     
-    for xnode in xnodes:
-        node = nodes[xnode.attrib["name"]]
-        
-        if "blib_parent" in xnode.attrib:
-            node.parent = nodes[xnode.attrib["blib_parent"]]
+    for nplan in tplan.nodes:
+        node = nodes[nplan.name]
         
-        set_attributes(node, xnode, failed)
+        if nplan.parent is not None:
+            node.parent = nodes[nplan.parent]
         
-        xinps = xnode.find("inputs")
-        xouts = xnode.find("outputs")
+        set_attributes(node, nplan.attributes, failed)
         
-        if xinps is not None:
-            for i_i, xinp in enumerate(xinps):
-                set_attributes(node.inputs[i_i], xinp, failed)
+        for i_i, attributes in enumerate(nplan.inputs):
+            set_attributes(node.inputs[i_i], attributes, failed)
         
-        if xouts is not None:
-            for o_i, xout in enumerate(xouts):
-                set_attributes(node.outputs[o_i], xout, failed)
+        for o_i, attributes in enumerate(nplan.outputs):
+            set_attributes(node.outputs[o_i], attributes, failed)
 
-def bimport(filepath, resource_path=None, imgi_import=True, imge_import=True, seq_import=True, mov_import=True, txti_import=True, txte_import=True,
-            script_import=True, img_embed=False, txt_embed=None, skip_sha1=False, img_merge=True):
+def open_library(filepath, skip_sha1, plan_cache, stats):
     """
-    Import a Cycles material or node group from a .blib or .xml file.
+    Open a .blib or .xml file, verify it and compile its structure, without using Blender.
     
     Args:
-        filepath (str): Path to .blib or .xml file.
-        resource_path (str or None): Custom path to save external resources or None to keep the default path.
-        imgi_import (bool): Import images that were packed in .blend file.
-        imge_import (bool): Import images that were externally saved.
-        seq_import (bool): Import image sequences.
-        mov_import (bool): Import movies.
-        txti_import (bool): Import texts that were packed in .blend file.
-        txte_import (bool): Import texts that were externally saved.
-        script_import (bool): Import scripts that were referenced by path in "script" node.
-        img_embed (bool or None): Pack images. True to pack, False to save externally,
-            and None to keep the setup from the exported material.
-        txt_embed (bool or None): Pack texts. True to pack, False to save externally,
-            and None to keep the setup from the exported material.
-        skip_sha1 (bool): Skip checksum verification. Allows the importing of manually edited
-            materials, that would otherwise seem corrupted (use with caution).
-        img_merge (bool): If an image contained in the .blib, is already available in the local
-            resources, use the existing image instead of creating a new instance.
+        filepath (str): Absolute path or URL (see 'blib.remote') to .blib or .xml file.
+        skip_sha1, plan_cache: Same as in 'bimport'.
+        stats (blib.stats.Stats): Stats in which to record the "open", "checksum", "verify" and "plan" phases.
     
     Returns:
-        bpy.types.Material or bpy.types.ShaderNodeTree
-        The produced material or node tree.
+        tuple: (archive, checksum, plan), the opened archive, the checksum stored in it,
+        and the compiled structure (blib.cycles.plan.ImportPlan). Archive and checksum are None for .xml files.
     
     Raises:
-        blib.exeptions.InvalidBlibFile: If the file is not a valid Blender Library.
-        blib.exeptions.BlibTypeError: If the Blender Library is not of type "cycles".
-        blib.exeptions.BlibVersionError: If the file was created with a later, backwards incompatible version of Blib.
+        Same as 'bimport'.
     """
     
-    filepath = bpy.path.abspath(filepath) #Ensure path is absolute
-    
-    if resource_path is None or resource_path.strip() == "":
-        resource_path = None
-    else:
-        resource_path = bpy.path.abspath(resource_path) #Ensure path is absolute
-    
-    if path.splitext(filepath)[1] == ".blib":
-        try:
-            archive = zf.ZipFile(filepath, 'r')
-        except zf.BadZipFile:
-            raise InvalidBlibFile("File is not a valid Blender library")
-        
-        blib = True
-        try:
-            file_checksum, blibtype, file_version, compatible, *rest = archive.comment.decode("utf-8").split(" ")
-        except ValueError:
-            raise InvalidBlibFile("File is broken, missing meta-data")
+    ext = extension(filepath)
+    if ext == ".blib":
+        archive = open_archive(filepath)
         
-        compatible = Version(compatible)
-        
-        if blibtype == "cycles":
-            if compatible <= version:
-                if archive.testzip() is not None:
-                    raise InvalidBlibFile("File is broken")
-                else:
+        try: #Close the archive if it is broken, incompatible or fails to be read
+            try:
+                file_checksum, blibtype, file_version, compatible, *rest = archive.comment.decode("utf-8").split(" ")
+            except ValueError:
+                raise InvalidBlibFile("File is broken, missing meta-data")
+            
+            compatible = Version(compatible)
+            stats.lap("open")
+            
+            if blibtype == "cycles":
+                if compatible <= version:
                     if not skip_sha1:
                         checksum = archive_sha1(archive)
                         
                         if not file_checksum == checksum.hexdigest():
                             raise InvalidBlibFile("Checksum does not match, file may be broken or have been altered\n"
                                                   'Run with "skip_sha1" to ignore checksum')
+                        stats.lap("checksum")
+                    if not is_url(filepath): #Remote entries are only checked when extracted, so unused ones aren't fetched
+                        verify(archive)
+                    stats.lap("verify")
+                else:
+                    raise BlibVersionError("File has incompatible version of blib")
             else:
-                raise BlibVersionError("File has incompatible version of blib")
-        else:
-            raise BlibTypeError("File is not a valid Cycles material")
-        try:
-            xml_file = archive.open("structure.xml", 'r')
-        except KeyError:
-            raise InvalidBlibFile("File is broken, missing structure XML")
-        tree = ET.ElementTree(file=xml_file)
-        xml_file.close()
-        xroot = tree.getroot()
+                raise BlibTypeError("File is not a valid Cycles material")
+            if plan_cache is None:
+                plan_cache = shared_plans
+            use_cache = plan_cache is not False and not skip_sha1 #Only cache plans of verified files
+            plan = plan_cache.get(file_checksum) if use_cache else None
+            if plan is None:
+                try:
+                    xml_file = archive.open("structure.xml", 'r')
+                except KeyError:
+                    raise InvalidBlibFile("File is broken, missing structure XML")
+                tree = ET.ElementTree(file=xml_file)
+                xml_file.close()
+                plan = compile_structure(tree.getroot())
+                if use_cache:
+                    plan_cache.set(file_checksum, plan)
+            stats.lap("plan")
+            return archive, file_checksum, plan
+        except BaseException:
+            archive.close()
+            raise
     
-    elif path.splitext(filepath)[1] == ".xml":
-        tree = ET.ElementTree(file=filepath)
+    elif ext == ".xml":
+        tree = ET.ElementTree(file=RemoteFile(filepath) if is_url(filepath) else filepath)
         xroot = tree.getroot()
-        blib = False
         xversion = Version(xroot.attrib["compatible"])
         if xversion > version:
             raise BlibVersionError("File has incompatible version of blib")
+        plan = compile_structure(xroot)
+        stats.lap("plan")
+        return None, None, plan
     
     else:
         raise InvalidBlibFile("File is not a Blender library")
+
+def close_import(images, archive):
+    """
+    Remove the temporary files of an import, save its resource hashes and close its archive.
     
-    if xroot.tag != "blib":
-        raise InvalidBlibFile("File is not a Blender library")
+    Args:
+        images (blib.cycles.bimport.ImageImporter or None): The importer of the images.
+        archive (zipfile.ZipFile or None): The imported archive.
+    """
+    
+    if images is not None:
+        images.close()
+    if archive is not None:
+        archive.close()
+
+def import_steps(filepath, resource_path=None, imgi_import=True, imge_import=True, seq_import=True, mov_import=True, txti_import=True, txte_import=True,
+                 script_import=True, img_embed=False, txt_embed=None, skip_sha1=False, img_merge=True, lazy_images=False, seq_window=True,
+                 threads=None, plan_cache=None, reuse=False, grp_merge=False, session=None, report=None,
+                 stats=None, return_report=False):
+    """
+    Import a Cycles material or node group, as a generator of steps (see 'blib.utils.run_steps').
+    
+    Same arguments as 'bimport'. Opening, verifying and compiling the file, extracting the images
+    (unless "lazy_images" is used), and closing the import are yielded as steps that don't use Blender.
+    The archive is closed and the temporary files are removed as well if a step fails, or the generator is closed early.
+    """
+    
+    if not is_url(filepath):
+        filepath = bpy.path.abspath(filepath) #Ensure path is absolute
+    stats = Stats() if stats is None else stats
+    stats.start("import", filepath)
     
-    if xroot.attrib["type"] != "cycles":
-        raise BlibTypeError("File is not a valid Cycles material")
-    
-    failed = {}
-    imgs = {}
-    txts = {}
-    txt_paths = {}
-    grps = {}
-    scripts = {}
-    resources = {
-        "images": imgs,
-        "texts": txts,
-        "text_paths": txt_paths,
-        "groups": grps,
-        "scripts": scripts,
-    }
-    txt_dir = ResourceDir("texts", resource_path)
-    xres = xroot.find("resources")
-    
-    #Import resources
-    if xres is not None:
-        ximgs = xres.find("images")
-        xtxts = xres.find("texts")
-        xgrps = xres.find("groups")
-        tmp_path = ResourceDir("tmp", resource_path)
-        path_dict = {}
+    if session is not None:
+        resource_path = session.resource_path
+    elif resource_path is None or resource_path.strip() == "":
+        resource_path = None
+    else:
+        resource_path = bpy.path.abspath(resource_path) #Ensure path is absolute
+    
+    archive, file_checksum, plan = yield open_library, (filepath, skip_sha1, plan_cache, stats)
+    blib = archive is not None
+    images = None
+    
+    try: #Close the archive and remove temporary files if a step fails, or the import is abandoned
+        if report is None and session is not None:
+            report = session.report
+        failed = Report() if report is None else report
+        imgs = {}
+        txts = {}
+        txt_paths = {}
+        grps = {}
+        scripts = {}
+        resources = {
+            "images": imgs,
+            "texts": txts,
+            "text_paths": txt_paths,
+            "groups": grps,
+            "scripts": scripts,
+            "shared_scripts": {} if session is None else session.scripts,
+        }
+        txt_dir = TextDir(resource_path) if session is None else session.text_dir
+        shared_txts = {} if session is None else session.texts
+        
+        #Datablocks from previous imports of the same file
+        checksum = file_checksum if blib and not skip_sha1 else None
+        reused_grps = {}
+        reused_txts = {}
+        hashed_grps = {}
+        if grp_merge:
+            hashed_grps = find_tagged(bpy.data.node_groups, None, "blib_hash")
+        if reuse and checksum is not None:
+            reused_grps = find_tagged(bpy.data.node_groups, checksum)
+            reused_txts = find_tagged(bpy.data.texts, checksum)
+            if txt_embed == True:
+                scripts.update(find_tagged(bpy.data.texts, checksum, "blib_path"))
         
+        #Import resources
         #Images
-        if ximgs is not None and (imgi_import or imge_import or seq_import or mov_import) and blib:
-            img_dir = ResourceDir("images", resource_path)
-            hash_dict = None
-            sfv_update = False
-            for ximg in ximgs:
-                if ximg.attrib["source"] in {'FILE', 'GENERATED'}:
-                    if ximg.attrib["origin"] == "internal":
-                        if not imgi_import:
-                            pass
-                    else:
-                        if not imge_import:
-                            pass
-                elif ximg.attrib["source"] == 'SEQUENCE':
-                    if not seq_import:
-                        pass
-                elif ximg.attrib["source"] == 'MOVIE':
-                    if not mov_import:
-                        pass
-                
-                #Write image to temporary folder, and pack in Blender
-                if ximg.attrib["source"] in {'FILE', 'GENERATED'} and (img_embed or (img_embed is None and ximg.attrib["origin"] == "internal")):
-                    ipath = extract_image(archive, ximg.attrib["path"], str(tmp_path), path_dict, failed)
-                    if ipath is None:
-                        pass
-                    
-                    try:
-                        img = bpy.data.images.load(ipath)
-                    except:
-                        fail(failed, "images", "import image '{}', unknown reason".format(ximg.attrib["path"]))
-                    else:
-                        img.source = ximg.attrib["source"]
-                        try:
-                            img.pack()
-                        except:
-                            bpy.data.images.remove(img)
-                            fail(failed, "images", "pack image '{}', unknown reason".format(ximg.attrib["path"]))
-                        else:
-                            img.filepath = ""
-                            imgs[ximg.attrib["name"]] = img
-                
-                else: #Write image to resource folder, and load in Blender
-                    if img_merge and ximg.attrib["source"] != 'SEQUENCE': #Use existing image in resources if available
-                        try:
-                            comment = archive.getinfo(ximg.attrib["path"]).comment.decode("utf-8")
-                        except KeyError:
-                            fail(failed, "images", "import image '{}', file is missing".format(ximg.attrib["path"]))
-                            pass
-                        
-                        com_path = path_dict[comment] if comment != "" else ""
-                        com_name = path.basename(path.dirname(com_path))
-                        if comment != "" and com_name != "tmp":
-                            ipath = com_path
-                            path_dict[ximg.attrib["path"]] = ipath
-                        else:
-                            #Create hash dictionary only in the first iteration
-                            if hash_dict is None:
-                                hash_path = path.join(img_dir.root, "list.sfv")
-                                hash_dict = {}
-                                if path.isfile(hash_path):
-                                    sfv = re.compile(r"(.*) (.*?)$")
-                                    hash_file = open(hash_path, 'r', encoding="utf-8")
-                                    for line in hash_file:
-                                        key = sfv.sub(r"\2", line).strip()
-                                        val = sfv.sub(r"\1", line).strip()
-                                        if key in hash_dict and val in hash_dict[key]:
-                                            sfv_update = True
-                                        else:
-                                            hash_dict.setdefault(key, []).append(val)
-                                    hash_file.close()
-                                hash_bkp = hash_dict.copy()
-                            
-                            #Check if files match and set path to appropriate image
-                            img_path = ximg.attrib["path"] if comment == "" else comment
-                            try:
-                                crc = format(archive.getinfo(img_path).CRC, 'x')
-                            except KeyError:
-                                fail(failed, "images", "import image '{}', file is missing".format(ximg.attrib["path"]))
-                                pass
-                            
-                            if crc in hash_dict:
-                                i = 0
-                                while i < len(hash_dict[crc]):
-                                    val = hash_dict[crc][i]
-                                    fpath = path.join(img_dir.root, val)
-                                    if path.isfile(fpath):
-                                        fsize = path.getsize(fpath)
-                                        zsize = archive.getinfo(img_path).file_size
-                                        if fsize == zsize:
-                                            ffile = open(fpath, 'rb')
-                                            zfile = archive.open(img_path, 'r')
-                                            if files_equal(ffile, zfile):
-                                                ipath = fpath
-                                                path_dict[ximg.attrib["path"]] = ipath
-                                                ffile.close()
-                                                zfile.close()
-                                                break
-                                            ffile.close()
-                                            zfile.close()
-                                    else:
-                                        hash_dict[crc].remove(val)
-                                        i -= 1
-                                    i += 1
-                                else:
-                                    ipath = extract_image(archive, ximg.attrib["path"], str(img_dir), path_dict, failed)
-                                    if ipath is None:
-                                        pass
-                                    
-                                    hash_dict[crc].append(path.relpath(ipath, img_dir.root))
-                            else:
-                                ipath = extract_image(archive, ximg.attrib["path"], str(img_dir), path_dict, failed)
-                                if ipath is None:
-                                    pass
-                                
-                                hash_dict[crc] = [path.relpath(ipath, img_dir.root)]
-                    else: #Use image in archive, even if duplicate
-                        if ximg.attrib["source"] == 'SEQUENCE':
-                            seq_dir = path.dirname(ximg.attrib["path"])
-                            dir_name = ximg.attrib["path"].split("/")[-2]
-                            seq_path = path.join(str(img_dir), dir_name)
-                            makedirs(seq_path)
-                            seq_imgs = [img for img in archive.namelist() if img.startswith(seq_dir)]
-                            for img in seq_imgs:
-                                i_tmp_path = extract_image(archive, img, seq_path, path_dict, failed)
-                                if img == ximg.attrib["path"]:
-                                    ipath = i_tmp_path
-                                    if ipath is None:
-                                        break
-                            if ipath is None:
-                                rmtree(seq_path)
-                                pass
-                        else:
-                            ipath = extract_image(archive, ximg.attrib["path"], str(img_dir), path_dict, failed)
-                            if ipath is None:
-                                pass
-                    
-                    #load image to Blender
-                    try:
-                        img = bpy.data.images.load(ipath)
-                    except:
-                        fail(failed, "images", "import image '{}', unknown reason".format(ximg.attrib["path"]))
-                    else:
-                        img.source = ximg.attrib["source"]
-                        imgs[ximg.attrib["name"]] = img
-            
-            if tmp_path:
-                for item in listdir(str(tmp_path)):
-                    fpath = path.join(str(tmp_path), item)
-                    if path.isfile(fpath):
-                        remove(fpath)
-            
-            #Update hash file if list has changed
-            if hash_dict is not None and (hash_dict != hash_bkp or sfv_update):
-                hash_path = path.join(img_dir.root, "list.sfv")
-                hash_file = open(hash_path, 'w', encoding="utf-8")
-                for key in hash_dict:
-                    for val in hash_dict[key]:
-                        hash_file.write(val + " " + key + "\n")
-                hash_file.close()
+        if plan.images is not None and (imgi_import or imge_import or seq_import or mov_import) and blib:
+            images = ImageImporter(archive, plan.images, resource_path, failed, imgi_import, imge_import, seq_import,
+                                   mov_import, img_embed, img_merge, threads,
+                                   hashes=None if session is None else session.hashes)
+            images.stats = stats
+            if seq_window:
+                images.windows = plan.windows
+            if checksum is not None:
+                images.checksum = checksum
+                if reuse:
+                    for name, img in find_tagged(bpy.data.images, checksum).items():
+                        if img.packed_file is not None or path.isfile(bpy.path.abspath(img.filepath)):
+                            images.reused[name] = img
+            resources["images"] = images
+            if not lazy_images:
+                extracted = yield images.extract, (list(images),)
+                images.load(extracted)
+        stats.lap("images")
         
         #Texts
-        if xtxts is not None and (txti_import or txte_import):
-            for xtxt in xtxts:
-                if xtxt.attrib["origin"] == "internal":
+        if plan.texts is not None and (txti_import or txte_import):
+            for xtxt in plan.texts:
+                if xtxt.attrib["name"] in reused_txts and (txti_import if xtxt.attrib["origin"] == "internal" else txte_import):
+                    txt = reused_txts[xtxt.attrib["name"]]
+                    txts[xtxt.attrib["name"]] = txt
+                    if xtxt.attrib["origin"] != "internal" and "path" in xtxt.attrib:
+                        if txt_embed == True:
+                            txt_paths[xtxt.attrib["path"]] = txt
+                        elif txt.filepath != "":
+                            txt_paths[xtxt.attrib["path"]] = bpy.path.abspath(txt.filepath)
+                
+                elif xtxt.attrib["origin"] == "internal":
                     if txti_import:
                         if "path" in xtxt.attrib:
                             if blib:
                                 if txt_embed == False:
-                                    import_texts("zip", "ext", xtxt, txts, failed, archive, txt_dir)
+                                    import_texts("zip", "ext", xtxt, txts, failed, archive, txt_dir, None, shared_txts)
                                 else:
-                                    import_texts("zip", "int", xtxt, txts, failed, archive, txt_dir)
+                                    import_texts("zip", "int", xtxt, txts, failed, archive, txt_dir, None, shared_txts)
                         else:
                             if txt_embed == False:
-                                import_texts("xml", "ext", xtxt, txts, failed, None, txt_dir)
+                                import_texts("xml", "ext", xtxt, txts, failed, None, txt_dir, None, shared_txts)
                             else:
-                                import_texts("xml", "int", xtxt, txts, failed, None, txt_dir)
+                                import_texts("xml", "int", xtxt, txts, failed, None, txt_dir, None, shared_txts)
                 
                 else:
                     if txte_import:
                         if "path" in xtxt.attrib:
                             if blib:
                                 if txt_embed == True:
-                                    import_texts("zip", "int", xtxt, txts, failed, archive, txt_dir, txt_paths)
+                                    import_texts("zip", "int", xtxt, txts, failed, archive, txt_dir, txt_paths, shared_txts)
                                 else:
-                                    import_texts("zip", "ext", xtxt, txts, failed, archive, txt_dir, txt_paths)
+                                    import_texts("zip", "ext", xtxt, txts, failed, archive, txt_dir, txt_paths, shared_txts)
                         else:
                             if txt_embed == True:
-                                import_texts("xml", "int", xtxt, txts, failed, None, txt_dir, txt_paths)
+                                import_texts("xml", "int", xtxt, txts, failed, None, txt_dir, txt_paths, shared_txts)
                             else:
-                                import_texts("xml", "ext", xtxt, txts, failed, None, txt_dir, txt_paths)
+                                import_texts("xml", "ext", xtxt, txts, failed, None, txt_dir, txt_paths, shared_txts)
+        
+            if checksum is not None:
+                for name, txt in txts.items():
+                    tag(txt, checksum, name)
+        stats.lap("texts")
         
         #Groups
-        if xgrps is not None:
-            for xgrp in xgrps:
-                xnodes = xgrp.find("nodes")
-                xlinks = xgrp.find("links")
-                grp = bpy.data.node_groups.new(xgrp.attrib["name"], xgrp.attrib["bl_idname"])
-                grps[xgrp.attrib["name"]] = grp
-                if xnodes is not None:
-                    build_tree(xnodes, xlinks, grp, resources, txt_embed, txt_dir, blib, script_import, archive, failed)
-    
-    #Import material
-    xmat = xroot.find("main")
-    
-    if xmat is not None:
-        xcycles = xmat.find("cycles_settings")
-        xnodes = xmat.find("nodes")
-        xlinks = xmat.find("links")
-        
-        mat = bpy.data.materials.new(xmat.attrib["name"])
-        set_attributes(mat, xmat, failed)
-        set_attributes(mat.cycles, xcycles, failed)
-        mat.use_nodes = True
-        mat.node_tree.nodes.clear()
-        build_tree(xnodes, xlinks, mat.node_tree, resources, txt_embed, txt_dir, blib, script_import, archive, failed)
-        if blib:
-            archive.close()
-        for f in failed:
-            print("{} {} failed to be imported/assigned.".format(failed[f], f))
-        return mat
-    else:
-        if blib:
-            archive.close()
-        for f in failed:
-            print("{} {} failed to be imported/assigned.".format(failed[f], f))
-        return grp
+        if plan.groups is not None:
+            for gplan in plan.groups:
+                if gplan.name in reused_grps:
+                    grp = reused_grps[gplan.name]
+                    grps[gplan.name] = grp
+                    continue
+                if gplan.hash in hashed_grps and hashed_grps[gplan.hash].bl_idname == gplan.bl_idname:
+                    grp = hashed_grps[gplan.hash]
+                    grps[gplan.name] = grp
+                    continue
+                grp = bpy.data.node_groups.new(gplan.name, gplan.bl_idname)
+                grps[gplan.name] = grp
+                if gplan.nodes:
+                    build_tree(gplan, grp, resources, txt_embed, txt_dir, blib, script_import, archive, failed, stats, "groups")
+                    count_tree(gplan, stats)
+                if checksum is not None:
+                    tag(grp, checksum, gplan.name)
+                if gplan.hash is not None:
+                    grp["blib_hash"] = gplan.hash
+                    hashed_grps[gplan.hash] = grp
+        stats.lap("groups")
+        
+        #Import material
+        mplan = plan.main
+        
+        if mplan is not None:
+            mat = bpy.data.materials.new(mplan.name)
+            set_attributes(mat, mplan.attributes, failed)
+            set_attributes(mat.cycles, mplan.cycles, failed)
+            mat.use_nodes = True
+            mat.node_tree.nodes.clear()
+            build_tree(mplan, mat.node_tree, resources, txt_embed, txt_dir, blib, script_import, archive, failed, stats,
+                       "material")
+            count_tree(mplan, stats)
+            stats.lap("material")
+            result = mat
+        else:
+            result = grp
+        
+        tag_scripts(scripts, checksum)
+        yield close_import, (images, archive)
+        images = archive = None
+    finally:
+        close_import(images, archive)
+    if report is None:
+        for line in failed.summary("imported/assigned"):
+            print(line)
+    stats.lap("close")
+    stats.finish()
+    if return_report:
+        return result, failed
+    return result
+
+def bimport(filepath, resource_path=None, imgi_import=True, imge_import=True, seq_import=True, mov_import=True, txti_import=True, txte_import=True,
+            script_import=True, img_embed=False, txt_embed=None, skip_sha1=False, img_merge=True, lazy_images=False, seq_window=True,
+            threads=None, plan_cache=None, reuse=False, grp_merge=False, session=None, report=None,
+            stats=None, return_report=False):
+    """
+    Import a Cycles material or node group from a .blib or .xml file.
+    
+    Args:
+        filepath (str): Path to .blib or .xml file, or its "http://" or "https://" URL.
+            Remote archives are read with HTTP Range requests (see 'blib.remote'), only fetching the imported entries,
+            which are then checked when extracted, instead of all entries being verified upfront.
+        resource_path (str or None): Custom path to save external resources or None to keep the default path.
+        imgi_import (bool): Import images that were packed in .blend file.
+        imge_import (bool): Import images that were externally saved.
+        seq_import (bool): Import image sequences.
+        mov_import (bool): Import movies.
+        txti_import (bool): Import texts that were packed in .blend file.
+        txte_import (bool): Import texts that were externally saved.
+        script_import (bool): Import scripts that were referenced by path in "script" node.
+        img_embed (bool or None): Pack images. True to pack, False to save externally,
+            and None to keep the setup from the exported material.
+        txt_embed (bool or None): Pack texts. True to pack, False to save externally,
+            and None to keep the setup from the exported material.
+        skip_sha1 (bool): Skip checksum verification. Allows the importing of manually edited
+            materials, that would otherwise seem corrupted (use with caution).
+        img_merge (bool): If an image contained in the .blib, is already available in the local
+            resources, use the existing image instead of creating a new instance.
+        lazy_images (bool): Extract and load images only when first used by a node,
+            instead of all of them before building the node trees. Unused images are not extracted at all.
+        seq_window (bool): Only extract the sequence frames within the frame range used by the nodes
+            (from their image user settings), instead of all stored frames.
+        threads (int or None): Number of threads extracting images in parallel, None to use one per core.
+        plan_cache (blib.cycles.plan.PlanCache or bool or None): Cache of compiled structures, keyed by archive checksum,
+            so repeated imports of the same file skip parsing it. None to use the shared in-memory cache, False to disable.
+            Not used with "skip_sha1", as the checksum is not verified then.
+        reuse (bool): Use the node groups, images and texts previously imported from the same file
+            (identified by its checksum, which datablocks are tagged with on import), instead of importing them again.
+            Not used with "skip_sha1", as the checksum is not verified then.
+        grp_merge (bool): If a node group contained in the .blib was already imported from any file
+            (identified by its structural hash), use the existing group instead of creating a new one.
+            Groups edited after their import keep their hash, so only use this with unmodified library groups.
+        session (blib.cycles.session.ImportSession or None): Batch import session sharing its resource state
+            with this import (use 'ImportSession.bimport' instead of passing it directly).
+        report (blib.report.Report or None): Report in which to record failures (the session's report by default).
+            None to print a summary of the failures to the console instead.
+        stats (blib.stats.Stats or None): Stats in which to record the time of each phase ("open", "checksum", "verify",
+            "plan", "images", "texts", "groups", "material", "links", "close"), and the bytes and structure counters.
+            Creating the group interfaces and links of all trees is timed as the "links" phase.
+            With "lazy_images", images are extracted during the "groups" and "material" phases.
+            None to only report to 'blib.stats.callbacks'.
+        return_report (bool): Also return the report of the failures (the passed report, or a new one).
+    
+    Returns:
+        bpy.types.Material or bpy.types.ShaderNodeTree
+        The produced material or node tree.
+        With "return_report", a (material or node tree, blib.report.Report) tuple instead.
+    
+    Raises:
+        blib.exeptions.InvalidBlibFile: If the file is not a valid Blender Library.
+        blib.exeptions.BlibTypeError: If the Blender Library is not of type "cycles".
+        blib.exeptions.BlibVersionError: If the file was created with a later, backwards incompatible version of Blib.
+    """
+    
+    return run_steps(import_steps(filepath, resource_path, imgi_import, imge_import, seq_import, mov_import, txti_import, txte_import,
+                                  script_import, img_embed, txt_embed, skip_sha1, img_merge, lazy_images, seq_window, threads,
+                                  plan_cache, reuse, grp_merge, session, report, stats, return_report))
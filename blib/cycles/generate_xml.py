@@ -21,12 +21,15 @@
 
 import bpy
 
-import xml.etree.cElementTree as ET
+import xml.etree.ElementTree as ET
+from hashlib import sha1
 from os import path
 
 from .version import version, compatible
 from .utils import check_asset
-from ..utils import fail
+from ..utils import fail, pack_floats, FrameIndex
+from ..imageinfo import image_info
+from ..report import Report
 
 ##### Pretty print code by Fredrik Lundh. Source: http://effbot.org/zone/element-lib.htm#prettyprint #####
 def indent(elem, level=0):
@@ -45,8 +48,35 @@ def indent(elem, level=0):
             elem.tail = i
 ##### End of pretty print code #####
 
+def get_type(asset, attr, val):
+    if val is None:
+        return "n"
+    elif isinstance(val, bool):
+        return "b"
+    elif isinstance(val, int):
+        return "i"
+    elif isinstance(val, float):
+        return "f"
+    else:
+        try:
+            prop = asset.bl_rna.properties.get(attr)
+        except AttributeError:
+            prop = None
+        if prop is not None and prop.type == 'ENUM':
+            return "e"
+        else:
+            return "s"
+
+def set_types(xelement, types):
+    #Attribute type codes: "b" bool, "i" int, "f" float, "e" enum, "E" enum set, "s" string,
+    #"n" None, "v" packed float vector, "l" other list literal.
+    #Strings are the default, and are not listed.
+    groups = [code + ":" + ",".join(names) for code, names in sorted(types.items()) if code != "s"]
+    xelement.set("blib_types", " ".join(groups))
+
 def set_attributes(asset, xelement, optimize_file):
     attrs = [attr for attr in dir(asset) if not attr.startswith("__") and not attr.startswith("bl_") and type(getattr(asset, attr)).__module__ == "builtins"]
+    types = {}
     for attr in attrs:
         if not (attr == "node_tree" and hasattr(asset, "type") and asset.type == 'GROUP') and \
            not (attr in {"filepath", "script"} and hasattr(asset, "type") and asset.type == 'SCRIPT') and \
@@ -61,15 +91,87 @@ def set_attributes(asset, xelement, optimize_file):
                 if isinstance(val, str) or isinstance(val, int) or isinstance(val, float) or isinstance(val, bool) or val is None:
                     if not (optimize_file and (val == "" or val is None)):
                         xelement.set(attr, str(val))
+                        types.setdefault(get_type(asset, attr, val), []).append(attr)
+                elif isinstance(val, set) and all(isinstance(v, str) for v in val):
+                    xelement.set(attr, " ".join(sorted(val)))
+                    types.setdefault("E", []).append(attr)
                 else:
                     try:
                         val = list(val)
                     except TypeError:
                         pass
                     else:
-                        xelement.set(attr, str(val))
+                        if len(val) > 0 and all(isinstance(v, float) for v in val):
+                            xelement.set(attr, pack_floats(val))
+                            types.setdefault("v", []).append(attr)
+                        else:
+                            xelement.set(attr, str(val))
+                            types.setdefault("l", []).append(attr)
+    set_types(xelement, types)
     return
 
+def count_structure(xroot, stats):
+    """
+    Count the nodes, links and attribute values of a structure.
+    
+    Args:
+        xroot (xml.etree.ElementTree.Element): Root element of the structure.
+        stats (blib.stats.Stats): Stats in which to add the counts.
+    """
+    
+    attributed = {"main", "cycles_settings", "node", "input", "output", "image_user", "ramp_data"}
+    for xelement in xroot.iter():
+        if xelement.tag == "node":
+            stats.add("nodes")
+        elif xelement.tag == "link":
+            stats.add("links")
+        if xelement.tag in attributed:
+            stats.add("attributes", sum(1 for key in xelement.attrib if not key.startswith("blib_")))
+
+def group_hash(xgrp, hashes):
+    """
+    Compute a canonical hash of the structure of a serialized node group (nodes, attributes, links and interface).
+    
+    The group name is not part of the hash, and nested groups are included through their own hash,
+    so identical groups get the same hash whatever archive they are exported to.
+    
+    Args:
+        xgrp (xml.etree.ElementTree.Element): The "group" element.
+        hashes (dict): Hashes of the groups exported before, by group name.
+    
+    Returns:
+        str or None: Hex digest, or None if the group uses archive resources (images, texts or scripts)
+        or nested groups without a hash, whose content is not part of the structure.
+    """
+    
+    checksum = sha1()
+    elements = [(xgrp, True)]
+    while elements:
+        xelement, root = elements.pop()
+        if xelement is None: #End of children
+            checksum.update(b"\x01")
+            continue
+        
+        attrib = xelement.attrib
+        if any(key in attrib for key in ("blib_image", "blib_text", "blib_script", "blib_filepath")):
+            return None
+        
+        checksum.update(xelement.tag.encode("utf-8") + b"\x00")
+        for key in sorted(attrib):
+            if root and key in {"name", "blib_hash"}:
+                continue
+            val = attrib[key]
+            if key == "blib_node_tree":
+                if val not in hashes:
+                    return None
+                val = hashes[val]
+            checksum.update(key.encode("utf-8") + b"=" + val.encode("utf-8") + b"\x00")
+        checksum.update((xelement.text or "").strip().encode("utf-8") + b"\x02")
+        
+        elements.append((None, False))
+        elements.extend((xchild, False) for xchild in reversed(list(xelement)))
+    return checksum.hexdigest()
+
 def set_io(asset, xelement, optimize_file):
     if len(asset.inputs) > 0:
         xins = ET.SubElement(xelement, "inputs")
@@ -122,15 +224,21 @@ def set_nodes(asset, xelement, images, script_export, scr_paths, textnames, opti
                     ximageuser = ET.SubElement(xnode, "image_user")
                     set_attributes(node.image_user, ximageuser, optimize_file)
             elif hasattr(node, "mapping") and hasattr(node.mapping, "curves"):
-                curvedata = [[[list(point.location), point.handle_type] for point in curve.points] for curve in node.mapping.curves]
                 xcurvedata = ET.SubElement(xnode, "curve_data")
-                xcurvedata.text = str(curvedata)
+                for curve in node.mapping.curves:
+                    xcurve = ET.SubElement(xcurvedata, "curve")
+                    xcurve.set("handles", " ".join(point.handle_type for point in curve.points))
+                    xcurve.text = pack_floats(coord for point in curve.points for coord in point.location)
             elif hasattr(node, "color_ramp"):
                 ramp = node.color_ramp
-                rampdata = [[element.position, list(element.color)] for element in ramp.elements]
+                rampdata = []
+                for element in ramp.elements:
+                    rampdata.append(element.position)
+                    rampdata.extend(element.color)
                 xrampdata = ET.SubElement(xnode, "ramp_data")
                 set_attributes(ramp, xrampdata, optimize_file)
-                xrampdata.text = str(rampdata)
+                xelements = ET.SubElement(xrampdata, "elements")
+                xelements.text = pack_floats(rampdata)
     return
 
 def set_links(asset, xelement):
@@ -147,7 +255,7 @@ def set_links(asset, xelement):
     return
 
 def generate_xml(asset, imgi_export=True, imge_export=True, seq_export=True, mov_export=True, txti_export=True, txte_export=True,
-            script_export=True, optimize_file=False, blib=False, txt_embed=False, pretty_print=False):
+            script_export=True, optimize_file=False, blib=False, txt_embed=False, pretty_print=False, report=None, stats=None):
     """
     Generate XML representing a Cycles material or node group as per the Blib standard.
     
@@ -169,6 +277,9 @@ def generate_xml(asset, imgi_export=True, imge_export=True, seq_export=True, mov
         pretty_print (bool): Format XML to improve readability (increases file size),
             should only be used if XML is going to be read by a Human,
             should not be used if XML is to be part of a full .blib file.
+        report (blib.report.Report or None): Report in which to record failures.
+            None to print a summary of the failures to the console instead.
+        stats (blib.stats.Stats or None): Stats in which to count the exported nodes, links and attributes.
     
     Returns:
         (xml, image_list, text_list)
@@ -180,6 +291,8 @@ def generate_xml(asset, imgi_export=True, imge_export=True, seq_export=True, mov
                 "range" (tuple): Only included if image.source equals 'SEQUENCE',
                     tuple[0]: Sequence start frame.
                     tuple[1]: Sequence end frame.
+                "frames" (list[str]): Only included if image.source equals 'SEQUENCE',
+                    file names of the frames within the range, and of the frame the image points to.
                 })
         text_list (list[dict]): list containing the texts to be exported, in format:
             list(dict{
@@ -208,7 +321,7 @@ def generate_xml(asset, imgi_export=True, imge_export=True, seq_export=True, mov
     scripts = []
     texts = {}
     textnames = []
-    failed = {}
+    failed = Report() if report is None else report
     
     #List groups images and texts
     index = 0
@@ -338,6 +451,19 @@ def generate_xml(asset, imgi_export=True, imge_export=True, seq_export=True, mov
                     txt_rel_paths_export[scr] = tpath#, "name": name
                     scr_rel_paths[scr] = tpath
     
+    #List sequence frames, scanning each directory only once, even if shared by several sequences
+    frame_indexes = {}
+    seq_frames = {}
+    for img, frange in images.items():
+        if img.source == 'SEQUENCE':
+            seq_dir, base = path.split(bpy.path.abspath(img.filepath))
+            if seq_dir not in frame_indexes:
+                frame_indexes[seq_dir] = FrameIndex(seq_dir)
+            frames = frame_indexes[seq_dir].find_range(base, frange[0], frange[1])
+            if base not in frames:
+                frames.append(base)
+            seq_frames[img] = frames
+    
     xroot = ET.Element("blib")
     xroot.set("type", "cycles")
     xroot.set("version", str(version))
@@ -366,6 +492,26 @@ def generate_xml(asset, imgi_export=True, imge_export=True, seq_export=True, mov
                             ximg.set("origin", "external")
                         else:
                             ximg.set("origin", "internal")
+                
+                #Header metadata, so catalogs don't have to extract the images
+                if img.source != 'MOVIE':
+                    if img.source == 'SEQUENCE' or img.packed_file is None:
+                        info = image_info(bpy.path.abspath(img.filepath))
+                    else:
+                        info = image_info(img.packed_file.data, bpy.path.basename(img.filepath) or img.name)
+                    if info is not None:
+                        for key in ("format", "width", "height", "channels", "size"):
+                            if info[key] is not None:
+                                ximg.set(key, str(info[key]))
+                    if img.source == 'SEQUENCE': #Frame count and total size of the exported frames
+                        seq_dir = path.dirname(bpy.path.abspath(img.filepath))
+                        try:
+                            size = sum(path.getsize(path.join(seq_dir, frame)) for frame in seq_frames[img])
+                        except OSError:
+                            ximg.attrib.pop("size", None)
+                        else:
+                            ximg.set("frames", str(len(seq_frames[img])))
+                            ximg.set("size", str(size))
         
         #Texts
         if len(texts) > 0:
@@ -382,22 +528,28 @@ def generate_xml(asset, imgi_export=True, imge_export=True, seq_export=True, mov
         #Groups
         if len(ngroups) > 0:
             xgrps = ET.SubElement(xres, "groups")
+            hashes = {}
             for grp in reversed(ngroups):
                 xgrp = ET.SubElement(xgrps, "group")
                 xgrp.set("bl_idname", grp.bl_idname)
                 xgrp.set("name", grp.name)
                 set_nodes(grp, xgrp, images, script_export, scr_rel_paths, textnames, optimize_file)
                 set_links(grp, xgrp)
+                grp_hash = group_hash(xgrp, hashes)
+                if grp_hash is not None:
+                    hashes[grp.name] = grp_hash
+                    xgrp.set("blib_hash", grp_hash)
     
     #Export material
     if isinstance(asset, bpy.types.Material):
         xmat = ET.SubElement(xroot, "main")
         xmat.set("name", asset.name)
-        xmat.set("diffuse_color", str(list(asset.diffuse_color)))
-        xmat.set("specular_color", str(list(asset.specular_color)))
+        xmat.set("diffuse_color", pack_floats(asset.diffuse_color))
+        xmat.set("specular_color", pack_floats(asset.specular_color))
         xmat.set("alpha", str(asset.alpha))
         xmat.set("specular_hardness", str(asset.specular_hardness))
         xmat.set("pass_index", str(asset.pass_index))
+        set_types(xmat, {"f": ["alpha"], "i": ["specular_hardness", "pass_index"], "v": ["diffuse_color", "specular_color"]})
         
         xcycles = ET.SubElement(xmat, "cycles_settings")
         set_attributes(asset.cycles, xcycles, optimize_file)
@@ -412,7 +564,8 @@ def generate_xml(asset, imgi_export=True, imge_export=True, seq_export=True, mov
             imagelist.append({
             "image": img,
             "destination": "images/sequence_" + str(seqindex),
-            "range": frange})
+            "range": frange,
+            "frames": seq_frames[img]})
             seqindex += 1
         elif img.source == 'MOVIE':
             imagelist.append({
@@ -440,7 +593,11 @@ def generate_xml(asset, imgi_export=True, imge_export=True, seq_export=True, mov
         xml += b"\n"
     xml += ET.tostring(xroot, encoding="utf-8")
     
-    for f in failed:
-        print("{} {} failed to be exported.".format(failed[f], f))
+    if report is None:
+        for line in failed.summary("exported"):
+            print(line)
+    
+    if stats is not None:
+        count_structure(xroot, stats)
     
     return xml, imagelist, textlist
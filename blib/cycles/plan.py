@@ -0,0 +1,538 @@
+# ##### BEGIN GPL LICENSE BLOCK #####
+#
+# Part of the Cycles sub-package of Blib.
+# Cycles Blib import plans: Compiled form of the structure of Blib files.
+# Copyright (C) 2016  Luca Rood
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+
+# You should have received a copy of the GNU General Public License
+# along with this program.  If not, see <http://www.gnu.org/licenses/>.
+#
+# ##### END GPL LICENSE BLOCK #####
+
+"""
+Compiled import plans, holding the structure of Blib files with all attributes already decoded.
+
+Plans don't depend on Blender, and are cached by archive checksum,
+so repeated imports of the same file skip parsing the structure entirely.
+"""
+
+import json
+from ast import literal_eval
+from collections import OrderedDict
+from os import path, makedirs, replace
+
+from .version import version
+from ..utils import unpack_floats
+from ..exceptions import InvalidBlibFile, BlibTypeError
+
+converters = {
+    "b": lambda val: val == "True",
+    "i": int,
+    "f": float,
+    "e": str,
+    "E": lambda val: set(val.split()),
+    "s": str,
+    "n": lambda val: None,
+    "v": lambda val: unpack_floats(val).tolist(),
+    "l": literal_eval,
+}
+
+class AttributesPlan(object):
+    """
+    Decoded attributes of an element.
+    
+    Attributes:
+        values (list[tuple]): (name, value) pairs, in file order.
+        invalid (list[str]): Names of the attributes whose value could not be decoded.
+    """
+    
+    __slots__ = ("values", "invalid")
+    
+    def __init__(self, values=None, invalid=None):
+        self.values = [] if values is None else values
+        self.invalid = [] if invalid is None else invalid
+
+class NodePlan(object):
+    """
+    A node to be created, with the data needed to set it up.
+    
+    Attributes:
+        bl_idname (str): Node type.
+        name (str): Node name in the structure.
+        parent (str or None): Name of the parent frame.
+        node_tree (str or None): Name of the node group used by group nodes.
+        mode (str or None): Mode of script nodes.
+        script (str or None): Name of the internal script text of script nodes.
+        filepath (str or None): Archive path of the external script of script nodes.
+        text (str or None): Name of the text of frame nodes.
+        image (str or None): Name of the image of image nodes.
+        image_user (blib.cycles.plan.AttributesPlan or None): Image user settings of image nodes.
+        curves (list or None): Curve points of curve mapping nodes.
+        ramp (list or None): Elements of color ramp nodes.
+        ramp_attributes (blib.cycles.plan.AttributesPlan or None): Settings of the color ramp.
+        attributes (blib.cycles.plan.AttributesPlan): Node attributes.
+        inputs (list[blib.cycles.plan.AttributesPlan]): Attributes of the input sockets.
+        outputs (list[blib.cycles.plan.AttributesPlan]): Attributes of the output sockets.
+    """
+    
+    __slots__ = ("bl_idname", "name", "parent", "node_tree", "mode", "script", "filepath", "text", "image",
+                 "image_user", "curves", "ramp", "ramp_attributes", "attributes", "inputs", "outputs")
+
+class LinkPlan(object):
+    """
+    A link to be created between two nodes, by node name and socket index.
+    """
+    
+    __slots__ = ("from_node", "from_socket", "to_node", "to_socket")
+    
+    def __init__(self, from_node, from_socket, to_node, to_socket):
+        self.from_node = from_node
+        self.from_socket = from_socket
+        self.to_node = to_node
+        self.to_socket = to_socket
+
+class TreePlan(object):
+    """
+    A node tree to be built, either a node group or the material tree.
+    
+    Attributes:
+        name (str): Name of the node group or material.
+        hash (str or None): Structural hash of node groups (see 'blib.cycles.generate_xml.group_hash').
+        bl_idname (str or None): Node tree type of node groups.
+        attributes (blib.cycles.plan.AttributesPlan or None): Material attributes.
+        cycles (blib.cycles.plan.AttributesPlan or None): Material Cycles settings.
+        nodes (list[blib.cycles.plan.NodePlan]): Nodes in creation order.
+        links (list[blib.cycles.plan.LinkPlan]): Links between the nodes.
+        group_inputs (list[tuple] or None): (type, name) of the group input sockets, None if there is no input node.
+        group_outputs (list[tuple] or None): (type, name) of the group output sockets, None if there is no output node.
+    """
+    
+    __slots__ = ("name", "hash", "bl_idname", "attributes", "cycles", "nodes", "links", "group_inputs", "group_outputs")
+
+class ResourcePlan(object):
+    """
+    An image or text resource, exposing the same 'attrib' and 'text' as the structure element it comes from.
+    """
+    
+    __slots__ = ("attrib", "text")
+    
+    def __init__(self, attrib, text=None):
+        self.attrib = attrib
+        self.text = text
+
+class ImportPlan(object):
+    """
+    The compiled structure of a Blib file.
+    
+    Attributes:
+        version (str): Version of Blib that created the file.
+        images (list[blib.cycles.plan.ResourcePlan] or None): Images, None if the file has no images.
+        texts (list[blib.cycles.plan.ResourcePlan] or None): Texts, None if the file has no texts.
+        groups (list[blib.cycles.plan.TreePlan] or None): Node groups, in creation order, None if the file has no groups.
+        main (blib.cycles.plan.TreePlan or None): The material, None for node group files.
+        windows (dict): Frame range used by the nodes, per image name (see 'frame_windows').
+    """
+    
+    __slots__ = ("version", "images", "texts", "groups", "main", "windows")
+
+def read_types(xelement):
+    types = {}
+    for group in xelement.attrib["blib_types"].split():
+        code, names = group.split(":")
+        for name in names.split(","):
+            types[name] = code
+    return types
+
+def compile_attributes(xelement, skip=()):
+    """
+    Decode the attributes of a structure element.
+    
+    Args:
+        xelement (xml.etree.ElementTree.Element): The element.
+        skip (container[str]): Names of attributes that are not set from the element.
+    
+    Returns:
+        blib.cycles.plan.AttributesPlan
+    """
+    
+    attributes = AttributesPlan()
+    if xelement is None:
+        return attributes
+    
+    if "blib_types" in xelement.attrib:
+        types = read_types(xelement)
+    else: #Untyped attributes, from files prior to type tags
+        types = None
+    
+    for attr, text in xelement.attrib.items():
+        if attr.startswith("blib_") or attr.startswith("bl_") or attr in skip:
+            continue
+        if types is None:
+            try:
+                val = literal_eval(text)
+            except (ValueError, SyntaxError):
+                val = text
+        else:
+            try:
+                val = converters[types.get(attr, "s")](text)
+            except (KeyError, ValueError, SyntaxError):
+                attributes.invalid.append(attr)
+                continue
+        attributes.values.append((attr, val))
+    return attributes
+
+def read_curves(xcurvedata):
+    if len(xcurvedata) == 0: #Literal list, from files prior to packed arrays
+        return literal_eval(xcurvedata.text)
+    
+    curvedata = []
+    for xcurve in xcurvedata:
+        locations = unpack_floats(xcurve.text or "")
+        handles = xcurve.attrib["handles"].split()
+        curvedata.append([[locations[p_i * 2:p_i * 2 + 2].tolist(), handle] for p_i, handle in enumerate(handles)])
+    return curvedata
+
+def read_ramp(xrampdata):
+    xelements = xrampdata.find("elements")
+    if xelements is None: #Literal list, from files prior to packed arrays
+        return literal_eval(xrampdata.text)
+    
+    values = unpack_floats(xelements.text or "")
+    return [[values[i], values[i + 1:i + 5].tolist()] for i in range(0, len(values), 5)]
+
+def frame_windows(xtrees):
+    """
+    Collect the frame range used by the nodes of each image sequence (or movie).
+    
+    Args:
+        xtrees (list[xml.etree.ElementTree.Element]): The "main" and "group" elements of the structure.
+    
+    Returns:
+        dict: [start, end] frame range per image name, or None if the range of any node is unknown.
+    """
+    
+    windows = {}
+    for xtree in xtrees:
+        xnodes = xtree.find("nodes")
+        if xnodes is None:
+            continue
+        for xnode in xnodes:
+            ximageuser = xnode.find("image_user")
+            if "blib_image" not in xnode.attrib or ximageuser is None:
+                continue
+            name = xnode.attrib["blib_image"]
+            try:
+                offset = int(ximageuser.attrib["frame_offset"])
+                duration = int(ximageuser.attrib["frame_duration"])
+            except (KeyError, ValueError):
+                windows[name] = None
+                continue
+            
+            frange = [offset + 1, offset + duration]
+            if name not in windows:
+                windows[name] = frange
+            elif windows[name] is not None:
+                windows[name][0] = min(windows[name][0], frange[0])
+                windows[name][1] = max(windows[name][1], frange[1])
+    return windows
+
+def compile_node(xnode):
+    attrib = xnode.attrib
+    node = NodePlan()
+    node.bl_idname = attrib["bl_idname"]
+    node.name = attrib["name"]
+    node.parent = attrib.get("blib_parent")
+    node.node_tree = attrib.get("blib_node_tree")
+    node.mode = attrib.get("mode")
+    node.script = attrib.get("blib_script")
+    node.filepath = attrib.get("blib_filepath")
+    node.text = attrib.get("blib_text")
+    node.image = attrib.get("blib_image")
+    node.attributes = compile_attributes(xnode, {"mode"} if node.bl_idname == "ShaderNodeScript" else ())
+    
+    ximageuser = xnode.find("image_user")
+    node.image_user = None if ximageuser is None else compile_attributes(ximageuser)
+    
+    xcurvedata = xnode.find("curve_data")
+    node.curves = None if xcurvedata is None else read_curves(xcurvedata)
+    
+    xrampdata = xnode.find("ramp_data")
+    if xrampdata is None:
+        node.ramp = None
+        node.ramp_attributes = None
+    else:
+        node.ramp = read_ramp(xrampdata)
+        node.ramp_attributes = compile_attributes(xrampdata)
+    
+    xinps = xnode.find("inputs")
+    xouts = xnode.find("outputs")
+    node.inputs = [] if xinps is None else [compile_attributes(xinp) for xinp in xinps]
+    node.outputs = [] if xouts is None else [compile_attributes(xout) for xout in xouts]
+    return node
+
+def compile_tree(xtree, material=False):
+    """
+    Compile a node tree element of the structure.
+    
+    Args:
+        xtree (xml.etree.ElementTree.Element): The "main" or "group" element.
+        material (bool): True for the "main" element, whose own attributes are material attributes.
+    
+    Returns:
+        blib.cycles.plan.TreePlan
+    """
+    
+    tree = TreePlan()
+    tree.name = xtree.attrib["name"]
+    tree.hash = xtree.attrib.get("blib_hash")
+    tree.bl_idname = xtree.attrib.get("bl_idname")
+    tree.attributes = compile_attributes(xtree, {"name"}) if material else None
+    tree.cycles = compile_attributes(xtree.find("cycles_settings")) if material else None
+    tree.nodes = []
+    tree.links = []
+    tree.group_inputs = None
+    tree.group_outputs = None
+    
+    xnodes = xtree.find("nodes")
+    if xnodes is not None:
+        for xnode in xnodes:
+            tree.nodes.append(compile_node(xnode))
+            if xnode.attrib["bl_idname"] == "NodeGroupInput":
+                xouts = xnode.find("outputs")
+                tree.group_inputs = [] if xouts is None else [(x.attrib["type"], x.attrib["name"]) for x in xouts]
+            elif xnode.attrib["bl_idname"] == "NodeGroupOutput":
+                xinps = xnode.find("inputs")
+                tree.group_outputs = [] if xinps is None else [(x.attrib["type"], x.attrib["name"]) for x in xinps]
+    
+    xlinks = xtree.find("links")
+    if xlinks is not None:
+        for xlink in xlinks:
+            tree.links.append(LinkPlan(xlink.attrib["from_node"], int(xlink.attrib["from_socket"]),
+                                       xlink.attrib["to_node"], int(xlink.attrib["to_socket"])))
+    return tree
+
+def compile_structure(xroot):
+    """
+    Compile the structure of a Blib file into an import plan.
+    
+    Args:
+        xroot (xml.etree.ElementTree.Element): Root element of the structure.
+    
+    Returns:
+        blib.cycles.plan.ImportPlan
+    
+    Raises:
+        blib.exeptions.InvalidBlibFile: If the structure is not a Blender library.
+        blib.exeptions.BlibTypeError: If the Blender library is not of type "cycles".
+    """
+    
+    if xroot.tag != "blib":
+        raise InvalidBlibFile("File is not a Blender library")
+    
+    if xroot.attrib["type"] != "cycles":
+        raise BlibTypeError("File is not a valid Cycles material")
+    
+    plan = ImportPlan()
+    plan.version = xroot.attrib.get("version")
+    plan.images = None
+    plan.texts = None
+    plan.groups = None
+    plan.main = None
+    
+    xtrees = []
+    xres = xroot.find("resources")
+    if xres is not None:
+        ximgs = xres.find("images")
+        xtxts = xres.find("texts")
+        xgrps = xres.find("groups")
+        if ximgs is not None:
+            plan.images = [ResourcePlan(dict(ximg.attrib)) for ximg in ximgs]
+        if xtxts is not None:
+            plan.texts = [ResourcePlan(dict(xtxt.attrib), xtxt.text) for xtxt in xtxts]
+        if xgrps is not None:
+            plan.groups = [compile_tree(xgrp) for xgrp in xgrps]
+            xtrees.extend(xgrps)
+    
+    xmat = xroot.find("main")
+    if xmat is not None:
+        plan.main = compile_tree(xmat, True)
+        xtrees.insert(0, xmat)
+    
+    plan.windows = frame_windows(xtrees)
+    return plan
+
+plan_types = {cls.__name__: cls for cls in (AttributesPlan, NodePlan, LinkPlan, TreePlan, ResourcePlan, ImportPlan)}
+
+def encode_plan(value):
+    """
+    Convert a plan to JSON compatible data, tagging the values JSON can't represent.
+    
+    Args:
+        value: The plan, or any value it holds.
+    
+    Returns:
+        JSON compatible data, to be converted back with 'decode_plan'.
+    
+    Raises:
+        TypeError: If the plan holds a value of unsupported type.
+    """
+    
+    if value is None or isinstance(value, (bool, int, float, str)):
+        return value
+    if isinstance(value, list):
+        return [encode_plan(item) for item in value]
+    if isinstance(value, tuple):
+        return {"tuple": [encode_plan(item) for item in value]}
+    if isinstance(value, (set, frozenset)):
+        return {"set": sorted(encode_plan(item) for item in value)}
+    if isinstance(value, dict):
+        return {"dict": [[encode_plan(key), encode_plan(item)] for key, item in value.items()]}
+    if plan_types.get(type(value).__name__) is type(value):
+        return {"plan": type(value).__name__,
+                "fields": {slot: encode_plan(getattr(value, slot)) for slot in value.__slots__ if hasattr(value, slot)}}
+    raise TypeError("Can't encode {} in a plan".format(type(value).__name__))
+
+def decode_plan(data):
+    """
+    Convert data created by 'encode_plan' back to a plan.
+    
+    Only plan classes of this module are created, and only their declared fields are set,
+    so decoding can't run any code, unlike unpickling.
+    
+    Args:
+        data: The JSON compatible data.
+    
+    Returns:
+        The plan, or the value it was created from.
+    
+    Raises:
+        ValueError: If the data was not created by 'encode_plan'.
+    """
+    
+    if data is None or isinstance(data, (bool, int, float, str)):
+        return data
+    if isinstance(data, list):
+        return [decode_plan(item) for item in data]
+    if isinstance(data, dict) and len(data) == 1:
+        if "tuple" in data:
+            return tuple(decode_plan(item) for item in data["tuple"])
+        if "set" in data:
+            return set(decode_plan(item) for item in data["set"])
+        if "dict" in data:
+            return {decode_plan(key): decode_plan(item) for key, item in data["dict"]}
+    if isinstance(data, dict) and set(data) == {"plan", "fields"} and data["plan"] in plan_types:
+        cls = plan_types[data["plan"]]
+        plan = cls.__new__(cls)
+        for slot, item in data["fields"].items():
+            if slot not in cls.__slots__:
+                raise ValueError("Unknown field '{}' of {}".format(slot, data["plan"]))
+            setattr(plan, slot, decode_plan(item))
+        return plan
+    raise ValueError("Invalid plan data")
+
+class PlanCache(object):
+    """
+    Cache of import plans, kept in memory and optionally on disk, keyed by archive checksum.
+    
+    Plans must only be stored and looked up under checksums that were verified against the archive,
+    otherwise the plan of an altered file could be used.
+    Plans are stored on disk as JSON (see 'encode_plan'), so reading them never runs code,
+    but anyone able to write to the directory can still change what gets imported: only use trusted directories.
+    
+    Args:
+        max_plans (int or None): Maximum number of plans kept in memory, least recently used dropped first.
+            None for no limit.
+        directory (str or None): Directory in which plans are also stored, to be reused across sessions.
+            None to only keep plans in memory.
+    
+    Attributes:
+        max_plans (int or None): Maximum number of plans kept in memory.
+        directory (str or None): Directory in which plans are stored.
+    """
+    
+    def __init__(self, max_plans=64, directory=None):
+        self.max_plans = max_plans
+        self.directory = directory
+        self._plans = OrderedDict()
+    
+    def __len__(self):
+        return len(self._plans)
+    
+    def clear(self):
+        """Drop all plans kept in memory (plans stored on disk are kept)."""
+        self._plans.clear()
+    
+    def _file(self, checksum):
+        return path.join(self.directory, "{}-{}.json".format(checksum, version))
+    
+    def get(self, checksum):
+        """
+        Get the plan of an archive.
+        
+        Args:
+            checksum (str): Verified checksum of the archive.
+        
+        Returns:
+            blib.cycles.plan.ImportPlan or None: The plan, or None if it is not cached.
+        """
+        
+        plan = self._plans.get(checksum)
+        if plan is not None:
+            self._plans.move_to_end(checksum)
+            return plan
+        
+        if self.directory is not None and path.isfile(self._file(checksum)):
+            try:
+                plan_file = open(self._file(checksum), 'r', encoding="utf-8")
+                try:
+                    plan = decode_plan(json.load(plan_file))
+                finally:
+                    plan_file.close()
+            except (OSError, ValueError, TypeError, RecursionError): #Unreadable plans are compiled again
+                return None
+            if isinstance(plan, ImportPlan):
+                self._add(checksum, plan)
+                return plan
+        return None
+    
+    def set(self, checksum, plan):
+        """
+        Store the plan of an archive.
+        
+        Args:
+            checksum (str): Verified checksum of the archive.
+            plan (blib.cycles.plan.ImportPlan): The plan.
+        """
+        
+        self._add(checksum, plan)
+        if self.directory is not None:
+            try:
+                data = json.dumps(encode_plan(plan), separators=(",", ":"))
+            except (TypeError, ValueError): #Values JSON can't hold (e.g. bytes literals), only kept in memory
+                return
+            if not path.isdir(self.directory):
+                makedirs(self.directory)
+            tmp_path = self._file(checksum) + ".tmp"
+            plan_file = open(tmp_path, 'w', encoding="utf-8")
+            plan_file.write(data)
+            plan_file.close()
+            replace(tmp_path, self._file(checksum))
+    
+    def _add(self, checksum, plan):
+        self._plans[checksum] = plan
+        self._plans.move_to_end(checksum)
+        if self.max_plans is not None:
+            while len(self._plans) > self.max_plans:
+                self._plans.popitem(last=False)
+
+cache = PlanCache()
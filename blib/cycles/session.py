@@ -0,0 +1,109 @@
+# ##### BEGIN GPL LICENSE BLOCK #####
+#
+# Part of the Blib package.
+# Blib cycles session: Batch import of Cycles materials and node groups.
+# Copyright (C) 2016  Luca Rood
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+
+# You should have received a copy of the GNU General Public License
+# along with this program.  If not, see <http://www.gnu.org/licenses/>.
+#
+# ##### END GPL LICENSE BLOCK #####
+
+"""Batch import of Cycles materials and node groups, sharing resource state across files."""
+
+import bpy
+
+from .bimport import bimport, ResourceHashes, TextDir
+from ..utils import ResourceDir
+from ..report import Report
+
+class ImportSession(object):
+    """
+    Import several .blib or .xml files into the same resources.
+    
+    The resource hash file ("list.sfv") is read once, shared by all imports for image merging,
+    and written once when the session is closed. Texts and scripts with identical content are only
+    extracted (or loaded in Blender) once for the whole session, and their files are saved to the same directory
+    (see 'blib.cycles.bimport.TextDir'). Images of each file are still saved to their own numbered directories,
+    as file names may clash across files.
+    Failures of all imports are recorded in the same report.
+    
+    Can be used as a context manager, closing the session on exit:
+        
+        with ImportSession(resource_path, img_merge=True) as session:
+            for filepath in filepaths:
+                session.bimport(filepath)
+    
+    Args:
+        resource_path (str or None): Custom path to save external resources or None to keep the default path.
+        report (blib.report.Report or None): Report in which to record failures, None to create a new one.
+        **options: Default options passed to 'blib.cycles.bimport' (except "resource_path").
+    
+    Attributes:
+        resource_path (str or None): Absolute path of the resources.
+        options (dict): Default options passed to 'blib.cycles.bimport'.
+        hashes (blib.cycles.bimport.ResourceHashes): Hashes of the image resources, shared by all imports.
+        scripts (dict): Imported scripts (text datablocks or file paths) by content.
+        texts (dict): Imported texts (text datablock, and file path or None) by content.
+        text_dir (blib.cycles.bimport.TextDir): Directory of the text and script files, shared by all imports.
+        report (blib.report.Report): Failures of all imports.
+        imported (list): The materials and node groups imported so far.
+    """
+    
+    def __init__(self, resource_path=None, report=None, **options):
+        if resource_path is None or resource_path.strip() == "":
+            self.resource_path = None
+        else:
+            self.resource_path = bpy.path.abspath(resource_path) #Ensure path is absolute
+        self.options = options
+        self.hashes = ResourceHashes(ResourceDir("images", self.resource_path).root)
+        self.scripts = {}
+        self.texts = {}
+        self.text_dir = TextDir(self.resource_path)
+        self.report = Report() if report is None else report
+        self.imported = []
+    
+    def __enter__(self):
+        return self
+    
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.close()
+    
+    def bimport(self, filepath, **options):
+        """
+        Import a file as part of the session.
+        
+        Args:
+            filepath (str): Path to .blib or .xml file.
+            **options: Options overriding the session defaults for this file.
+        
+        Returns:
+            bpy.types.Material or bpy.types.ShaderNodeTree
+            The produced material or node tree.
+            With "return_report", a (material or node tree, blib.report.Report) tuple instead.
+        
+        Raises:
+            Same as 'blib.cycles.bimport'.
+        """
+        
+        kwargs = dict(self.options)
+        kwargs.update(options)
+        kwargs.pop("resource_path", None)
+        result = bimport(filepath, session=self, **kwargs)
+        self.imported.append(result[0] if kwargs.get("return_report") else result)
+        return result
+    
+    def close(self):
+        """Write the resource hash file, if it has changed during the session."""
+        
+        self.hashes.save()
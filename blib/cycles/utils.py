@@ -19,11 +19,18 @@
 #
 # ##### END GPL LICENSE BLOCK #####
 
-"""Utility functions for the Cycles Blib package."""
+"""
+Utility functions for the Cycles Blib package.
 
-import bpy
+Only 'check_asset' depends on Blender, the file checks can be used outside Blender.
+"""
 
-import xml.etree.cElementTree as ET
+try:
+    import bpy
+except ImportError: #Outside Blender
+    bpy = None
+
+import xml.etree.ElementTree as ET
 import zipfile as zf
 from ..exceptions import InvalidObject
 from ..utils import get_file_type
@@ -45,8 +52,12 @@ def check_asset(asset, do_raise=False):
     
     Raises:
         blib.exeptions.InvalidObject: If the check fails and 'do_raise' is True.
+        ImportError: If Blender's bpy module is not available.
     """
     
+    if bpy is None:
+        raise ImportError("check_asset requires Blender's bpy module")
+    
     if asset:
         if isinstance(asset, bpy.types.Material):
             if asset.use_nodes:
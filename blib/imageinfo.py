@@ -0,0 +1,265 @@
+# ##### BEGIN GPL LICENSE BLOCK #####
+#
+# Part of the Blib package.
+# Blib imageinfo: Image header parsing.
+# Copyright (C) 2016  Luca Rood
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+
+# You should have received a copy of the GNU General Public License
+# along with this program.  If not, see <http://www.gnu.org/licenses/>.
+#
+# ##### END GPL LICENSE BLOCK #####
+
+"""
+Image header parsing, reading only the headers (usually the first few KB), without decoding any pixels.
+
+Formats are named as in Blender's 'bpy.types.Image.file_format' ("PNG", "JPEG", "OPEN_EXR", "TIFF", "BMP",
+"TARGA", "HDR", "WEBP", "DPX"), plus "GIF" and "DDS".
+"""
+
+import struct
+from io import BytesIO
+from os import path
+
+HEADER_SIZE = 32
+MAX_HEADER = 1048576 #Limit of header bytes read for formats with variable length headers
+
+def parse_png(f, head):
+    if head[12:16] != b"IHDR":
+        return None
+    width, height, depth, color = struct.unpack(">IIBB", head[16:26])
+    channels = {0: 1, 2: 3, 3: 3, 4: 2, 6: 4}.get(color)
+    return width, height, channels
+
+def parse_jpeg(f, head):
+    f.seek(2)
+    while f.tell() < MAX_HEADER:
+        marker = f.read(2)
+        if len(marker) != 2 or marker[0] != 0xFF:
+            return None
+        while marker[1] == 0xFF: #Fill bytes
+            marker = marker[1:] + f.read(1)
+        code = marker[1]
+        if code in {0x01, 0xD0, 0xD1, 0xD2, 0xD3, 0xD4, 0xD5, 0xD6, 0xD7}: #No payload
+            continue
+        if code in {0xD9, 0xDA}: #End of image or start of scan, before any frame header
+            return None
+        length = struct.unpack(">H", f.read(2))[0]
+        if 0xC0 <= code <= 0xCF and code not in {0xC4, 0xC8, 0xCC}: #Start of frame
+            precision, height, width, channels = struct.unpack(">BHHB", f.read(6))
+            return width, height, channels
+        f.seek(length - 2, 1)
+    return None
+
+def parse_gif(f, head):
+    width, height = struct.unpack("<HH", head[6:10])
+    return width, height, 3
+
+def parse_bmp(f, head):
+    dib_size = struct.unpack("<I", head[14:18])[0]
+    if dib_size == 12:
+        width, height, planes, bpp = struct.unpack("<HHHH", head[18:26])
+    else:
+        width, height, planes, bpp = struct.unpack("<iiHH", head[18:30])
+    return abs(width), abs(height), 4 if bpp == 32 else 3
+
+def parse_tiff(f, head):
+    order = "<" if head[:2] == b"II" else ">"
+    offset = struct.unpack(order + "I", head[4:8])[0]
+    f.seek(offset)
+    count = struct.unpack(order + "H", f.read(2))[0]
+    tags = {}
+    for i in range(count):
+        tag, kind, number, value = struct.unpack(order + "HHI4s", f.read(12))
+        if kind == 3: #Short
+            tags[tag] = struct.unpack(order + "H", value[:2])[0]
+        elif kind == 4: #Long
+            tags[tag] = struct.unpack(order + "I", value)[0]
+    if 256 not in tags or 257 not in tags:
+        return None
+    return tags[256], tags[257], tags.get(277, 1)
+
+def parse_exr(f, head):
+    f.seek(8)
+    data = f.read(4096)
+    window = None
+    channels = None
+    pos = 0
+    while True:
+        name_end = data.find(b"\0", pos)
+        type_end = data.find(b"\0", name_end + 1) if name_end >= 0 else -1
+        end = type_end + 5 if type_end >= 0 else -1 #End of the attribute name, type and size
+        if pos >= len(data) or (data[pos] != 0 and (end < 0 or end > len(data))):
+            more = f.read(len(data)) if len(data) < MAX_HEADER else b"" #Attribute not read yet, read as much again
+            if not more:
+                return None
+            data += more
+            continue
+        if data[pos] == 0: #End of the header
+            break
+        name = data[pos:name_end]
+        size = struct.unpack("<i", data[end - 4:end])[0]
+        if size < 0 or end + size <= pos or end + size > MAX_HEADER: #Negative or oversized attribute, broken header
+            return None
+        if end + size > len(data):
+            data += f.read(end + size - len(data))
+            if end + size > len(data): #Truncated file
+                return None
+        value = data[end:end + size]
+        if name == b"dataWindow":
+            window = struct.unpack("<iiii", value)
+        elif name == b"channels":
+            channels = 0
+            i = 0
+            while i < len(value) and value[i] != 0:
+                i = value.index(b"\0", i) + 17 #Name, then pixel type, linear, reserved and sampling
+                channels += 1
+        pos = end + size
+        if window is not None and channels is not None:
+            break
+    if window is None:
+        return None
+    return window[2] - window[0] + 1, window[3] - window[1] + 1, channels
+
+def parse_hdr(f, head):
+    f.seek(0)
+    for i in range(64):
+        line = f.readline(256).strip()
+        if not line:
+            break
+    else:
+        return None
+    fields = f.readline(256).split()
+    if len(fields) != 4:
+        return None
+    if fields[0][1:] == b"Y":
+        height, width = int(fields[1]), int(fields[3])
+    else:
+        width, height = int(fields[1]), int(fields[3])
+    return width, height, 3
+
+def parse_webp(f, head):
+    f.seek(12)
+    chunk = f.read(20)
+    if chunk[:4] == b"VP8X":
+        flags = chunk[8]
+        width = int.from_bytes(chunk[12:15], "little") + 1
+        height = int.from_bytes(chunk[15:18], "little") + 1
+        return width, height, 4 if flags & 0x10 else 3
+    if chunk[:4] == b"VP8L":
+        bits = int.from_bytes(chunk[9:13], "little")
+        width = (bits & 0x3FFF) + 1
+        height = ((bits >> 14) & 0x3FFF) + 1
+        return width, height, 4 if bits >> 28 & 1 else 3
+    if chunk[:4] == b"VP8 ":
+        width, height = struct.unpack("<HH", chunk[14:18])
+        return width & 0x3FFF, height & 0x3FFF, 3
+    return None
+
+def parse_dpx(f, head):
+    order = ">" if head[:4] == b"SDPX" else "<"
+    f.seek(772)
+    data = f.read(29)
+    width, height = struct.unpack(order + "II", data[:8])
+    channels = {6: 1, 50: 3, 51: 4, 52: 4}.get(data[28])
+    return width, height, channels
+
+def parse_dds(f, head):
+    height, width = struct.unpack("<II", head[12:20])
+    return width, height, None
+
+def parse_targa(f, head):
+    cmap_type, image_type = head[1], head[2]
+    width, height, bpp = struct.unpack("<HHB", head[12:17])
+    if cmap_type not in {0, 1} or image_type not in {1, 2, 3, 9, 10, 11} or bpp not in {8, 15, 16, 24, 32}:
+        return None
+    if image_type in {3, 11}:
+        return width, height, 1
+    return width, height, 4 if bpp == 32 else 3
+
+signatures = [
+    (b"\x89PNG\r\n\x1a\n", "PNG", parse_png),
+    (b"\xff\xd8", "JPEG", parse_jpeg),
+    (b"GIF87a", "GIF", parse_gif),
+    (b"GIF89a", "GIF", parse_gif),
+    (b"BM", "BMP", parse_bmp),
+    (b"II*\0", "TIFF", parse_tiff),
+    (b"MM\0*", "TIFF", parse_tiff),
+    (b"\x76\x2f\x31\x01", "OPEN_EXR", parse_exr),
+    (b"#?RADIANCE", "HDR", parse_hdr),
+    (b"#?RGBE", "HDR", parse_hdr),
+    (b"SDPX", "DPX", parse_dpx),
+    (b"XPDS", "DPX", parse_dpx),
+    (b"DDS ", "DDS", parse_dds),
+]
+
+def read_header(f, name=""):
+    """
+    Parse the header of an image.
+    
+    Args:
+        f (file): Binary file object of the image, positioned at its start, and seekable.
+        name (str): File name of the image, to identify formats without a signature (Targa) by their extension.
+    
+    Returns:
+        dict or None: "format", "width", "height" and "channels" (None if unknown) of the image,
+        None if the format is not recognized or the header is broken.
+    """
+    
+    head = f.read(HEADER_SIZE)
+    parsers = [(fmt, parser) for magic, fmt, parser in signatures if head.startswith(magic)]
+    if head[:4] == b"RIFF" and head[8:12] == b"WEBP":
+        parsers.append(("WEBP", parse_webp))
+    if not parsers and path.splitext(name)[1].lower() in {".tga", ".targa"}:
+        parsers.append(("TARGA", parse_targa))
+    
+    for fmt, parser in parsers:
+        try:
+            info = parser(f, head)
+        except (struct.error, ValueError, IndexError, OSError):
+            info = None
+        if info is not None:
+            return {"format": fmt, "width": info[0], "height": info[1], "channels": info[2]}
+    return None
+
+def image_info(source, name=None):
+    """
+    Get the format, resolution and channel count of an image file or data, only reading its header.
+    
+    Args:
+        source (str or bytes): The path to the image file, or its data.
+        name (str or None): File name of the image, None to use the path of the source.
+    
+    Returns:
+        dict or None: "format", "width", "height", "channels" (None if unknown) and "size" (bytes) of the image,
+        None if the format is not recognized, or the file can't be read.
+    """
+    
+    if isinstance(source, str):
+        try:
+            f = open(source, 'rb')
+        except OSError:
+            return None
+        size = path.getsize(source)
+        name = source if name is None else name
+    else:
+        f = BytesIO(source)
+        size = len(source)
+    
+    try:
+        info = read_header(f, name or "")
+    finally:
+        f.close()
+    
+    if info is not None:
+        info["size"] = size
+    return info
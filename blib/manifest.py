@@ -0,0 +1,255 @@
+# ##### BEGIN GPL LICENSE BLOCK #####
+#
+# Part of the Blib package.
+# Blib manifest: Read-only inspection of Blib files.
+# Copyright (C) 2016  Luca Rood
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+
+# You should have received a copy of the GNU General Public License
+# along with this program.  If not, see <http://www.gnu.org/licenses/>.
+#
+# ##### END GPL LICENSE BLOCK #####
+
+"""
+Read-only inspection of Blib files.
+
+Nothing is imported or extracted, and Blender is not required,
+so this can be used to list the content of libraries headlessly.
+"""
+
+import xml.etree.ElementTree as ET
+from os import path
+
+from .utils import get_path, EntryIndex
+from .remote import is_url, extension, open_archive, RemoteFile
+from .exceptions import InvalidBlibFile, BlibTypeError
+
+def tree_manifest(xtree):
+    """
+    Summarize a node tree element of a Blib structure.
+    
+    Args:
+        xtree (xml.etree.ElementTree.Element): The "main" or "group" element.
+    
+    Returns:
+        dict: Name, node count, link count and node count per node type.
+    """
+    
+    xnodes = xtree.find("nodes")
+    xlinks = xtree.find("links")
+    node_types = {}
+    if xnodes is not None:
+        for xnode in xnodes:
+            bl_idname = xnode.attrib["bl_idname"]
+            node_types[bl_idname] = node_types.get(bl_idname, 0) + 1
+    
+    return {
+        "name": xtree.attrib["name"],
+        "nodes": 0 if xnodes is None else len(xnodes),
+        "links": 0 if xlinks is None else len(xlinks),
+        "node_types": node_types,
+    }
+
+def int_attrib(xelement, key):
+    value = xelement.attrib.get(key)
+    return None if value is None else int(value)
+
+def read_structure(xroot, archive=None):
+    """
+    Generate the manifest of a Blib structure.
+    
+    Args:
+        xroot (xml.etree.ElementTree.Element): Root element of the structure.
+        archive (zipfile.ZipFile or None): The archive containing the resources,
+            None if the structure comes from a bare .xml file.
+    
+    Returns:
+        dict: The manifest (see 'read_manifest').
+    
+    Raises:
+        blib.exeptions.InvalidBlibFile: If the structure is not a Blender library.
+        blib.exeptions.BlibTypeError: If the Blender library is not of type "cycles".
+    """
+    
+    if xroot.tag != "blib":
+        raise InvalidBlibFile("File is not a Blender library")
+    
+    if xroot.attrib.get("type") != "cycles":
+        raise BlibTypeError("File is not a valid Cycles material")
+    
+    if archive is not None:
+        index = EntryIndex(archive)
+    
+    def entry_size(zpath):
+        if archive is None:
+            return None
+        try:
+            return archive.getinfo(get_path(archive, zpath)).file_size
+        except KeyError:
+            return None
+    
+    manifest = {
+        "type": xroot.attrib["type"],
+        "version": xroot.attrib.get("version"),
+        "compatible": xroot.attrib.get("compatible"),
+        "subtype": None,
+        "main": None,
+        "groups": [],
+        "images": [],
+        "texts": [],
+        "scripts": [],
+    }
+    
+    xmain = xroot.find("main")
+    xres = xroot.find("resources")
+    if xmain is not None:
+        manifest["subtype"] = "mat"
+        manifest["main"] = tree_manifest(xmain)
+    elif xres is not None:
+        manifest["subtype"] = "grp"
+    
+    trees = [] if xmain is None else [xmain]
+    
+    if xres is not None:
+        ximgs = xres.find("images")
+        xtxts = xres.find("texts")
+        xgrps = xres.find("groups")
+        
+        if ximgs is not None:
+            for ximg in ximgs:
+                image = {
+                    "name": ximg.attrib["name"],
+                    "source": ximg.attrib["source"],
+                    "origin": ximg.attrib.get("origin"),
+                    "path": ximg.attrib["path"],
+                    "size": None,
+                    "frames": None,
+                    "format": ximg.attrib.get("format"),
+                    "width": int_attrib(ximg, "width"),
+                    "height": int_attrib(ximg, "height"),
+                    "channels": int_attrib(ximg, "channels"),
+                }
+                if ximg.attrib["source"] == 'SEQUENCE':
+                    if archive is not None:
+                        seq_dir = path.dirname(ximg.attrib["path"])
+                        frames = index.listdir(seq_dir)
+                        sizes = [entry_size(seq_dir + "/" + frame) for frame in frames]
+                        image["frames"] = len(frames)
+                        image["size"] = sum(size for size in sizes if size is not None)
+                    elif "frames" in ximg.attrib: #Frame count and total size recorded on export
+                        image["frames"] = int_attrib(ximg, "frames")
+                        image["size"] = int_attrib(ximg, "size") #Older files only record the size of one frame
+                else:
+                    image["size"] = entry_size(ximg.attrib["path"])
+                    if image["size"] is None: #Size recorded on export
+                        image["size"] = int_attrib(ximg, "size")
+                manifest["images"].append(image)
+        
+        if xtxts is not None:
+            for xtxt in xtxts:
+                if "path" in xtxt.attrib:
+                    size = entry_size(xtxt.attrib["path"])
+                else:
+                    size = len((xtxt.text or "").encode("utf-8"))
+                manifest["texts"].append({
+                    "name": xtxt.attrib["name"],
+                    "origin": xtxt.attrib["origin"],
+                    "path": xtxt.attrib.get("path"),
+                    "size": size,
+                })
+        
+        if xgrps is not None:
+            for xgrp in xgrps:
+                manifest["groups"].append(tree_manifest(xgrp))
+                trees.append(xgrp)
+    
+    scripts = set()
+    for xtree in trees:
+        xnodes = xtree.find("nodes")
+        if xnodes is not None:
+            for xnode in xnodes:
+                if "blib_filepath" in xnode.attrib:
+                    scripts.add(xnode.attrib["blib_filepath"])
+    for spath in sorted(scripts):
+        manifest["scripts"].append({"path": spath, "size": entry_size(spath)})
+    
+    return manifest
+
+def read_manifest(filepath):
+    """
+    Inspect the content of a .blib or .xml file, without importing anything.
+    
+    Args:
+        filepath (str): Path or URL (see 'blib.remote') to .blib or .xml file.
+    
+    Returns:
+        dict: The manifest, with keys:
+            "type", "version", "compatible" (str): Blib meta-data.
+            "checksum" (str or None): Checksum stored in the archive, None for .xml files.
+            "subtype" (str or None): "mat" for materials, "grp" for node groups.
+            "main" (dict or None): Summary of the material node tree, with "name", "nodes", "links" and "node_types".
+            "groups" (list[dict]): Summaries of the node groups, same as "main".
+            "images" (list[dict]): Images, with "name", "source", "origin", "path", "size" (bytes),
+                "frames" (number of stored frames for sequences), and "format", "width", "height" and "channels"
+                from the image header (see 'blib.imageinfo'), recorded on export (None if unknown).
+            "texts" (list[dict]): Texts, with "name", "origin", "path" and "size".
+            "scripts" (list[dict]): Scripts referenced by path in "script" nodes, with "path" and "size".
+            "entries" (int or None): Number of entries in the archive.
+            "file_size" (int or None): Total uncompressed size of the archive content.
+            "compress_size" (int or None): Total compressed size of the archive content.
+        Sizes are None if the data is not available.
+    
+    Raises:
+        blib.exeptions.InvalidBlibFile: If the file is not a valid Blender Library.
+        blib.exeptions.BlibTypeError: If the Blender Library is not of type "cycles".
+    """
+    
+    ext = extension(filepath)
+    if ext == ".blib":
+        archive = open_archive(filepath)
+        
+        try:
+            try:
+                xml_file = archive.open("structure.xml", 'r')
+            except KeyError:
+                raise InvalidBlibFile("File is broken, missing structure XML")
+            try:
+                xroot = ET.parse(xml_file).getroot()
+            except ET.ParseError:
+                raise InvalidBlibFile("File is broken, invalid structure XML")
+            finally:
+                xml_file.close()
+            
+            manifest = read_structure(xroot, archive)
+            manifest["checksum"] = archive.comment.decode("utf-8").split(" ")[0] or None
+            infos = archive.infolist()
+            manifest["entries"] = len(infos)
+            manifest["file_size"] = sum(info.file_size for info in infos)
+            manifest["compress_size"] = sum(info.compress_size for info in infos)
+        finally:
+            archive.close()
+    
+    elif ext == ".xml":
+        try:
+            xroot = ET.parse(RemoteFile(filepath) if is_url(filepath) else filepath).getroot()
+        except ET.ParseError:
+            raise InvalidBlibFile("File is not a Blender library")
+        manifest = read_structure(xroot)
+        manifest["checksum"] = None
+        manifest["entries"] = None
+        manifest["file_size"] = None
+        manifest["compress_size"] = None
+    
+    else:
+        raise InvalidBlibFile("File is not a Blender library")
+    
+    return manifest
@@ -0,0 +1,297 @@
+# ##### BEGIN GPL LICENSE BLOCK #####
+#
+# Part of the Blib package.
+# Blib remote: Reading of Blib files hosted on HTTP servers.
+# Copyright (C) 2016  Luca Rood
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+
+# You should have received a copy of the GNU General Public License
+# along with this program.  If not, see <http://www.gnu.org/licenses/>.
+#
+# ##### END GPL LICENSE BLOCK #####
+
+"""
+Reading of Blib files hosted on HTTP servers, fetching only the parts that are read.
+
+Wherever a .blib or .xml path is accepted for reading (e.g. 'blib.cycles.bimport' or 'blib.manifest.read_manifest'),
+an "http://" or "https://" URL can be passed instead. Archives are then read through HTTP Range requests:
+the central directory is fetched when the archive is opened, and entries only when they are extracted,
+so resources that are not imported (e.g. sequence frames outside the used frame window) are never downloaded.
+
+Attributes:
+    cache_dir (str or None): Directory in which fetched blocks are cached across reads of the same file version
+        (identified by its ETag, or its size and modification date). None to only keep them in memory while the file is open.
+    block_size (int): Size of the blocks in which files are fetched and cached.
+    max_memory (int): Maximum size of the blocks kept in memory per open file, least recently used dropped first
+        (they are loaded again from 'cache_dir', or fetched again). Exceeded by a single read that is larger,
+        and not applied to files of servers that ignore Range requests when 'cache_dir' is not set,
+        as their blocks can only be fetched again by downloading the whole file.
+    max_read_ahead (int): Maximum size fetched in a single request when a file is read sequentially.
+    timeout (float): Timeout of the HTTP requests, in seconds.
+"""
+
+import io
+import re
+import zipfile as zf
+from collections import OrderedDict
+from hashlib import sha1
+from os import path, makedirs, replace
+from urllib.parse import urlsplit, unquote
+from urllib.request import Request, urlopen
+
+from .exceptions import InvalidBlibFile
+
+cache_dir = None
+block_size = 65536
+max_memory = 67108864
+max_read_ahead = 8388608
+timeout = 30.0
+
+def is_url(filepath):
+    """
+    Check if a path is the URL of a remote file.
+    
+    Args:
+        filepath (str): Path or URL.
+    
+    Returns:
+        bool: True for "http://" and "https://" URLs.
+    """
+    
+    return filepath.startswith(("http://", "https://"))
+
+def extension(filepath):
+    """
+    Get the extension of a local path or of the path of a URL (ignoring its query).
+    
+    Args:
+        filepath (str): Path or URL.
+    
+    Returns:
+        str: The extension, including the dot (e.g. ".blib").
+    """
+    
+    if is_url(filepath):
+        filepath = unquote(urlsplit(filepath).path)
+    return path.splitext(filepath)[1]
+
+def open_archive(filepath):
+    """
+    Open a local or remote archive for reading.
+    
+    Args:
+        filepath (str): Path or URL of the archive.
+    
+    Returns:
+        zipfile.ZipFile
+    
+    Raises:
+        blib.exeptions.InvalidBlibFile: If the file is not a zip archive.
+        OSError: If the file can't be read (including HTTP errors).
+    """
+    
+    try:
+        if is_url(filepath):
+            return zf.ZipFile(RemoteFile(filepath), 'r')
+        return zf.ZipFile(filepath, 'r')
+    except zf.BadZipFile:
+        raise InvalidBlibFile("File is not a valid Blender library")
+
+class RemoteFile(io.RawIOBase):
+    """
+    Seekable read-only file over HTTP, fetching only the blocks that are read, with Range requests.
+    
+    Blocks are kept in memory (up to 'max_memory'), and in 'cache_dir' if set. Reads continuing the previous read double the size
+    of the next request (up to 'max_read_ahead'), so large entries are not fetched block by block.
+    Servers that ignore Range requests are supported, the whole file being fetched on open then.
+    
+    Args:
+        url (str): URL of the file.
+        headers (dict or None): Additional HTTP headers sent with every request (e.g. authorization).
+    
+    Attributes:
+        url (str): URL of the file.
+        size (read-only[int]): Size of the file, in bytes.
+        requests (int): Number of HTTP requests made so far.
+        fetched (int): Number of bytes downloaded so far.
+    """
+    
+    def __init__(self, url, headers=None):
+        super().__init__()
+        self.url = url
+        self.requests = 0
+        self.fetched = 0
+        self._headers = dict(headers or {})
+        self._pos = 0
+        self._blocks = OrderedDict()
+        self._block_size = block_size
+        self._max_blocks = max(1, max_memory // block_size)
+        self._window = 1
+        self._end = None
+        self._cache = None
+        
+        #Probe the file with the last block, which holds the central directory of small archives
+        response, data = self._request("bytes=-{}".format(self._block_size))
+        if response.status == 206:
+            match = re.match(r"bytes (\d+)-(\d+)/(\d+)", response.headers.get("Content-Range", ""))
+            if match is None:
+                raise OSError("Invalid Content-Range from '{}'".format(url))
+            self._size = int(match.group(3))
+            start = int(match.group(1))
+        else: #Range not supported, the whole file was sent
+            self._size = len(data)
+            start = 0
+            if cache_dir is None: #Evicted blocks could only be fetched again with the whole file
+                self._max_blocks = None
+        
+        validator = response.headers.get("ETag") or "{} {}".format(self._size, response.headers.get("Last-Modified"))
+        if cache_dir is not None:
+            self._cache = path.join(cache_dir, sha1((url + "\n" + validator).encode("utf-8")).hexdigest())
+        self._store(start, data)
+    
+    @property
+    def size(self):
+        return self._size
+    
+    def readable(self):
+        return True
+    
+    def seekable(self):
+        return True
+    
+    def tell(self):
+        return self._pos
+    
+    def seek(self, offset, whence=io.SEEK_SET):
+        if whence == io.SEEK_SET:
+            pos = offset
+        elif whence == io.SEEK_CUR:
+            pos = self._pos + offset
+        elif whence == io.SEEK_END:
+            pos = self._size + offset
+        else:
+            raise ValueError("invalid whence ({})".format(whence))
+        if pos < 0:
+            raise OSError("Negative seek position {}".format(pos))
+        self._pos = pos
+        return pos
+    
+    def readinto(self, buffer):
+        end = min(self._pos + len(buffer), self._size)
+        if end <= self._pos:
+            return 0
+        
+        first = self._pos // self._block_size
+        last = (end - 1) // self._block_size
+        sequential = self._pos == self._end
+        self._end = end
+        if not all(index in self._blocks for index in range(first, last + 1)):
+            if sequential: #Continuing the previous read, fetch ahead
+                self._window = min(self._window * 2, max(1, max_read_ahead // self._block_size))
+            else:
+                self._window = 1
+            self._fetch(first, max(last, first + self._window - 1))
+        
+        size = end - self._pos
+        view = memoryview(buffer)
+        written = 0
+        for index in range(first, last + 1):
+            block = self._blocks[index]
+            self._blocks.move_to_end(index)
+            offset = self._pos + written - index * self._block_size
+            chunk = block[offset:offset + size - written]
+            view[written:written + len(chunk)] = chunk
+            written += len(chunk)
+        self._pos += written
+        self._evict()
+        return written
+    
+    def close(self):
+        self._blocks = OrderedDict()
+        super().close()
+    
+    def _evict(self):
+        """Drop the least recently used blocks beyond the memory limit."""
+        
+        if self._max_blocks is not None:
+            while len(self._blocks) > self._max_blocks:
+                self._blocks.popitem(last=False)
+    
+    def _request(self, byte_range):
+        headers = dict(self._headers)
+        headers["Range"] = byte_range
+        response = urlopen(Request(self.url, headers=headers), timeout=timeout)
+        try:
+            data = response.read()
+        finally:
+            response.close()
+        self.requests += 1
+        self.fetched += len(data)
+        return response, data
+    
+    def _store(self, start, data):
+        """Split fetched data into blocks, ignoring the incomplete leading block of suffix ranges."""
+        
+        index = -(-start // self._block_size)
+        offset = index * self._block_size - start
+        while offset < len(data):
+            block = data[offset:offset + self._block_size]
+            if len(block) == self._block_size or offset + len(block) + start == self._size:
+                self._blocks[index] = block
+                self._save(index, block)
+            index += 1
+            offset += self._block_size
+    
+    def _fetch(self, first, last):
+        last = min(last, (self._size - 1) // self._block_size)
+        missing = [index for index in range(first, last + 1) if index not in self._blocks and not self._load(index)]
+        if not missing:
+            return
+        
+        #Fetch the missing blocks in a single request, including any cached blocks in between
+        start = missing[0] * self._block_size
+        end = min((missing[-1] + 1) * self._block_size, self._size) - 1
+        response, data = self._request("bytes={}-{}".format(start, end))
+        if response.status != 206: #Range not supported anymore, the whole file was sent
+            self._store(0, data)
+            if self._cache is None:
+                self._max_blocks = None
+        else:
+            self._store(start, data)
+        for index in missing:
+            if index not in self._blocks:
+                raise OSError("Incomplete response from '{}'".format(self.url))
+    
+    def _load(self, index):
+        if self._cache is None:
+            return False
+        try:
+            block_file = open(path.join(self._cache, str(index)), 'rb')
+        except OSError:
+            return False
+        block = block_file.read()
+        block_file.close()
+        self._blocks[index] = block
+        return True
+    
+    def _save(self, index, block):
+        if self._cache is None:
+            return
+        bpath = path.join(self._cache, str(index))
+        if path.isfile(bpath):
+            return
+        makedirs(self._cache, exist_ok=True)
+        tmp_path = "{}.{}.tmp".format(bpath, id(self))
+        block_file = open(tmp_path, 'wb')
+        block_file.write(block)
+        block_file.close()
+        replace(tmp_path, bpath) #Atomic, other readers never see partial blocks
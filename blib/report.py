@@ -0,0 +1,116 @@
+# ##### BEGIN GPL LICENSE BLOCK #####
+#
+# Part of the Blib package.
+# Blib report: Aggregated failures of exports and imports.
+# Copyright (C) 2016  Luca Rood
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+
+# You should have received a copy of the GNU General Public License
+# along with this program.  If not, see <http://www.gnu.org/licenses/>.
+#
+# ##### END GPL LICENSE BLOCK #####
+
+"""Aggregated failures of exports and imports."""
+
+class Report(object):
+    """
+    Failures of one or several exports or imports, counted per type.
+    
+    Failures are not printed as they occur, only counted, and the first few of each type are kept as samples.
+    They can additionally be sent to a logger, which leaves the output (and its cost) up to the logging configuration.
+    
+    Args:
+        max_samples (int): Maximum number of failure descriptions kept per type.
+        logger (logging.Logger or None): Logger to which every failure is sent, at "warning" level.
+            None to not log failures.
+    
+    Attributes:
+        max_samples (int): Maximum number of failure descriptions kept per type.
+        logger (logging.Logger or None): Logger to which every failure is sent.
+        counts (dict): Number of failures per type (e.g. "images", "attributes").
+        samples (dict): First failure descriptions per type (e.g. "set attribute 'x' on object 'y'").
+        total (read-only[int]): Total number of failures.
+    """
+    
+    def __init__(self, max_samples=10, logger=None):
+        self.max_samples = max_samples
+        self.logger = logger
+        self.counts = {}
+        self.samples = {}
+    
+    def __repr__(self):
+        return "<Report {}>".format(self.counts)
+    
+    @property
+    def total(self):
+        return sum(self.counts.values())
+    
+    def add(self, f_type, action):
+        """
+        Record a failure.
+        
+        Args:
+            f_type (str): The type of fail occurred.
+            action (str): Action that failed (e.g. "import image 'x', file is missing").
+        """
+        
+        self.counts[f_type] = self.counts.get(f_type, 0) + 1
+        samples = self.samples.setdefault(f_type, [])
+        if len(samples) < self.max_samples:
+            samples.append(action)
+        if self.logger is not None:
+            self.logger.warning("Failed to %s.", action)
+    
+    def update(self, report):
+        """
+        Add the failures of another report to this one.
+        
+        Args:
+            report (blib.report.Report): The report to be added.
+        """
+        
+        for f_type, count in report.counts.items():
+            self.counts[f_type] = self.counts.get(f_type, 0) + count
+            samples = self.samples.setdefault(f_type, [])
+            samples.extend(report.samples.get(f_type, [])[:max(0, self.max_samples - len(samples))])
+    
+    def clear(self):
+        """Drop all recorded failures."""
+        self.counts.clear()
+        self.samples.clear()
+    
+    def summary(self, action):
+        """
+        Describe the failure counts.
+        
+        Args:
+            action (str): What failed to be done (e.g. "exported").
+        
+        Returns:
+            list[str]: One line per failure type.
+        """
+        
+        return ["{} {} failed to be {}.".format(count, f_type, action) for f_type, count in self.counts.items()]
+    
+    def as_dict(self):
+        """
+        Convert the report to basic types, e.g. to be serialized to JSON.
+        
+        Returns:
+            dict: "total", "counts" and "samples".
+        """
+        
+        return {
+            "total": self.total,
+            "counts": dict(self.counts),
+            "samples": {f_type: list(samples) for f_type, samples in self.samples.items()},
+        }
@@ -0,0 +1,140 @@
+# ##### BEGIN GPL LICENSE BLOCK #####
+#
+# Part of the Blib package.
+# Blib stats: Timing and counters of exports and imports.
+# Copyright (C) 2016  Luca Rood
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+
+# You should have received a copy of the GNU General Public License
+# along with this program.  If not, see <http://www.gnu.org/licenses/>.
+#
+# ##### END GPL LICENSE BLOCK #####
+
+"""
+Timing and counters of exports and imports.
+
+Functions appended to 'callbacks' are called with the stats of every finished export or import,
+including those that were not passed a 'Stats' instance, so metrics can be collected without changing the callers.
+"""
+
+from time import perf_counter
+
+callbacks = []
+
+class Stats(object):
+    """
+    Wall time of the phases of an export or import, and counters of the processed data.
+    
+    Phases are timed as laps: each call to 'lap' attributes the time elapsed since the previous lap to the given phase.
+    An instance passed to several exports or imports accumulates their times and counters.
+    
+    Counters:
+        "bytes_stored": Uncompressed bytes of the resources stored in the archive (export).
+            This is the size of the stored data, not of the disk reads, which the export cache can skip.
+        "bytes_read": Bytes read from the resource files to hash, compare and compress them (export),
+            or compressed bytes read from the archive to extract resources (import).
+        "bytes_written": Compressed bytes written to the archive (export), or bytes extracted to disk (import).
+        "bytes_deduplicated": Bytes not stored because identical data was already in the archive (export),
+            or not extracted because an identical resource already existed (import).
+        "nodes", "links", "attributes": Number of nodes, links and attribute values exported or imported.
+    
+    Args:
+        callback (function or None): Function called with this instance when an export or import finishes.
+    
+    Attributes:
+        callback (function or None): Function called with this instance when an export or import finishes.
+        operation (str or None): "export" or "import", the last operation.
+        filepath (str or None): Path of the file of the last operation.
+        phases (dict): Wall time per phase, in seconds.
+        counters (dict): Counter values per name.
+        total (read-only[float]): Total time of all phases, in seconds.
+    """
+    
+    def __init__(self, callback=None):
+        self.callback = callback
+        self.operation = None
+        self.filepath = None
+        self.phases = {}
+        self.counters = {}
+        self._last = None
+    
+    def __repr__(self):
+        return "<Stats {} {:.3f}s {}>".format(self.operation, self.total, self.counters)
+    
+    @property
+    def total(self):
+        return sum(self.phases.values())
+    
+    def start(self, operation, filepath):
+        """
+        Start timing an operation.
+        
+        Args:
+            operation (str): "export" or "import".
+            filepath (str): Path of the exported or imported file.
+        """
+        
+        self.operation = operation
+        self.filepath = filepath
+        self._last = perf_counter()
+    
+    def lap(self, phase):
+        """
+        Attribute the time elapsed since the start or the previous lap to a phase.
+        
+        Args:
+            phase (str): Name of the phase (e.g. "verify").
+        """
+        
+        now = perf_counter()
+        self.phases[phase] = self.phases.get(phase, 0.0) + now - self._last
+        self._last = now
+    
+    def add(self, counter, value=1):
+        """
+        Increment a counter.
+        
+        Args:
+            counter (str): Name of the counter (e.g. "nodes").
+            value (int): Value to be added.
+        """
+        
+        self.counters[counter] = self.counters.get(counter, 0) + value
+    
+    def finish(self):
+        """Call the callback of this instance, and the callbacks registered in 'blib.stats.callbacks'."""
+        
+        if self.callback is not None:
+            self.callback(self)
+        for callback in callbacks:
+            callback(self)
+    
+    def clear(self):
+        """Reset all times and counters."""
+        self.phases.clear()
+        self.counters.clear()
+    
+    def as_dict(self):
+        """
+        Convert the stats to basic types, e.g. to be serialized to JSON.
+        
+        Returns:
+            dict: "operation", "filepath", "total", "phases" and "counters".
+        """
+        
+        return {
+            "operation": self.operation,
+            "filepath": self.filepath,
+            "total": self.total,
+            "phases": dict(self.phases),
+            "counters": dict(self.counters),
+        }
@@ -21,12 +21,26 @@
 
 """Utility classes and functions for Blib packages."""
 
+import re
+import struct
+import zlib
 import zipfile as zf
+from array import array
+from base64 import b64encode, b64decode
 from binascii import crc32
+from bisect import bisect_left, bisect_right
 from hashlib import sha1
+from importlib import import_module
 from os import path, makedirs, listdir
 from shutil import copyfileobj
 from io import BytesIO
+from sys import byteorder, modules, version_info
+from types import ModuleType
+
+if version_info >= (3, 5):
+    from os import scandir
+
+from .report import Report
 
 class Version(object):
     """
@@ -182,14 +196,256 @@ class ResourceDir(object):
             else:
                 if path.isdir(self._root):
                     dir_list = [int(d) for d in listdir(self._root) if path.isdir(path.join(self._root, d)) and is_int(d)]
-                    dir_list.sort()
-                    dir_name = str(dir_list[-1] + 1)
-                    self._path = path.join(self._root, dir_name)
+                    number = max(dir_list, default=0) + 1
                 else:
-                    self._path = path.join(self._root, "1")
+                    number = 1
+                while True: #Another import may claim the same number concurrently
+                    try:
+                        makedirs(path.join(self._root, str(number)))
+                        break
+                    except FileExistsError:
+                        number += 1
+                self._path = path.join(self._root, str(number))
             if not path.isdir(self._path):
                 makedirs(self._path)
 
+class FrameIndex(object):
+    """
+    Index of the numbered frame files in a directory, for resolving image sequence frame ranges.
+    
+    The directory is listed only once, on creation. Its files are grouped by sequence
+    (name without the trailing frame number, and extension), and each sequence is kept sorted by frame number,
+    so frame ranges are resolved by binary search.
+    
+    Args:
+        directory (str): Path to the directory containing the frame files.
+        names (iterable[str] or None): Names of the files in the directory, None to list the directory.
+            Allows indexing directories that are not on disk (e.g. inside an archive).
+    
+    Attributes:
+        directory (read-only[str]): Path to the indexed directory.
+    """
+    
+    _frame = re.compile(r"^(.*?)([0-9]+)$")
+    
+    def __init__(self, directory, names=None):
+        self._directory = directory
+        self._frames = {}
+        self._numbers = {}
+        
+        if names is None:
+            if version_info >= (3, 5): #Entry types without a stat call per file
+                names = (entry.name for entry in scandir(directory) if entry.is_file())
+            else:
+                names = (name for name in listdir(directory) if path.isfile(path.join(directory, name)))
+        
+        for name in names:
+            key, num = self._split(name)
+            if key is not None:
+                self._frames.setdefault(key, []).append((num, name))
+        
+        for key, frames in self._frames.items():
+            frames.sort()
+            self._numbers[key] = [num for num, fil in frames]
+    
+    @property
+    def directory(self):
+        return self._directory
+    
+    def _split(self, filename):
+        name, ext = path.splitext(filename)
+        match = self._frame.match(name)
+        if match is None:
+            return None, None
+        else:
+            return (match.group(1), ext), int(match.group(2))
+    
+    def frames(self, filename):
+        """
+        Get all frames of a sequence.
+        
+        Args:
+            filename (str): Name of any frame file of the sequence (it does not have to exist).
+        
+        Returns:
+            list[str]: File names of the frames, sorted by frame number.
+        """
+        
+        key = self._split(filename)[0]
+        return [fil for num, fil in self._frames.get(key, [])]
+    
+    def find_range(self, filename, start, end):
+        """
+        Get the frames of a sequence that are within a frame range.
+        
+        Frames missing from the directory are skipped, and the range may extend beyond
+        the available frames, in which case only the available frames are returned.
+        
+        Args:
+            filename (str): Name of any frame file of the sequence (it does not have to exist).
+            start (int): First frame of the range (inclusive).
+            end (int): Last frame of the range (inclusive).
+        
+        Returns:
+            list[str]: File names of the frames within the range, sorted by frame number.
+        """
+        
+        key = self._split(filename)[0]
+        if key not in self._frames:
+            return []
+        numbers = self._numbers[key]
+        low = bisect_left(numbers, start)
+        high = bisect_right(numbers, end)
+        return [fil for num, fil in self._frames[key][low:high]]
+
+class EntryIndex(object):
+    """
+    Index of the entries of an archive, for fast name and directory lookups.
+    
+    Names are kept in a set, and grouped by directory. The entries of a directory are only sorted
+    when it is listed after new entries were added to it.
+    
+    Args:
+        archive (zipfile.ZipFile or None): Archive whose entries are indexed on creation, None to start empty.
+    """
+    
+    def __init__(self, archive=None):
+        self._names = set()
+        self._dirs = {}
+        self._unsorted = set()
+        
+        if archive is not None:
+            for name in archive.namelist():
+                self.add(name)
+    
+    def __contains__(self, name):
+        return name in self._names
+    
+    def __len__(self):
+        return len(self._names)
+    
+    def __iter__(self):
+        return iter(self._names)
+    
+    def add(self, name):
+        """
+        Add an entry to the index (adding an indexed entry again has no effect).
+        
+        Args:
+            name (str): Path of the entry inside the archive.
+        """
+        
+        if name in self._names:
+            return
+        self._names.add(name)
+        directory, base = name.rsplit("/", 1) if "/" in name else ("", name)
+        self._dirs.setdefault(directory, []).append(base)
+        self._unsorted.add(directory)
+    
+    def listdir(self, directory):
+        """
+        Get the entries directly inside a directory of the archive.
+        
+        Args:
+            directory (str): Path of the directory inside the archive, without trailing slash ("" for the root).
+        
+        Returns:
+            list[str]: Base names of the entries, sorted.
+        """
+        
+        if directory in self._unsorted:
+            self._dirs[directory].sort()
+            self._unsorted.discard(directory)
+        return list(self._dirs.get(directory, []))
+
+class LazyModule(ModuleType):
+    """
+    Package whose attributes are only imported from their submodules when first accessed.
+    
+    Use 'lazy_package' to turn a package into a lazy one.
+    """
+    
+    def __getattr__(self, name):
+        lazy = self.__dict__.get("_lazy", {})
+        if name not in lazy:
+            raise AttributeError("module '{}' has no attribute '{}'".format(self.__name__, name))
+        value = load_lazy(self.__name__, lazy[name])
+        ModuleType.__setattr__(self, name, value)
+        return value
+    
+    def __setattr__(self, name, value):
+        lazy = self.__dict__.get("_lazy", {})
+        if name in lazy and lazy[name][1] is not None and isinstance(value, ModuleType):
+            #The import system binding a submodule with the same name as a function (e.g. "bimport"),
+            #keep the function accessible instead
+            return
+        ModuleType.__setattr__(self, name, value)
+    
+    def __dir__(self):
+        return sorted(set(ModuleType.__dir__(self)) | set(self.__dict__.get("_lazy", {})))
+
+def load_lazy(package, target):
+    """
+    Import a lazy attribute.
+    
+    Args:
+        package (str): Name of the package.
+        target (tuple): (submodule, attribute) pair, attribute being None to get the submodule itself.
+    
+    Returns:
+        The submodule or its attribute.
+    """
+    
+    module = import_module(target[0], package)
+    return module if target[1] is None else getattr(module, target[1])
+
+def lazy_package(name, attributes):
+    """
+    Make the attributes of a package lazily imported.
+    
+    Requires Python 3.5 (module class assignment), on earlier versions all attributes are imported immediately.
+    
+    Args:
+        name (str): Name of the package (i.e. its '__name__').
+        attributes (dict): (submodule, attribute) pair per attribute name, attribute being None to get the submodule
+            itself, and submodule being relative to the package (e.g. {"bimport": (".bimport", "bimport")}).
+    """
+    
+    package = modules[name]
+    if version_info >= (3, 5):
+        package._lazy = attributes
+        package.__class__ = LazyModule
+    else:
+        for attr, target in attributes.items():
+            setattr(package, attr, load_lazy(name, target))
+
+def run_steps(steps):
+    """
+    Run an operation split into steps, on the calling thread.
+    
+    Operations that use Blender are written as generators (e.g. 'blib.cycles.bimport.import_steps'),
+    doing the Blender work themselves and yielding the work that doesn't use Blender (file I/O, hashing,
+    compression and extraction) as (function, args) pairs, to which the result of the call is sent back.
+    This lets the same operation be run either directly, or with the yielded steps run in an executor
+    (see 'blib.cycles.aio').
+    
+    Args:
+        steps (generator): The operation, yielding (function, args) pairs, and returning its result.
+    
+    Returns:
+        The result of the operation.
+    """
+    
+    result = None
+    try:
+        while True:
+            func, args = steps.send(result)
+            result = func(*args)
+    except StopIteration as e:
+        return e.value
+    finally:
+        steps.close()
+
 def get_path(archive, item):
     """
     Resolve reference chain.
@@ -235,15 +491,18 @@ def extract(archive, item, directory):
 
 def fail(failed, f_type, action):
     """
-    Increment fail counter and print fail to console.
+    Record a fail in a report, or increment fail counter and print fail to console.
     
     Args:
-        failed (dict): Dictionary of fail counters.
+        failed (blib.report.Report or dict): Report of the fails, or dictionary of fail counters.
         f_type (str): The type of fail occurred (must be same as corresponding key in failed dict).
         action (str): Action that failed (e.g. "import", "export", "link"...)
         name (str): Name of the object on which the action failed.
         reason (str): Reason for which the action failed (e.g. "a <some resource> is missing")
     """
+    if isinstance(failed, Report):
+        failed.add(f_type, action)
+        return
     failed.setdefault(f_type, 0)
     failed[f_type] += 1
     print("Failed to {}.".format(action))
@@ -308,7 +567,7 @@ def gen_crc(filepath):
     f.close()
     return crc
 
-def write(archive, source, destination, crcs):
+def write(archive, source, destination, crcs, stats=None):
     """
     Write data to archive, while only making a link if identical data is already in archive.
     
@@ -321,6 +580,8 @@ def write(archive, source, destination, crcs):
         crcs (dict): A dictionary containing crc32 hashes to all files in archive.
             Can be passed as an empty dictionary.
             Same dict should be passed every time you write to the same archive.
+        stats (blib.stats.Stats or None): Started stats in which to record the "hash", "compress" and "write" phases,
+            and the bytes read from the source file. None to not record them.
     
     Raises:
         TypeError: If the 'source' argument is not a 'str' or 'bytes' object.
@@ -334,24 +595,251 @@ def write(archive, source, destination, crcs):
         raise TypeError("source should be of type 'str' or 'bytes', not '{}'".format(type(source).__name__))
     
     crc = gen_crc(source) if is_file else crc32(source)
-    if crc in crcs:
-        for zpath in crcs[crc]:
-            zfile = archive.open(zpath, 'r')
-            nfile = open(source, 'rb') if is_file else BytesIO(source)
-            if files_equal(zfile, nfile):
-                archive.writestr(destination, b"")
-                archive.getinfo(destination).comment = zpath.encode("utf-8")
-                zfile.close()
-                nfile.close()
-                break
-            zfile.close()
-            nfile.close()
-        else:
-            archive.write(source, destination) if is_file else archive.writestr(destination, source)
-            crcs[crc].append(destination)
+    reads = 1
+    link = None
+    for zpath in crcs.get(crc, []):
+        zfile = archive.open(zpath, 'r')
+        nfile = open(source, 'rb') if is_file else BytesIO(source)
+        equal = files_equal(zfile, nfile)
+        zfile.close()
+        nfile.close()
+        reads += 1
+        if equal:
+            link = zpath
+            break
+    if stats is not None:
+        stats.lap("hash")
+    
+    if link is not None:
+        archive.writestr(destination, b"")
+        archive.getinfo(destination).comment = link.encode("utf-8")
+        phase = "write"
     else:
         archive.write(source, destination) if is_file else archive.writestr(destination, source)
-        crcs[crc] = [destination]
+        crcs.setdefault(crc, []).append(destination)
+        reads += 1
+        phase = "compress" #Compressed while written
+    
+    if stats is not None:
+        if is_file:
+            stats.add("bytes_read", reads * path.getsize(source))
+        stats.lap(phase)
+
+def pack_floats(values, typecode="f", encode=True):
+    """
+    Pack numbers into a little-endian array of floats.
+    
+    Args:
+        values (iterable[float]): Flat sequence of numbers to be packed.
+        typecode (str): Array type code, 'f' for 32 bit floats, or 'd' for 64 bit floats.
+        encode (bool): If True, the packed data is base64 encoded, for storage in XML.
+            If False, the raw bytes are returned, for storage in a binary structure.
+    
+    Returns:
+        str or bytes: The base64 string if 'encode' is True, otherwise the raw bytes.
+    """
+    
+    data = array(typecode, values)
+    if byteorder == "big":
+        data.byteswap()
+    data = data.tobytes()
+    if encode:
+        return b64encode(data).decode("ascii")
+    else:
+        return data
+
+def unpack_floats(data, typecode="f"):
+    """
+    Unpack numbers packed with 'pack_floats'.
+    
+    Args:
+        data (str or bytes-like object): Base64 string, or raw bytes (bytes, bytearray, memoryview...).
+        typecode (str): Array type code, must be the same as used when packing.
+    
+    Returns:
+        array.array: Flat array of the unpacked numbers.
+    """
+    
+    if isinstance(data, str):
+        data = b64decode(data)
+    values = array(typecode)
+    values.frombytes(data)
+    if byteorder == "big":
+        values.byteswap()
+    return values
+
+#Raw entry access: reads and writes of compressed entry data, without recompressing it.
+#This relies on zipfile internals (the local header layout, and the archive's lock, write check and data offset),
+#which are not part of its public API, so all of their uses are kept here, falling back to decompressing
+#and recompressing the data (slower, but equivalent) when they are missing.
+
+_RAW_MODULE = ("sizeFileHeader", "structFileHeader", "stringFileHeader",
+               "_FH_SIGNATURE", "_FH_FILENAME_LENGTH", "_FH_EXTRA_FIELD_LENGTH")
+_RAW_ARCHIVE = ("fp", "_lock", "_writecheck", "start_dir", "filelist", "NameToInfo")
+
+def raw_supported(archive):
+    """
+    Check if raw entry reads and writes are supported for an archive, by the running zipfile module.
+    
+    Args:
+        archive (zipfile.ZipFile): The archive.
+    
+    Returns:
+        bool: False if 'read_raw' and 'write_raw' have to fall back to recompression.
+    """
+    
+    return all(hasattr(zf, attr) for attr in _RAW_MODULE) and all(hasattr(archive, attr) for attr in _RAW_ARCHIVE)
+
+def compress_data(data, compress_type):
+    """
+    Compress data the way it is stored in an archive entry.
+    
+    Args:
+        data (bytes): The uncompressed data.
+        compress_type (int): Compression method (zipfile.ZIP_DEFLATED or zipfile.ZIP_STORED).
+    
+    Returns:
+        bytes: The compressed data.
+    
+    Raises:
+        NotImplementedError: If the compression method is not supported.
+    """
+    
+    if compress_type == zf.ZIP_STORED:
+        return data
+    if compress_type == zf.ZIP_DEFLATED:
+        compressor = zlib.compressobj(zlib.Z_DEFAULT_COMPRESSION, zlib.DEFLATED, -15)
+        return compressor.compress(data) + compressor.flush()
+    raise NotImplementedError("Unsupported compression method {}".format(compress_type))
+
+def decompress_data(data, compress_type):
+    """
+    Decompress the data of an archive entry.
+    
+    Args:
+        data (bytes): The compressed data.
+        compress_type (int): Compression method (zipfile.ZIP_DEFLATED or zipfile.ZIP_STORED).
+    
+    Returns:
+        bytes: The uncompressed data.
+    
+    Raises:
+        NotImplementedError: If the compression method is not supported.
+    """
+    
+    if compress_type == zf.ZIP_STORED:
+        return data
+    if compress_type == zf.ZIP_DEFLATED:
+        return zlib.decompress(data, -15)
+    raise NotImplementedError("Unsupported compression method {}".format(compress_type))
+
+def data_offset(fp, info):
+    """
+    Find where the data of an archive entry starts, by reading its local header.
+    
+    Args:
+        fp (file): Binary file object of the archive.
+        info (zipfile.ZipInfo): Info of the entry.
+    
+    Returns:
+        int: Offset of the entry's data in the archive file.
+    
+    Raises:
+        zipfile.BadZipFile: If the entry's local header is broken.
+    """
+    
+    fp.seek(info.header_offset)
+    header = fp.read(zf.sizeFileHeader)
+    if len(header) != zf.sizeFileHeader:
+        raise zf.BadZipFile("Truncated file header")
+    header = struct.unpack(zf.structFileHeader, header)
+    if header[zf._FH_SIGNATURE] != zf.stringFileHeader:
+        raise zf.BadZipFile("Bad magic number for file header")
+    return info.header_offset + zf.sizeFileHeader + header[zf._FH_FILENAME_LENGTH] + header[zf._FH_EXTRA_FIELD_LENGTH]
+
+def read_raw(archive, info):
+    """
+    Read the compressed data of an archive entry, without decompressing it.
+    
+    Falls back to decompressing and recompressing the entry if raw reads are not supported (see 'raw_supported').
+    
+    Args:
+        archive (zipfile.ZipFile): The archive containing the entry.
+        info (zipfile.ZipInfo): Info of the entry to be read.
+    
+    Returns:
+        bytes: The compressed data, exactly as stored in the archive.
+    
+    Raises:
+        zipfile.BadZipFile: If the entry is broken.
+    """
+    
+    if not raw_supported(archive):
+        return compress_data(archive.read(info), info.compress_type)
+    
+    with archive._lock:
+        archive.fp.seek(data_offset(archive.fp, info))
+        data = archive.fp.read(info.compress_size)
+    
+    if len(data) != info.compress_size:
+        raise zf.BadZipFile("Truncated file data")
+    return data
+
+def write_raw(archive, info, data):
+    """
+    Write already compressed data to archive, without recompressing it.
+    
+    Falls back to decompressing the data and writing it normally if raw writes are not supported (see 'raw_supported').
+    
+    Args:
+        archive (zipfile.ZipFile): The archive to which to write the data, open for writing or appending.
+        info (zipfile.ZipInfo): Info for the new entry. Its 'compress_type', 'CRC' and 'file_size'
+            attributes have to describe the data (compressed size is set automatically).
+        data (bytes): The compressed data, exactly as it should be stored in the archive.
+    """
+    
+    if not raw_supported(archive):
+        archive.writestr(info, decompress_data(data, info.compress_type), info.compress_type)
+        return
+    
+    info.compress_size = len(data)
+    info.flag_bits &= ~0x08 #Sizes are known, no data descriptor
+    zip64 = info.file_size > zf.ZIP64_LIMIT or info.compress_size > zf.ZIP64_LIMIT
+    
+    with archive._lock:
+        archive._writecheck(info)
+        archive._didModify = True
+        archive.fp.seek(archive.start_dir)
+        info.header_offset = archive.fp.tell()
+        archive.fp.write(info.FileHeader(zip64))
+        archive.fp.write(data)
+        archive.start_dir = archive.fp.tell()
+        archive.filelist.append(info)
+        archive.NameToInfo[info.filename] = info
+
+def remove_entry(archive, name):
+    """
+    Remove an entry from the central directory of an archive open for appending (its data is left in the file).
+    
+    Args:
+        archive (zipfile.ZipFile): The archive.
+        name (str): Path of the entry inside the archive.
+    
+    Returns:
+        zipfile.ZipInfo: Info of the removed entry.
+    
+    Raises:
+        KeyError: If the entry is not in the archive.
+        NotImplementedError: If the running zipfile module does not support it (see 'raw_supported').
+    """
+    
+    if not raw_supported(archive):
+        raise NotImplementedError("Removing archive entries is not supported by this zipfile module")
+    with archive._lock:
+        info = archive.NameToInfo.pop(name)
+        archive.filelist.remove(info)
+        archive._didModify = True
+    return info
 
 def is_int(string):
     """
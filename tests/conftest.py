@@ -0,0 +1,12 @@
+"""
+Test configuration: makes the blib package importable from the repository,
+and the stand-in bpy module from "benchmarks/stubs" available to the tests that build materials.
+"""
+
+import sys
+from os import path
+
+root = path.dirname(path.dirname(path.abspath(__file__)))
+for directory in (root, path.join(root, "benchmarks"), path.join(root, "benchmarks", "stubs")):
+    if directory not in sys.path:
+        sys.path.insert(0, directory)
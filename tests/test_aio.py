@@ -0,0 +1,136 @@
+"""Tests of running operations as steps, in 'blib.cycles.aio' and 'blib.utils'."""
+
+import asyncio
+import importlib
+import os
+import shutil
+import tempfile
+import threading
+import unittest
+import zipfile as zf
+from concurrent.futures import ThreadPoolExecutor
+
+import bpy
+import synthetic
+from blib.cycles.aio import bexport_async, bimport_async, run_steps_async
+from blib.cycles.bexport import bexport
+from blib.cycles.bimport import import_steps
+from blib.exceptions import InvalidBlibFile
+from blib.utils import ResourceDir, run_steps
+
+bimport_module = importlib.import_module("blib.cycles.bimport") #The package attribute is the function
+
+def operation(threads):
+    threads.append(("operation", threading.get_ident()))
+    value = yield (lambda a, b: threads.append(("step", threading.get_ident())) or a + b), (1, 2)
+    threads.append(("operation", threading.get_ident()))
+    return value * 2
+
+class StepsTest(unittest.TestCase):
+    
+    def setUp(self):
+        self.directory = tempfile.mkdtemp()
+    
+    def tearDown(self):
+        shutil.rmtree(self.directory)
+    
+    def test_run_steps(self):
+        threads = []
+        self.assertEqual(run_steps(operation(threads)), 6)
+        self.assertEqual({ident for kind, ident in threads}, {threading.get_ident()})
+    
+    def test_run_steps_async(self):
+        threads = []
+        with ThreadPoolExecutor(1) as executor:
+            self.assertEqual(asyncio.run(run_steps_async(operation(threads), executor)), 6)
+        operation_threads = {ident for kind, ident in threads if kind == "operation"}
+        step_threads = {ident for kind, ident in threads if kind == "step"}
+        self.assertEqual(operation_threads, {threading.get_ident()})
+        self.assertNotIn(threading.get_ident(), step_threads)
+    
+    def test_async_round_trip(self):
+        bpy.reset()
+        mat = synthetic.make_material(self.directory, nodes=5, images=2)
+        filepath = os.path.join(self.directory, "lib.blib")
+        resources = os.path.join(self.directory, "resources")
+        
+        async def run():
+            await bexport_async(mat, filepath)
+            return await asyncio.gather(*[bimport_async(filepath, resource_path=resources) for i in range(3)])
+        
+        results = asyncio.run(run())
+        self.assertEqual(len(results), 3)
+        for result in results:
+            self.assertIsInstance(result, bpy.types.Material)
+            images = [node.image for node in result.node_tree.nodes if node.bl_idname == "ShaderNodeTexImage"]
+            self.assertEqual(len(images), 2)
+            for image in images:
+                self.assertTrue(os.path.isfile(image.filepath))
+    
+    def test_resource_dirs_are_claimed_once(self):
+        dirs = [ResourceDir("images", self.directory) for i in range(8)]
+        barrier = threading.Barrier(len(dirs))
+        
+        def claim(res_dir):
+            barrier.wait()
+            str(res_dir)
+        
+        pool = [threading.Thread(target=claim, args=(res_dir,)) for res_dir in dirs]
+        for thread in pool:
+            thread.start()
+        for thread in pool:
+            thread.join()
+        self.assertEqual(sorted(str(res_dir) for res_dir in dirs),
+                         sorted(os.path.join(self.directory, "images", str(i)) for i in range(1, 9)))
+    
+    def test_run_steps_async_without_running_loop_function(self):
+        get_running_loop = asyncio.get_running_loop
+        del asyncio.get_running_loop #As on Python < 3.7
+        try:
+            self.assertEqual(asyncio.run(run_steps_async(operation([]))), 6)
+        finally:
+            asyncio.get_running_loop = get_running_loop
+
+class ImportCleanupTest(unittest.TestCase):
+    
+    def setUp(self):
+        self.directory = tempfile.mkdtemp()
+        bpy.reset()
+        mat = synthetic.make_material(self.directory, nodes=5, images=2)
+        self.filepath = os.path.join(self.directory, "lib.blib")
+        bexport(mat, self.filepath)
+        self.resources = os.path.join(self.directory, "resources")
+        self.archives = []
+        self._open_archive = bimport_module.open_archive
+        bimport_module.open_archive = lambda filepath: self.archives.append(self._open_archive(filepath)) or self.archives[-1]
+    
+    def tearDown(self):
+        bimport_module.open_archive = self._open_archive
+        shutil.rmtree(self.directory)
+    
+    def start(self):
+        """Run the import up to its image extraction step."""
+        steps = import_steps(self.filepath, resource_path=self.resources)
+        func, args = next(steps)
+        steps.send(func(*args))
+        return steps
+    
+    def test_abandoned(self):
+        steps = self.start()
+        self.assertIsNotNone(self.archives[0].fp)
+        steps.close()
+        self.assertIsNone(self.archives[0].fp)
+    
+    def test_failed_step(self):
+        steps = self.start()
+        with self.assertRaises(OSError):
+            steps.throw(OSError("extraction failed"))
+        self.assertIsNone(self.archives[0].fp)
+    
+    def test_broken_file(self):
+        with zf.ZipFile(self.filepath, 'a') as archive:
+            archive.comment = b"0" * 40 + archive.comment[40:]
+        with self.assertRaises(InvalidBlibFile):
+            run_steps(import_steps(self.filepath, resource_path=self.resources))
+        self.assertEqual(len(self.archives), 1)
+        self.assertIsNone(self.archives[0].fp)
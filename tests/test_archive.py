@@ -0,0 +1,287 @@
+"""Tests of 'blib.archive' repacking, updating and verification, and of the raw entry access of 'blib.utils'."""
+
+import os
+import shutil
+import tempfile
+import unittest
+import zipfile as zf
+from io import BytesIO
+from unittest import mock
+
+import blib.utils as utils
+from blib.archive import Repack, Update, repack, update, verify
+from blib.exceptions import InvalidBlibFile
+from blib.utils import archive_sha1, get_path, read_raw, write_raw
+
+def contents(filepath):
+    with zf.ZipFile(filepath, 'r') as archive:
+        return {name: archive.read(get_path(archive, name)) for name in archive.namelist()}
+
+class RepackTest(unittest.TestCase):
+    
+    def setUp(self):
+        self.directory = tempfile.mkdtemp()
+        self._raw_supported = utils.raw_supported
+    
+    def tearDown(self):
+        utils.raw_supported = self._raw_supported
+        shutil.rmtree(self.directory)
+    
+    def make_archive(self, name, entries, comment=b"0 cycles 0.1.6 0.1.6"):
+        filepath = os.path.join(self.directory, name)
+        archive = zf.ZipFile(filepath, 'w', zf.ZIP_DEFLATED)
+        for arcname, data in entries:
+            archive.writestr(arcname, data)
+        archive.comment = comment
+        archive.close()
+        return filepath
+    
+    def test_repack_copies_entries(self):
+        entries = [("structure.xml", b"<blib/>"), ("images/a.png", os.urandom(3000)), ("texts/t.txt", b"text " * 500)]
+        source = self.make_archive("source.blib", entries)
+        target = os.path.join(self.directory, "target.blib")
+        repack(source, target)
+        
+        self.assertEqual(contents(target), dict(entries))
+        with zf.ZipFile(target, 'r') as archive:
+            checksum, meta = archive.comment.decode("utf-8").split(" ", 1)
+            self.assertEqual(meta, "cycles 0.1.6 0.1.6")
+            self.assertEqual(checksum, archive_sha1(archive).hexdigest())
+            verify(archive, checksum)
+    
+    def test_repack_dedup(self):
+        data = os.urandom(5000)
+        first = self.make_archive("first.blib", [("images/a.png", data), ("images/b.png", b"other")])
+        second = self.make_archive("second.blib", [("images/c.png", data)])
+        target = os.path.join(self.directory, "target.blib")
+        
+        pack = Repack(target)
+        with zf.ZipFile(first, 'r') as archive:
+            pack.copy_all(archive)
+        with zf.ZipFile(second, 'r') as archive:
+            pack.copy_all(archive, prefix="second/")
+        pack.write(data, "images/d.png")
+        pack.close()
+        
+        with zf.ZipFile(target, 'r') as archive:
+            self.assertEqual(archive.getinfo("second/images/c.png").comment, b"images/a.png")
+            self.assertEqual(archive.getinfo("images/d.png").comment, b"images/a.png")
+            self.assertEqual(sum(info.file_size for info in archive.infolist()), len(data) + len(b"other"))
+        self.assertEqual(contents(target)["second/images/c.png"], data)
+    
+    def test_repack_failure_deletes_target(self):
+        source = self.make_archive("source.blib", [("structure.xml", b"<blib/>")])
+        target = os.path.join(self.directory, "target.blib")
+        with self.assertRaises(KeyError):
+            repack(source, target, ["structure.xml", "missing.png"])
+        self.assertFalse(os.path.exists(target))
+    
+    def test_raw_fallback(self):
+        entries = [("images/a.png", os.urandom(3000)), ("texts/t.txt", b"text " * 500)]
+        source = self.make_archive("source.blib", entries)
+        with zf.ZipFile(source, 'r') as archive:
+            raw = {info.filename: read_raw(archive, info) for info in archive.infolist()}
+        
+        utils.raw_supported = lambda archive: False
+        with zf.ZipFile(source, 'r') as archive:
+            for info in archive.infolist():
+                self.assertEqual(utils.decompress_data(read_raw(archive, info), info.compress_type),
+                                 utils.decompress_data(raw[info.filename], info.compress_type))
+        
+        target = os.path.join(self.directory, "target.blib")
+        repack(source, target)
+        self.assertEqual(contents(target), dict(entries))
+    
+    def test_write_raw(self):
+        data = b"text " * 500
+        source = self.make_archive("source.blib", [("texts/t.txt", data)])
+        target = os.path.join(self.directory, "target.blib")
+        with zf.ZipFile(source, 'r') as archive, zf.ZipFile(target, 'w') as new:
+            info = archive.getinfo("texts/t.txt")
+            copy = zf.ZipInfo("copy.txt", info.date_time)
+            copy.compress_type = info.compress_type
+            copy.CRC = info.CRC
+            copy.file_size = info.file_size
+            write_raw(new, copy, read_raw(archive, info))
+            self.assertEqual(copy.compress_size, info.compress_size)
+        
+        with zf.ZipFile(target, 'r') as archive:
+            self.assertIsNone(archive.testzip())
+            self.assertEqual(archive.read("copy.txt"), data)
+
+class UpdateTest(unittest.TestCase):
+    
+    def setUp(self):
+        self.directory = tempfile.mkdtemp()
+        self.filepath = os.path.join(self.directory, "lib.blib")
+        self.data = os.urandom(5000)
+        pack = Repack(self.filepath)
+        pack.write(b"<blib/>", "structure.xml")
+        pack.write(self.data, "images/a.png")
+        pack.write(self.data, "images/b.png")
+        pack.write(self.data, "images/c.png")
+        pack.write(b"text " * 500, "texts/t.txt")
+        pack.close("cycles 0.1.6 0.1.6")
+    
+    def tearDown(self):
+        shutil.rmtree(self.directory)
+    
+    def check(self):
+        """Check the archive and its checksum, and return the contents and link comments of its entries."""
+        with zf.ZipFile(self.filepath, 'r') as archive:
+            self.assertIsNone(archive.testzip())
+            checksum, meta = archive.comment.decode("utf-8").split(" ", 1)
+            self.assertEqual(meta, "cycles 0.1.6 0.1.6")
+            verify(archive, checksum)
+            links = {info.filename: info.comment.decode("utf-8") for info in archive.infolist() if info.comment}
+        return contents(self.filepath), links
+    
+    def test_write_replace_remove(self):
+        upd = Update(self.filepath)
+        upd.write(b"new", "texts/new.txt")
+        upd.write(b"<blib version='2'/>", "structure.xml")
+        upd.remove("texts/t.txt")
+        with self.assertRaises(KeyError):
+            upd.remove("texts/missing.txt")
+        upd.close()
+        
+        entries, links = self.check()
+        self.assertEqual(entries, {"structure.xml": b"<blib version='2'/>", "texts/new.txt": b"new",
+                                    "images/a.png": self.data, "images/b.png": self.data, "images/c.png": self.data})
+        self.assertEqual(links, {"images/b.png": "images/a.png", "images/c.png": "images/a.png"})
+    
+    def test_dedup(self):
+        upd = Update(self.filepath)
+        upd.write(self.data, "images/d.png")
+        upd.write(b"text " * 500, "texts/copy.txt")
+        upd.close()
+        
+        entries, links = self.check()
+        self.assertEqual(entries["images/d.png"], self.data)
+        self.assertEqual(links["images/d.png"], "images/a.png")
+        self.assertEqual(links["texts/copy.txt"], "texts/t.txt")
+    
+    def test_heir(self):
+        upd = Update(self.filepath)
+        upd.write(b"other", "images/a.png")
+        upd.close()
+        
+        entries, links = self.check()
+        self.assertEqual(entries["images/a.png"], b"other")
+        self.assertEqual(entries["images/b.png"], self.data)
+        self.assertEqual(entries["images/c.png"], self.data)
+        self.assertEqual(links, {"images/c.png": "images/b.png"})
+        
+        #Removing the heir passes the data on to the remaining link
+        upd = Update(self.filepath)
+        upd.remove("images/b.png")
+        upd.close()
+        entries, links = self.check()
+        self.assertEqual(entries["images/c.png"], self.data)
+        self.assertEqual(links, {})
+    
+    def test_update(self):
+        with zf.ZipFile(self.filepath, 'r') as archive:
+            replaced = archive.getinfo("structure.xml").compress_size + archive.getinfo("texts/t.txt").compress_size
+        unreferenced = update(self.filepath, {"structure.xml": b"<blib version='2'/>"}, ["texts/t.txt"])
+        self.assertEqual(unreferenced, replaced)
+        entries, links = self.check()
+        self.assertEqual(sorted(entries), ["images/a.png", "images/b.png", "images/c.png", "structure.xml"])
+        
+        size = os.path.getsize(self.filepath)
+        target = os.path.join(self.directory, "target.blib")
+        repack(self.filepath, target)
+        self.assertLessEqual(os.path.getsize(target), size - unreferenced)
+        self.assertEqual(contents(target), entries)
+    
+    def test_failed_update(self):
+        with self.assertRaises(FileNotFoundError):
+            update(self.filepath, {"images/d.png": b"new", "images/e.png": os.path.join(self.directory, "missing.png")})
+        with zf.ZipFile(self.filepath, 'r') as archive:
+            self.assertIsNone(archive.testzip())
+            checksum = archive.comment.decode("utf-8").split(" ")[0]
+            with self.assertRaises(InvalidBlibFile):
+                verify(archive, checksum)
+    
+    def test_failed_remove(self):
+        with self.assertRaises(KeyError):
+            update(self.filepath, {"images/d.png": b"new"}, ["texts/missing.txt"])
+        entries, links = self.check()
+        self.assertNotIn("images/d.png", entries)
+
+class VerifyTest(unittest.TestCase):
+    
+    def setUp(self):
+        self.directory = tempfile.mkdtemp()
+        self.filepath = os.path.join(self.directory, "lib.blib")
+        self.make()
+    
+    def tearDown(self):
+        shutil.rmtree(self.directory)
+    
+    def make(self):
+        archive = zf.ZipFile(self.filepath, 'w', zf.ZIP_DEFLATED)
+        archive.writestr("structure.xml", b"<blib/>")
+        archive.writestr("images/a.png", os.urandom(20000))
+        archive.writestr("images/zeros.raw", bytes(5000000))
+        archive.writestr("texts/t.txt", b"text", zf.ZIP_STORED)
+        archive.close()
+    
+    def corrupt(self, name, offset=0):
+        with zf.ZipFile(self.filepath, 'r') as archive:
+            info = archive.getinfo(name)
+            start = utils.data_offset(archive.fp, info)
+        with open(self.filepath, 'r+b') as f:
+            f.seek(start + offset)
+            byte = f.read(1)
+            f.seek(start + offset)
+            f.write(bytes([byte[0] ^ 0xFF]))
+    
+    def check(self, threads=None, in_memory=False):
+        if in_memory:
+            with open(self.filepath, 'rb') as f:
+                archive = zf.ZipFile(BytesIO(f.read()), 'r')
+        else:
+            archive = zf.ZipFile(self.filepath, 'r')
+        try:
+            verify(archive, threads=threads)
+        finally:
+            archive.close()
+    
+    def test_valid(self):
+        self.check()
+        self.check(threads=1)
+        self.check(in_memory=True)
+    
+    def test_corrupted_entries(self):
+        for name in ["images/a.png", "texts/t.txt", "images/zeros.raw"]:
+            self.make()
+            self.corrupt(name, 2)
+            for kwargs in [{}, {"threads": 1}, {"in_memory": True}]:
+                with self.subTest(name=name, **kwargs), self.assertRaises(InvalidBlibFile) as context:
+                    self.check(**kwargs)
+                self.assertIn(name, str(context.exception))
+    
+    def test_checksum(self):
+        with zf.ZipFile(self.filepath, 'r') as archive:
+            verify(archive, archive_sha1(archive).hexdigest())
+            with self.assertRaises(InvalidBlibFile):
+                verify(archive, "0" * 40)
+    
+    def test_unopened_handles(self):
+        with zf.ZipFile(self.filepath, 'r') as archive:
+            open_archive = zf.ZipFile
+            opened = []
+            def open_once(*args, **kwargs): #Only the first thread gets a handle
+                if opened:
+                    raise OSError("Too many open files")
+                opened.append(True)
+                return open_archive(*args, **kwargs)
+            with mock.patch.object(zf, "ZipFile", open_once):
+                verify(archive, threads=3)
+            
+            for threads in [1, 3]:
+                with mock.patch.object(zf, "ZipFile", side_effect=OSError("Too many open files")):
+                    with self.subTest(threads=threads), self.assertRaises(InvalidBlibFile) as context:
+                        verify(archive, threads=threads)
+                    self.assertIn("not checked", str(context.exception))
@@ -0,0 +1,183 @@
+"""Tests of the image extraction of 'blib.cycles.bimport', and its lazy and windowed image imports."""
+
+import os
+import shutil
+import tempfile
+import unittest
+import zipfile as zf
+from unittest import mock
+
+import bpy
+import synthetic
+from blib.cycles.bexport import bexport
+from blib.cycles.bimport import ImageImporter, bimport, extract_jobs
+from blib.cycles.plan import ResourcePlan
+from blib.report import Report
+from blib.utils import data_offset
+
+class ExtractTest(unittest.TestCase):
+    
+    def setUp(self):
+        self.directory = tempfile.mkdtemp()
+        self.resources = os.path.join(self.directory, "resources")
+        self.filepath = os.path.join(self.directory, "lib.blib")
+        self.data = {"images/good.png": os.urandom(5000), "images/bad.png": os.urandom(5000)}
+        archive = zf.ZipFile(self.filepath, 'w', zf.ZIP_STORED)
+        for name, data in sorted(self.data.items()):
+            archive.writestr(name, data)
+        archive.close()
+        
+        #Corrupt the end of an entry, so that its crc32 mismatch is only found after its file is written
+        with zf.ZipFile(self.filepath, 'r') as archive:
+            info = archive.getinfo("images/bad.png")
+            end = data_offset(archive.fp, info) + info.compress_size - 1
+        with open(self.filepath, 'r+b') as f:
+            f.seek(end)
+            byte = f.read(1)
+            f.seek(end)
+            f.write(bytes([byte[0] ^ 0xFF]))
+    
+    def tearDown(self):
+        shutil.rmtree(self.directory)
+    
+    def test_failed_jobs_are_deleted(self):
+        out = os.path.join(self.directory, "out")
+        os.makedirs(out)
+        jobs = [(name, os.path.join(out, os.path.basename(name))) for name in sorted(self.data)]
+        jobs.append(("images/missing.png", os.path.join(out, "missing.png")))
+        for threads in [1, 2]:
+            with zf.ZipFile(self.filepath, 'r') as archive:
+                broken = extract_jobs(archive, jobs, threads)
+            self.assertEqual(broken, {os.path.join(out, "bad.png"), os.path.join(out, "missing.png")})
+            self.assertEqual(sorted(os.listdir(out)), ["good.png"])
+            with open(os.path.join(out, "good.png"), 'rb') as f:
+                self.assertEqual(f.read(), self.data["images/good.png"])
+    
+    def test_unopened_handles(self):
+        out = os.path.join(self.directory, "out")
+        os.makedirs(out)
+        jobs = [("images/good.png", os.path.join(out, "good{}.png".format(i))) for i in range(4)]
+        open_archive = zf.ZipFile
+        opened = []
+        def open_once(*args, **kwargs): #Only the first thread gets a handle
+            if opened:
+                raise OSError("Too many open files")
+            opened.append(True)
+            return open_archive(*args, **kwargs)
+        
+        with zf.ZipFile(self.filepath, 'r') as archive:
+            with mock.patch.object(zf, "ZipFile", open_once):
+                self.assertEqual(extract_jobs(archive, jobs, 2), set())
+            self.assertEqual(sorted(os.listdir(out)), ["good{}.png".format(i) for i in range(4)])
+            shutil.rmtree(out)
+            os.makedirs(out)
+            
+            with mock.patch.object(zf, "ZipFile", side_effect=OSError("Too many open files")):
+                broken = extract_jobs(archive, jobs, 2)
+        self.assertEqual(broken, {dst for src, dst in jobs})
+        self.assertEqual(os.listdir(out), [])
+    
+    def test_merged_hashes_registered_after_extraction(self):
+        ximgs = [ResourcePlan({"name": os.path.basename(name), "path": name, "source": 'FILE', "origin": "external"})
+                 for name in sorted(self.data)]
+        failed = Report()
+        with zf.ZipFile(self.filepath, 'r') as archive:
+            importer = ImageImporter(archive, ximgs, self.resources, failed, threads=1)
+            extracted = importer.extract(["good.png", "bad.png"])
+            importer.close()
+            crcs = {name: format(archive.getinfo(name).CRC, 'x') for name in self.data}
+        
+        self.assertEqual([name for name, ximg, ipath in extracted], ["good.png"])
+        self.assertEqual(failed.total, 1)
+        with open(os.path.join(self.resources, "images", "list.sfv"), 'r', encoding="utf-8") as sfv:
+            lines = sfv.read().splitlines()
+        self.assertEqual(len(lines), 1)
+        self.assertTrue(lines[0].endswith(" " + crcs["images/good.png"]))
+        self.assertNotIn(crcs["images/bad.png"], lines[0])
+
+class ImageImporterTest(unittest.TestCase):
+    
+    def setUp(self):
+        self.directory = tempfile.mkdtemp()
+        self.resources = os.path.join(self.directory, "resources")
+        self.filepath = os.path.join(self.directory, "lib.blib")
+        names = ["images/a.png", "images/b.png"] + ["images/seq/frame{:04d}.png".format(i) for i in range(1, 11)]
+        png = os.path.join(self.directory, "image.png")
+        archive = zf.ZipFile(self.filepath, 'w', zf.ZIP_STORED)
+        for i, name in enumerate(names):
+            synthetic.png(png, 4, 4, i)
+            archive.write(png, name)
+        archive.close()
+        self.ximgs = [ResourcePlan({"name": name, "path": "images/" + name, "source": 'FILE', "origin": "external"})
+                      for name in ["a.png", "b.png"]]
+        self.ximgs.append(ResourcePlan({"name": "seq", "path": "images/seq/frame0001.png", "source": 'SEQUENCE',
+                                        "origin": "external"}))
+        bpy.reset()
+    
+    def tearDown(self):
+        shutil.rmtree(self.directory)
+    
+    def files(self, resources):
+        found = []
+        for root, dirs, files in os.walk(resources):
+            found.extend(name for name in files if name != "list.sfv")
+        return sorted(found)
+    
+    def test_lazy_get(self):
+        failed = Report()
+        with zf.ZipFile(self.filepath, 'r') as archive:
+            importer = ImageImporter(archive, self.ximgs, self.resources, failed, threads=1)
+            self.assertEqual(self.files(self.resources), [])
+            
+            img = importer.get("a.png")
+            self.assertIsNotNone(img)
+            self.assertEqual(self.files(self.resources), ["a.png"])
+            self.assertIs(importer.get("a.png"), img)
+            self.assertEqual(len(bpy.data.images), 1)
+            
+            importer.prefetch(["a.png", "b.png"])
+            self.assertEqual(self.files(self.resources), ["a.png", "b.png"])
+            self.assertEqual(len(bpy.data.images), 2)
+            self.assertIsNone(importer.get("missing.png"))
+            importer.close()
+        self.assertEqual(failed.total, 0)
+    
+    def test_sequence_window(self):
+        frames = lambda numbers: ["frame{:04d}.png".format(i) for i in numbers]
+        windows = [(None, frames(range(1, 11))), ([4, 6], frames([1, 4, 5, 6])), ([9, 14], frames([1, 9, 10])),
+                   ([12, 15], frames([1])), ([-2, 2], frames([1, 2])), ([1, 1], frames([1]))]
+        for window, expected in windows:
+            with self.subTest(window=window):
+                resources = os.path.join(self.directory, "resources_{}".format(window))
+                failed = Report()
+                with zf.ZipFile(self.filepath, 'r') as archive:
+                    importer = ImageImporter(archive, self.ximgs, resources, failed, threads=2)
+                    if window is not None:
+                        importer.windows = {"seq": window}
+                    img = importer.get("seq")
+                    importer.close()
+                self.assertEqual(img.source, 'SEQUENCE')
+                self.assertEqual(self.files(resources), expected)
+                self.assertEqual(failed.total, 0)
+    
+    def test_lazy_import(self):
+        mat = synthetic.make_material(self.directory, nodes=4, images=2, frames=3)
+        filepath = os.path.join(self.directory, "material.blib")
+        bexport(mat, filepath)
+        
+        get = ImageImporter.get
+        found = []
+        def spy(importer, name):
+            found.append(self.files(self.resources))
+            return get(importer, name)
+        
+        for lazy_images in [True, False]:
+            with self.subTest(lazy_images=lazy_images):
+                shutil.rmtree(self.resources, ignore_errors=True)
+                del found[:]
+                bpy.reset()
+                with mock.patch.object(ImageImporter, "get", spy):
+                    bimport(filepath, resource_path=self.resources, lazy_images=lazy_images, plan_cache=False)
+                self.assertTrue(found)
+                self.assertEqual(found[0], [] if lazy_images else self.files(self.resources))
+                self.assertEqual(len(self.files(self.resources)), 5)
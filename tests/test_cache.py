@@ -0,0 +1,107 @@
+"""Tests of 'blib.cache.ExportCache'."""
+
+import os
+import shutil
+import tempfile
+import unittest
+import zipfile as zf
+
+import blib.cache as cache
+from blib.cache import ExportCache
+
+class ExportCacheTest(unittest.TestCase):
+    
+    def setUp(self):
+        self.directory = tempfile.mkdtemp()
+        self.compressed = []
+        self._compress = cache.compress_resource
+        
+        def counting(source, compress_type, fingerprint=None, stats=None):
+            self.compressed.append(source)
+            return self._compress(source, compress_type, fingerprint, stats)
+        cache.compress_resource = counting
+    
+    def tearDown(self):
+        cache.compress_resource = self._compress
+        shutil.rmtree(self.directory)
+    
+    def resource(self, name, data):
+        fpath = os.path.join(self.directory, name)
+        with open(fpath, 'wb') as f:
+            f.write(data)
+        return fpath
+    
+    def write_archive(self, exp_cache, filepath, resources):
+        archive = zf.ZipFile(filepath, 'w', zf.ZIP_DEFLATED)
+        crcs = {}
+        digests = {}
+        for source, destination in resources:
+            exp_cache.write(archive, source, destination, crcs, digests)
+        archive.close()
+    
+    def test_default_is_bounded(self):
+        self.assertEqual(ExportCache().max_size, cache.DEFAULT_MAX_SIZE)
+        self.assertIsNone(ExportCache(None).max_size)
+    
+    def test_lru_eviction(self):
+        exp_cache = ExportCache(max_size=2500)
+        sources = [os.urandom(1000) for i in range(3)]
+        exp_cache.get(sources[0], zf.ZIP_STORED)
+        exp_cache.get(sources[1], zf.ZIP_STORED)
+        exp_cache.get(sources[0], zf.ZIP_STORED) #Most recently used
+        exp_cache.get(sources[2], zf.ZIP_STORED)
+        self.assertEqual(len(exp_cache), 2)
+        self.assertLessEqual(exp_cache.size, 2500)
+        
+        del self.compressed[:]
+        exp_cache.get(sources[0], zf.ZIP_STORED)
+        self.assertEqual(self.compressed, [])
+        exp_cache.get(sources[1], zf.ZIP_STORED)
+        self.assertEqual(self.compressed, [sources[1]])
+    
+    def test_signature_does_not_compress(self):
+        exp_cache = ExportCache()
+        resources = [(self.resource("a.png", os.urandom(5000)), "images/a.png"), (b"text", "texts/t.txt")]
+        signature = exp_cache.signature(b"<blib/>", resources, zf.ZIP_DEFLATED)
+        self.assertEqual(self.compressed, [])
+        self.assertEqual(signature, exp_cache.signature(b"<blib/>", resources, zf.ZIP_DEFLATED))
+        self.assertNotEqual(signature, exp_cache.signature(b"<blib/>", resources, zf.ZIP_STORED))
+        self.assertNotEqual(signature, exp_cache.signature(b"<blib/>", resources[:1] + [(b"other", "texts/t.txt")],
+                                                           zf.ZIP_DEFLATED))
+    
+    def test_signature_changes_with_file(self):
+        exp_cache = ExportCache()
+        fpath = self.resource("a.png", b"first")
+        resources = [(fpath, "images/a.png")]
+        signature = exp_cache.signature(b"<blib/>", resources, zf.ZIP_DEFLATED)
+        self.resource("a.png", b"second version")
+        self.assertNotEqual(signature, exp_cache.signature(b"<blib/>", resources, zf.ZIP_DEFLATED))
+    
+    def test_current_archive(self):
+        exp_cache = ExportCache()
+        filepath = os.path.join(self.directory, "a.blib")
+        resources = [(self.resource("a.png", os.urandom(5000)), "images/a.png"), (b"text", "texts/t.txt")]
+        signature = exp_cache.signature(b"<blib/>", resources, zf.ZIP_DEFLATED)
+        self.assertFalse(exp_cache.is_current(filepath, signature))
+        
+        self.write_archive(exp_cache, filepath, resources)
+        exp_cache.set_current(filepath, signature)
+        self.assertTrue(exp_cache.is_current(filepath, signature))
+        
+        with open(filepath, 'ab') as f: #Modified outside of the cache
+            f.write(b"\0")
+        self.assertFalse(exp_cache.is_current(filepath, signature))
+    
+    def test_written_data(self):
+        exp_cache = ExportCache()
+        filepath = os.path.join(self.directory, "a.blib")
+        data = os.urandom(3000)
+        resources = [(self.resource("a.png", data), "images/a.png"), (data, "images/b.png"), (b"text", "texts/t.txt")]
+        self.write_archive(exp_cache, filepath, resources)
+        
+        archive = zf.ZipFile(filepath)
+        self.assertIsNone(archive.testzip())
+        self.assertEqual(archive.read("images/a.png"), data)
+        self.assertEqual(archive.getinfo("images/b.png").comment, b"images/a.png") #Deduplicated
+        self.assertEqual(archive.read("texts/t.txt"), b"text")
+        archive.close()
@@ -0,0 +1,52 @@
+"""Tests of 'blib.utils.EntryIndex'."""
+
+import unittest
+import zipfile as zf
+from io import BytesIO
+
+from blib.utils import EntryIndex
+
+class EntryIndexTest(unittest.TestCase):
+    
+    def setUp(self):
+        self.buffer = BytesIO()
+        with zf.ZipFile(self.buffer, 'w') as archive:
+            for name in ["structure.xml", "images/b.png", "images/a.png", "images/seq/frame0002.png",
+                         "images/seq/frame0001.png", "texts/t.txt"]:
+                archive.writestr(name, b"")
+        self.archive = zf.ZipFile(self.buffer, 'r')
+    
+    def tearDown(self):
+        self.archive.close()
+    
+    def test_archive(self):
+        index = EntryIndex(self.archive)
+        self.assertEqual(len(index), 6)
+        self.assertEqual(set(index), set(self.archive.namelist()))
+        self.assertIn("images/seq/frame0001.png", index)
+        self.assertNotIn("images/seq", index)
+        self.assertNotIn("frame0001.png", index)
+    
+    def test_listdir(self):
+        index = EntryIndex(self.archive)
+        self.assertEqual(index.listdir(""), ["structure.xml"])
+        self.assertEqual(index.listdir("images"), ["a.png", "b.png"]) #Only direct entries, sorted
+        self.assertEqual(index.listdir("images/seq"), ["frame0001.png", "frame0002.png"])
+        self.assertEqual(index.listdir("missing"), [])
+        self.assertEqual(index.listdir("images/"), [])
+    
+    def test_add(self):
+        index = EntryIndex()
+        self.assertEqual(len(index), 0)
+        self.assertEqual(index.listdir(""), [])
+        for name in ["seq/frame0003.png", "seq/frame0001.png", "seq/frame0001.png", "root.txt"]:
+            index.add(name)
+        self.assertEqual(len(index), 3)
+        self.assertEqual(index.listdir("seq"), ["frame0001.png", "frame0003.png"])
+        
+        #Entries added after listing are sorted into the next listing
+        listing = index.listdir("seq")
+        index.add("seq/frame0002.png")
+        self.assertEqual(listing, ["frame0001.png", "frame0003.png"])
+        self.assertEqual(index.listdir("seq"), ["frame0001.png", "frame0002.png", "frame0003.png"])
+        self.assertEqual(index.listdir(""), ["root.txt"])
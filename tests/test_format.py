@@ -0,0 +1,209 @@
+"""Tests of the structure format written by 'blib.cycles.generate_xml', and read by 'blib.cycles.bimport'."""
+
+import os
+import shutil
+import tempfile
+import unittest
+import zipfile as zf
+import xml.etree.ElementTree as ET
+
+import bpy
+import synthetic
+from blib.cycles.bexport import bexport
+from blib.cycles.bimport import bimport
+from blib.cycles.plan import compile_attributes, read_curves, read_ramp, read_types
+from blib.utils import pack_floats, unpack_floats
+
+def downgrade(xroot):
+    """Convert a structure to the format written before 0.1.6, with list literals and untyped attributes."""
+    for xelement in xroot.iter():
+        if "blib_types" in xelement.attrib:
+            for attr, code in read_types(xelement).items():
+                if code == "v":
+                    xelement.set(attr, str(unpack_floats(xelement.attrib[attr]).tolist()))
+                elif code == "E":
+                    xelement.set(attr, str(xelement.attrib[attr].split()))
+            del xelement.attrib["blib_types"]
+        xelement.attrib.pop("blib_hash", None)
+    for xcurvedata in xroot.iter("curve_data"):
+        xcurvedata.text = str(read_curves(xcurvedata))
+        for xcurve in list(xcurvedata):
+            xcurvedata.remove(xcurve)
+    for xrampdata in xroot.iter("ramp_data"):
+        xrampdata.text = str(read_ramp(xrampdata))
+        xrampdata.remove(xrampdata.find("elements"))
+    xroot.set("version", "0.1.5")
+    xroot.set("compatible", "0.1.5")
+
+def snapshot(mat):
+    """Collect the node settings that are stored in the structure, for comparison."""
+    nodes = {}
+    for node in mat.node_tree.nodes:
+        values = [node.bl_idname, node.label, tuple(node.color), node.width, node.hide, node.mute]
+        values.extend(tuple(inp.default_value) if hasattr(inp.default_value, "__len__") else inp.default_value
+                      for inp in node.inputs if hasattr(inp, "default_value"))
+        if node.bl_idname == "ShaderNodeRGBCurve":
+            values.append([[(tuple(point.location), point.handle_type) for point in curve.points]
+                           for curve in node.mapping.curves])
+        elif node.bl_idname == "ShaderNodeValToRGB":
+            ramp = node.color_ramp
+            values.append((ramp.interpolation, ramp.color_mode, ramp.hue_interpolation))
+            values.append([(element.position, tuple(element.color)) for element in ramp.elements])
+        nodes[node.name] = values
+    links = sorted((link.from_node.name, link.from_socket.identifier, link.to_node.name, link.to_socket.identifier)
+                   for link in mat.node_tree.links)
+    return nodes, links
+
+class PackedFloatsTest(unittest.TestCase):
+    
+    def test_round_trip(self):
+        values = [0.0, 1.0, -2.5, 0.25, 1024.0]
+        for typecode in ["f", "d"]:
+            for encode in [True, False]:
+                with self.subTest(typecode=typecode, encode=encode):
+                    data = pack_floats(values, typecode, encode)
+                    self.assertIsInstance(data, str if encode else bytes)
+                    self.assertEqual(unpack_floats(data, typecode).tolist(), values)
+        self.assertEqual(unpack_floats(pack_floats(iter([0.1]))).tolist(), unpack_floats(pack_floats([0.1])).tolist())
+        self.assertEqual(unpack_floats("").tolist(), [])
+    
+    def test_little_endian(self):
+        self.assertEqual(pack_floats([1.0, 2.0], encode=False), b"\x00\x00\x80\x3f\x00\x00\x00\x40")
+        self.assertEqual(pack_floats([1.0, 2.0]), "AACAPwAAAEA=")
+        self.assertEqual(unpack_floats(memoryview(b"\x00\x00\x00\x00\x00\x00\xf0\x3f"), "d").tolist(), [1.0])
+
+class AttributesTest(unittest.TestCase):
+    
+    def test_typed(self):
+        xelement = ET.Element("node", {"label": "1.5", "name": "True", "hide": "True", "mute": "False",
+                                       "link_limit": "4095", "width": "140.0", "interpolation": "LINEAR",
+                                       "flags": "A B", "empty": "", "parent": "None", "color": pack_floats([0.5, 1.0]),
+                                       "items": "[1, 'a']", "bl_idname": "ShaderNodeMath", "blib_image": "a.png",
+                                       "blib_types": "b:hide,mute i:link_limit f:width e:interpolation "
+                                                     "E:empty,flags n:parent v:color l:items"})
+        attributes = compile_attributes(xelement, skip={"name"})
+        self.assertEqual(dict(attributes.values), {"label": "1.5", "hide": True, "mute": False, "link_limit": 4095,
+                                                   "width": 140.0, "interpolation": "LINEAR", "flags": {"A", "B"},
+                                                   "empty": set(), "parent": None, "color": [0.5, 1.0],
+                                                   "items": [1, 'a']})
+        self.assertIs(type(dict(attributes.values)["link_limit"]), int)
+        self.assertEqual(attributes.invalid, [])
+    
+    def test_invalid(self):
+        xelement = ET.Element("input", {"link_limit": "many", "width": "wide", "hide": "False", "value": "1",
+                                        "blib_types": "i:link_limit f:width b:hide x:value"})
+        attributes = compile_attributes(xelement)
+        self.assertEqual(attributes.values, [("hide", False)])
+        self.assertEqual(sorted(attributes.invalid), ["link_limit", "value", "width"])
+    
+    def test_untyped(self):
+        xelement = ET.Element("node", {"label": "Label", "width": "140.0", "hide": "True", "parent": "None",
+                                       "color": "[0.5, 1.0]", "blib_image": "a.png"})
+        attributes = compile_attributes(xelement)
+        self.assertEqual(dict(attributes.values), {"label": "Label", "width": 140.0, "hide": True, "parent": None,
+                                                   "color": [0.5, 1.0]})
+        self.assertEqual(attributes.invalid, [])
+
+class FormatTest(unittest.TestCase):
+    
+    def setUp(self):
+        self.directory = tempfile.mkdtemp()
+        self.resources = os.path.join(self.directory, "resources")
+        self.filepath = os.path.join(self.directory, "lib.blib")
+        bpy.reset()
+        self.mat = synthetic.make_material(self.directory, nodes=8, images=1)
+        nodes = self.mat.node_tree.nodes
+        
+        curves = nodes.new("ShaderNodeRGBCurve")
+        curves.name = "Curves"
+        point = curves.mapping.curves[1].points.new(0.25, 0.75)
+        point.handle_type = 'VECTOR'
+        curves.mapping.curves[0].points[1].location = (1.0, 0.5)
+        curves.mapping.curves[0].points[1].handle_type = 'AUTO_CLAMPED'
+        
+        ramp = nodes.new("ShaderNodeValToRGB")
+        ramp.name = "Ramp"
+        ramp.color_ramp.interpolation = 'CONSTANT'
+        ramp.color_ramp.color_mode = 'HSV'
+        element = ramp.color_ramp.elements.new(0.5)
+        element.color = (0.25, 0.5, 0.75, 1.0)
+        ramp.color = (0.25, 0.5, 1.0)
+        ramp.width = 250.0
+        ramp.label = "Ramp"
+        self.mat.node_tree.links.new(ramp.outputs["Color"], curves.inputs["Color"])
+    
+    def tearDown(self):
+        shutil.rmtree(self.directory)
+    
+    def read_structure(self):
+        with zf.ZipFile(self.filepath, 'r') as archive:
+            return ET.fromstring(archive.read("structure.xml"))
+    
+    def rewrite(self, xroot, filepath):
+        """Copy the exported file to 'filepath', with its structure replaced."""
+        with zf.ZipFile(self.filepath, 'r') as src, zf.ZipFile(filepath, 'w', zf.ZIP_DEFLATED) as dst:
+            for info in src.infolist():
+                if info.filename == "structure.xml":
+                    dst.writestr(info, ET.tostring(xroot, encoding="utf-8"))
+                else:
+                    dst.writestr(info, src.read(info))
+            checksum, blibtype, file_version, compatible = src.comment.decode("utf-8").split(" ")
+            dst.comment = " ".join([checksum, blibtype, xroot.attrib["version"], xroot.attrib["compatible"]]).encode("utf-8")
+    
+    def import_file(self, filepath):
+        bpy.reset()
+        return bimport(filepath, resource_path=self.resources, skip_sha1=True, plan_cache=False)
+    
+    def test_packed_structure(self):
+        bexport(self.mat, self.filepath)
+        xroot = self.read_structure()
+        xnodes = {xnode.attrib["name"]: xnode for xnode in xroot.iter("node")}
+        
+        xcurves = xnodes["Curves"].find("curve_data").findall("curve")
+        self.assertEqual(len(xcurves), len(self.mat.node_tree.nodes["Curves"].mapping.curves))
+        self.assertEqual(xcurves[0].attrib["handles"], "AUTO AUTO_CLAMPED")
+        self.assertEqual(unpack_floats(xcurves[0].text).tolist(), [0.0, 0.0, 1.0, 0.5])
+        self.assertEqual(xcurves[1].attrib["handles"], "AUTO VECTOR AUTO")
+        self.assertEqual(unpack_floats(xcurves[1].text).tolist(), [0.0, 0.0, 0.25, 0.75, 1.0, 1.0])
+        
+        xrampdata = xnodes["Ramp"].find("ramp_data")
+        self.assertEqual(xrampdata.attrib["interpolation"], "CONSTANT")
+        self.assertEqual(xrampdata.attrib["color_mode"], "HSV")
+        self.assertIsNone(xrampdata.text and xrampdata.text.strip() or None)
+        values = unpack_floats(xrampdata.find("elements").text).tolist()
+        self.assertEqual(len(values), 5 * len(self.mat.node_tree.nodes["Ramp"].color_ramp.elements))
+        self.assertEqual(values[5:10], [0.5, 0.25, 0.5, 0.75, 1.0])
+        
+        self.assertEqual(read_types(xnodes["Ramp"])["color"], "v")
+        self.assertEqual(unpack_floats(xnodes["Ramp"].attrib["color"]).tolist(), [0.25, 0.5, 1.0])
+    
+    def test_round_trip(self):
+        expected = snapshot(self.mat)
+        bexport(self.mat, self.filepath)
+        self.assertEqual(snapshot(self.import_file(self.filepath)), expected)
+    
+    def test_string_labels(self):
+        labels = dict(zip(["Ramp", "Curves", "Material Output"], ["1.5", "True", "[1, 2]"]))
+        for name, label in labels.items():
+            self.mat.node_tree.nodes[name].label = label
+        bexport(self.mat, self.filepath)
+        nodes = self.import_file(self.filepath).node_tree.nodes
+        self.assertEqual({name: nodes[name].label for name in labels}, labels)
+    
+    def test_old_format_round_trip(self):
+        expected = snapshot(self.mat)
+        bexport(self.mat, self.filepath)
+        xroot = self.read_structure()
+        downgrade(xroot)
+        self.assertFalse(any("blib_types" in xelement.attrib for xelement in xroot.iter()))
+        
+        old = os.path.join(self.directory, "old.blib")
+        self.rewrite(xroot, old)
+        self.assertEqual(snapshot(self.import_file(old)), expected)
+    
+    def test_old_literals(self):
+        xcurvedata = ET.fromstring("<curve_data>[[[[0.0, 0.0], 'AUTO'], [[1.0, 1.0], 'VECTOR']]]</curve_data>")
+        self.assertEqual(read_curves(xcurvedata), [[[[0.0, 0.0], 'AUTO'], [[1.0, 1.0], 'VECTOR']]])
+        xrampdata = ET.fromstring('<ramp_data interpolation="LINEAR">[[0.0, [0.0, 0.0, 0.0, 1.0]], '
+                                  '[1.0, [1.0, 1.0, 1.0, 1.0]]]</ramp_data>')
+        self.assertEqual(read_ramp(xrampdata), [[0.0, [0.0, 0.0, 0.0, 1.0]], [1.0, [1.0, 1.0, 1.0, 1.0]]])
@@ -0,0 +1,87 @@
+"""Tests of 'blib.utils.FrameIndex', against a plain linear scan of the directory."""
+
+import os
+import re
+import shutil
+import tempfile
+import unittest
+
+import blib.utils as utils
+from blib.utils import FrameIndex
+
+def linear_range(directory, filename, start, end):
+    """Reference implementation: scan every file of the directory."""
+    
+    base, ext = os.path.splitext(filename)
+    prefix = re.match(r"^(.*?)([0-9]+)$", base).group(1)
+    frames = []
+    for name in os.listdir(directory):
+        match = re.match(r"^(.*?)([0-9]+)$", os.path.splitext(name)[0])
+        if match is not None and match.group(1) == prefix and os.path.splitext(name)[1] == ext:
+            if start <= int(match.group(2)) <= end:
+                frames.append((int(match.group(2)), name))
+    return [name for num, name in sorted(frames)]
+
+class FrameIndexTest(unittest.TestCase):
+    
+    def setUp(self):
+        self.directory = tempfile.mkdtemp()
+        names = ["frame{:04d}.png".format(num) for num in (3, 4, 5, 9, 10, 20)] #Gaps at 6-8 and 11-19
+        names += ["frame7.png", "frame012.png"] #Mixed zero padding
+        names += ["frame0006.exr", "other0005.png", "notes.txt"] #Other sequences and files
+        for name in names:
+            open(os.path.join(self.directory, name), 'wb').close()
+        self.index = FrameIndex(self.directory)
+    
+    def tearDown(self):
+        shutil.rmtree(self.directory)
+    
+    def check(self, start, end, filename="frame0001.png"):
+        expected = linear_range(self.directory, filename, start, end)
+        self.assertEqual(self.index.find_range(filename, start, end), expected)
+        return expected
+    
+    def test_gaps(self):
+        self.assertEqual(self.check(5, 10), ["frame0005.png", "frame7.png", "frame0009.png", "frame0010.png"])
+        self.assertEqual(self.check(13, 19), [])
+    
+    def test_start_before_first_frame(self):
+        self.assertEqual(self.check(-10, 4), ["frame0003.png", "frame0004.png"])
+    
+    def test_end_after_last_frame(self):
+        self.assertEqual(self.check(12, 1000), ["frame012.png", "frame0020.png"])
+    
+    def test_empty_ranges(self):
+        self.assertEqual(self.check(6, 6), [])
+        self.assertEqual(self.check(10, 9), [])
+        self.assertEqual(self.check(100, 200), [])
+        self.assertEqual(self.check(-5, 0), [])
+    
+    def test_mixed_padding(self):
+        self.assertEqual(self.check(7, 12), ["frame7.png", "frame0009.png", "frame0010.png", "frame012.png"])
+    
+    def test_every_range(self):
+        for start in range(-2, 23):
+            for end in range(start - 1, 23):
+                self.check(start, end)
+    
+    def test_other_sequences(self):
+        self.assertEqual(self.index.find_range("frame0001.exr", 0, 100), ["frame0006.exr"])
+        self.assertEqual(self.index.find_range("other0001.png", 0, 100), ["other0005.png"])
+        self.assertEqual(self.index.find_range("missing0001.png", 0, 100), [])
+    
+    def test_names_without_directory(self):
+        index = FrameIndex("images/sequence_1", os.listdir(self.directory))
+        self.assertEqual(index.find_range("frame0001.png", 0, 100), self.index.find_range("frame0001.png", 0, 100))
+    
+    def test_listdir_fallback(self):
+        os.mkdir(os.path.join(self.directory, "frame0030.png")) #Directories are not frames
+        self.index = FrameIndex(self.directory)
+        version_info = utils.version_info
+        utils.version_info = (3, 4) #Without 'os.scandir'
+        try:
+            index = FrameIndex(self.directory)
+        finally:
+            utils.version_info = version_info
+        self.assertEqual(index.find_range("frame0001.png", 0, 100), self.index.find_range("frame0001.png", 0, 100))
+        self.assertNotIn("frame0030.png", index.find_range("frame0001.png", 0, 100))
@@ -0,0 +1,100 @@
+"""Tests of the node group interfaces created by 'blib.cycles.bimport'."""
+
+import importlib
+import os
+import shutil
+import tempfile
+import unittest
+from unittest import mock
+
+import bpy
+import synthetic
+from blib.cycles.bexport import bexport
+from blib.cycles.bimport import bimport, make_sockets, new_socket
+
+bimport_module = importlib.import_module("blib.cycles.bimport")
+
+def interface(tree):
+    return [(sock.name, sock.type) for sock in tree.inputs], [(sock.name, sock.type) for sock in tree.outputs]
+
+def defaults(sockets):
+    return [(sock.name, tuple(sock.default_value) if hasattr(sock.default_value, "__len__") else sock.default_value)
+            for sock in sockets if hasattr(sock, "default_value")]
+
+class SocketsTest(unittest.TestCase):
+    
+    def setUp(self):
+        bpy.reset()
+        self.tree = bpy.data.node_groups.new("Group", "ShaderNodeTree")
+        self.inp = self.tree.nodes.new("NodeGroupInput")
+        self.out = self.tree.nodes.new("NodeGroupOutput")
+    
+    def test_new_socket(self):
+        new_socket(self.tree, 'INPUT', 'VECTOR', "Normal")
+        new_socket(self.tree, 'OUTPUT', 'SHADER', "BSDF")
+        self.assertEqual(interface(self.tree), ([("Normal", 'VECTOR')], [("BSDF", 'SHADER')]))
+    
+    def test_make_sockets(self):
+        group_inputs = [('VALUE', "Fac"), ('RGBA', "Color"), ('VECTOR', "Normal"), ('INT', "Count")]
+        group_outputs = [('SHADER', "BSDF"), ('VALUE', "Fac")]
+        with mock.patch.object(bimport_module, "route_sockets") as route_sockets:
+            make_sockets(self.tree, self.inp, self.out, group_inputs, group_outputs)
+        route_sockets.assert_not_called()
+        self.assertEqual(interface(self.tree), ([(name, ty) for ty, name in group_inputs],
+                                                [(name, ty) for ty, name in group_outputs]))
+        self.assertEqual([sock.name for sock in self.inp.outputs][:-1], ["Fac", "Color", "Normal", "Count"])
+        self.assertEqual([sock.name for sock in self.out.inputs][:-1], ["BSDF", "Fac"])
+    
+    def test_routed(self):
+        #Sockets of unknown types can only be created by linking them
+        group_inputs = [('VALUE', "Fac"), ('CUSTOM', "Custom")]
+        with mock.patch.object(bimport_module, "route_sockets") as route_sockets:
+            make_sockets(self.tree, self.inp, None, group_inputs, None)
+        route_sockets.assert_called_once_with(self.tree, self.inp, None, group_inputs, None)
+        self.assertEqual(interface(self.tree), ([], []))
+
+class InterfaceRoundTripTest(unittest.TestCase):
+    
+    def setUp(self):
+        self.directory = tempfile.mkdtemp()
+        self.resources = os.path.join(self.directory, "resources")
+        bpy.reset()
+        self.mat = synthetic.make_material(self.directory, nodes=2, images=0)
+        grp = bpy.data.node_groups.new("Interface", "ShaderNodeTree")
+        for ty, name in [("NodeSocketFloat", "Fac"), ("NodeSocketColor", "Color"), ("NodeSocketVector", "Normal"),
+                         ("NodeSocketInt", "Count"), ("NodeSocketShader", "Shader")]:
+            grp.inputs.new(ty, name)
+        for ty, name in [("NodeSocketShader", "BSDF"), ("NodeSocketFloat", "Fac"), ("NodeSocketColor", "Color")]:
+            grp.outputs.new(ty, name)
+        inp = grp.nodes.new("NodeGroupInput")
+        out = grp.nodes.new("NodeGroupOutput")
+        grp.links.new(inp.outputs["Shader"], out.inputs["BSDF"])
+        grp.links.new(inp.outputs["Fac"], out.inputs["Fac"])
+        
+        node = self.mat.node_tree.nodes.new("ShaderNodeGroup")
+        node.name = "Group"
+        node.node_tree = grp
+        node.inputs["Fac"].default_value = 0.25
+        node.inputs["Color"].default_value = (0.5, 0.25, 0.125, 1.0)
+        node.inputs["Normal"].default_value = (0.0, 1.0, 0.5)
+        node.inputs["Count"].default_value = 3
+        self.filepath = os.path.join(self.directory, "lib.blib")
+    
+    def tearDown(self):
+        shutil.rmtree(self.directory)
+    
+    def snapshot(self, mat):
+        node = mat.node_tree.nodes["Group"]
+        grp = node.node_tree
+        nodes = {n.bl_idname: n for n in grp.nodes}
+        links = sorted((link.from_socket.name, link.to_socket.name) for link in grp.links)
+        return interface(grp), defaults(node.inputs), defaults(node.outputs), links, \
+               [sock.name for sock in nodes["NodeGroupInput"].outputs], [sock.name for sock in nodes["NodeGroupOutput"].inputs]
+    
+    def test_round_trip(self):
+        expected = self.snapshot(self.mat)
+        self.assertEqual(expected[1][0], ("Fac", 0.25))
+        bexport(self.mat, self.filepath)
+        bpy.reset()
+        mat = bimport(self.filepath, resource_path=self.resources)
+        self.assertEqual(self.snapshot(mat), expected)
@@ -0,0 +1,109 @@
+"""Tests of the node group hashes of 'blib.cycles.generate_xml', and the group merging of 'blib.cycles.bimport'."""
+
+import os
+import shutil
+import tempfile
+import unittest
+import zipfile as zf
+import xml.etree.ElementTree as ET
+
+import bpy
+import synthetic
+from blib.cycles.bexport import bexport
+from blib.cycles.bimport import bimport
+from blib.cycles.generate_xml import group_hash
+
+def make_group(name, attrib=None, sub=None):
+    xgrp = ET.Element("group", {"bl_idname": "ShaderNodeTree", "name": name})
+    xnodes = ET.SubElement(xgrp, "nodes")
+    ET.SubElement(xnodes, "node", attrib or {"bl_idname": "ShaderNodeMath", "name": "Math", "operation": "ADD"})
+    if sub is not None:
+        ET.SubElement(xnodes, "node", {"bl_idname": "ShaderNodeGroup", "name": "Group", "blib_node_tree": sub})
+    return xgrp
+
+class GroupHashTest(unittest.TestCase):
+    
+    def test_name_ignored(self):
+        first = make_group("First")
+        second = make_group("Second")
+        second.set("blib_hash", "0" * 40)
+        self.assertIsNotNone(group_hash(first, {}))
+        self.assertEqual(group_hash(first, {}), group_hash(second, {}))
+        
+        #Only the name of the group itself is ignored
+        renamed = make_group("First", {"bl_idname": "ShaderNodeMath", "name": "Other", "operation": "ADD"})
+        changed = make_group("First", {"bl_idname": "ShaderNodeMath", "name": "Math", "operation": "MULTIPLY"})
+        self.assertNotEqual(group_hash(renamed, {}), group_hash(first, {}))
+        self.assertNotEqual(group_hash(changed, {}), group_hash(first, {}))
+    
+    def test_resources(self):
+        for key in ["blib_image", "blib_text", "blib_script", "blib_filepath"]:
+            with self.subTest(key=key):
+                xgrp = make_group("Group", {"bl_idname": "ShaderNodeTexImage", "name": "Image", key: "a"})
+                self.assertIsNone(group_hash(xgrp, {}))
+    
+    def test_nested(self):
+        hashes = {"Sub": "a" * 40, "Renamed": "a" * 40, "Other": "b" * 40}
+        xhash = group_hash(make_group("Group", sub="Sub"), hashes)
+        self.assertEqual(group_hash(make_group("Group", sub="Renamed"), hashes), xhash)
+        self.assertNotEqual(group_hash(make_group("Group", sub="Other"), hashes), xhash)
+        self.assertIsNone(group_hash(make_group("Group", sub="Unhashed"), hashes))
+
+class GroupMergeTest(unittest.TestCase):
+    
+    def setUp(self):
+        self.directory = tempfile.mkdtemp()
+        self.resources = os.path.join(self.directory, "resources")
+        bpy.reset()
+    
+    def tearDown(self):
+        shutil.rmtree(self.directory)
+    
+    def export(self, name, **kwargs):
+        mat = synthetic.make_material(self.directory, name=name, nodes=4, depth=2, images=0, **kwargs)
+        filepath = os.path.join(self.directory, name + ".blib")
+        bexport(mat, filepath)
+        with zf.ZipFile(filepath, 'r') as archive:
+            xroot = ET.fromstring(archive.read("structure.xml"))
+        return filepath, [xgrp.attrib.get("blib_hash") for xgrp in xroot.iter("group")]
+    
+    def test_exported_hashes(self):
+        first, first_hashes = self.export("First")
+        second, second_hashes = self.export("Second")
+        other, other_hashes = self.export("Other", seed=1)
+        self.assertEqual(len(first_hashes), 2)
+        self.assertNotIn(None, first_hashes)
+        self.assertEqual(first_hashes, second_hashes)
+        self.assertNotEqual(first_hashes, other_hashes)
+    
+    def test_image_group_not_hashed(self):
+        mat = synthetic.make_material(self.directory, nodes=2, images=0)
+        grp = bpy.data.node_groups.new("Images", "ShaderNodeTree")
+        synthetic.png(os.path.join(self.directory, "a.png"), 8, 8, 0)
+        grp.nodes.new("ShaderNodeTexImage").image = bpy.data.images.load(os.path.join(self.directory, "a.png"))
+        mat.node_tree.nodes.new("ShaderNodeGroup").node_tree = grp
+        filepath = os.path.join(self.directory, "images.blib")
+        bexport(mat, filepath)
+        with zf.ZipFile(filepath, 'r') as archive:
+            xroot = ET.fromstring(archive.read("structure.xml"))
+        xgrps = list(xroot.iter("group"))
+        self.assertEqual([xgrp.attrib["name"] for xgrp in xgrps], ["Images"])
+        self.assertNotIn("blib_hash", xgrps[0].attrib)
+    
+    def test_merge(self):
+        first, first_hashes = self.export("First")
+        second, second_hashes = self.export("Second")
+        
+        bpy.reset()
+        mat = bimport(first, resource_path=self.resources, grp_merge=True)
+        groups = set(bpy.data.node_groups)
+        self.assertEqual(len(groups), 2)
+        self.assertEqual({grp["blib_hash"] for grp in groups}, set(first_hashes))
+        
+        merged = bimport(second, resource_path=self.resources, grp_merge=True)
+        self.assertEqual(set(bpy.data.node_groups), groups)
+        tree = lambda mat: [node.node_tree for node in mat.node_tree.nodes if node.bl_idname == "ShaderNodeGroup"]
+        self.assertEqual(tree(merged), tree(mat))
+        
+        bimport(second, resource_path=self.resources)
+        self.assertEqual(len(bpy.data.node_groups), 4)
@@ -0,0 +1,103 @@
+"""Tests of the image header parsing of 'blib.imageinfo'."""
+
+import os
+import shutil
+import struct
+import tempfile
+import threading
+import unittest
+
+import synthetic
+from blib.imageinfo import image_info
+
+def exr_attribute(name, kind, value, size=None):
+    return name + b"\0" + kind + b"\0" + struct.pack("<i", len(value) if size is None else size) + value
+
+def exr(*attributes):
+    return b"\x76\x2f\x31\x01" + struct.pack("<I", 2) + b"".join(attributes) + b"\0" + b"\0" * 64
+
+channels = b"".join(name + b"\0" + struct.pack("<iB3xii", 1, 0, 1, 1) for name in [b"A", b"B", b"G", b"R"]) + b"\0"
+window = struct.pack("<iiii", 0, 0, 1919, 1079)
+
+class ImageInfoTest(unittest.TestCase):
+    
+    def check(self, data, expected, name=None):
+        info = image_info(data, name)
+        if expected is None:
+            self.assertIsNone(info)
+        else:
+            self.assertEqual((info["format"], info["width"], info["height"], info["channels"]), expected)
+            self.assertEqual(info["size"], len(data))
+    
+    def parse_with_timeout(self, data):
+        result = []
+        thread = threading.Thread(target=lambda: result.append(image_info(data)), daemon=True)
+        thread.start()
+        thread.join(5.0)
+        self.assertFalse(thread.is_alive(), "Parser did not terminate")
+        return result[0]
+    
+    def test_png(self):
+        directory = tempfile.mkdtemp()
+        try:
+            fpath = os.path.join(directory, "image.png")
+            synthetic.png(fpath, 17, 9)
+            info = image_info(fpath)
+            self.assertEqual((info["format"], info["width"], info["height"], info["channels"]), ("PNG", 17, 9, 3))
+            self.assertEqual(info["size"], os.path.getsize(fpath))
+        finally:
+            shutil.rmtree(directory)
+    
+    def test_formats(self):
+        jpeg = (b"\xff\xd8\xff\xe0" + struct.pack(">H", 16) + b"JFIF\0" + b"\0" * 9 +
+                b"\xff\xe1" + struct.pack(">H", 60000) + b"\0" * 59998 +
+                b"\xff\xc2" + struct.pack(">HBHHB", 11, 8, 480, 640, 3) + b"\0" * 3)
+        self.check(jpeg, ("JPEG", 640, 480, 3))
+        self.check(b"GIF89a" + struct.pack("<HH", 10, 20) + b"\0" * 20, ("GIF", 10, 20, 3))
+        self.check(b"BM" + b"\0" * 12 + struct.pack("<IiiHH", 40, 30, -40, 1, 32) + b"\0" * 30, ("BMP", 30, 40, 4))
+        tiff = (b"II*\0" + struct.pack("<IH", 8, 3) +
+                struct.pack("<HHI4s", 256, 3, 1, struct.pack("<H", 300) + b"\0\0") +
+                struct.pack("<HHI4s", 257, 4, 1, struct.pack("<I", 200)) +
+                struct.pack("<HHI4s", 277, 3, 1, struct.pack("<H", 4) + b"\0\0") + b"\0" * 4)
+        self.check(tiff, ("TIFF", 300, 200, 4))
+        self.check(b"#?RADIANCE\nFORMAT=32-bit_rle_rgbe\n\n-Y 512 +X 1024\n" + b"\0" * 100, ("HDR", 1024, 512, 3))
+        webp = (b"RIFF" + b"\0" * 4 + b"WEBP" + b"VP8X" + struct.pack("<I", 10) + bytes([0x10, 0, 0, 0]) +
+                (799).to_bytes(3, "little") + (599).to_bytes(3, "little"))
+        self.check(webp, ("WEBP", 800, 600, 4))
+        dpx = bytearray(2048)
+        dpx[:4] = b"SDPX"
+        dpx[772:780] = struct.pack(">II", 2048, 1556)
+        dpx[800] = 50
+        self.check(bytes(dpx), ("DPX", 2048, 1556, 3))
+        self.check(b"DDS " + struct.pack("<IIII", 124, 0, 256, 512) + b"\0" * 100, ("DDS", 512, 256, None))
+        tga = bytes([0, 0, 2]) + b"\0" * 9 + struct.pack("<HHBB", 64, 32, 32, 8) + b"\0" * 100
+        self.check(tga, ("TARGA", 64, 32, 4), "image.tga")
+        self.check(tga, None)
+        self.check(b"garbage" * 10, None)
+        self.assertIsNone(image_info(os.path.join(tempfile.gettempdir(), "missing", "image.png")))
+    
+    def test_exr(self):
+        data = exr(exr_attribute(b"comments", b"string", b"x" * 10000),
+                   exr_attribute(b"channels", b"chlist", channels),
+                   exr_attribute(b"dataWindow", b"box2i", window))
+        self.check(data, ("OPEN_EXR", 1920, 1080, 4))
+    
+    def test_exr_negative_size(self):
+        for size in [-1, -100, -2 ** 31]:
+            data = exr(exr_attribute(b"comments", b"string", b"", size),
+                       exr_attribute(b"channels", b"chlist", channels),
+                       exr_attribute(b"dataWindow", b"box2i", window))
+            with self.subTest(size=size):
+                self.assertIsNone(self.parse_with_timeout(data))
+    
+    def test_exr_oversized(self):
+        data = exr(exr_attribute(b"comments", b"string", b"", 2 ** 31 - 1))
+        self.assertIsNone(self.parse_with_timeout(data))
+    
+    def test_exr_truncated(self):
+        data = exr(exr_attribute(b"channels", b"chlist", channels),
+                   exr_attribute(b"comments", b"string", b"x" * 10000),
+                   exr_attribute(b"dataWindow", b"box2i", window))
+        for length in [8, 20, 100, len(data) // 2, len(data) - 100]:
+            with self.subTest(length=length):
+                self.assertIsNone(self.parse_with_timeout(data[:length]))
@@ -0,0 +1,36 @@
+"""Tests that the modules of 'blib' which don't use Blender can be imported without bpy."""
+
+import subprocess
+import sys
+import unittest
+from os import path
+
+root = path.dirname(path.dirname(path.abspath(__file__)))
+
+script = """
+import sys
+sys.path.insert(0, {root!r})
+try:
+    import bpy
+except ImportError:
+    pass
+else:
+    raise SystemExit("bpy is available")
+
+import blib
+assert "bpy" not in sys.modules and "blib.manifest" not in sys.modules, sorted(sys.modules)
+import blib.manifest
+import blib.archive
+import blib.cycles.utils
+from blib import report, stats
+assert "bpy" not in sys.modules, "bpy was imported"
+assert "blib.cycles.bimport" not in sys.modules and "blib.cycles.bexport" not in sys.modules, sorted(sys.modules)
+""".format(root=root)
+
+class ImportTest(unittest.TestCase):
+    
+    def test_without_bpy(self):
+        #Isolated mode ignores PYTHONPATH, so the stand-in bpy of the tests is not found
+        result = subprocess.run([sys.executable, "-I", "-c", script], cwd=path.dirname(root),
+                                stdout=subprocess.PIPE, stderr=subprocess.STDOUT, universal_newlines=True)
+        self.assertEqual(result.returncode, 0, result.stdout)
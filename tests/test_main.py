@@ -0,0 +1,87 @@
+"""Tests of the exit status and JSON output of the 'python -m blib' commands."""
+
+import io
+import json
+import os
+import shutil
+import tempfile
+import unittest
+import zipfile as zf
+from contextlib import redirect_stdout
+
+from blib.__main__ import main
+
+class CommandLineTest(unittest.TestCase):
+    
+    def setUp(self):
+        self.directory = tempfile.mkdtemp()
+        self.valid = os.path.join(self.directory, "valid.blib")
+        archive = zf.ZipFile(self.valid, 'w', zf.ZIP_DEFLATED)
+        archive.writestr("images/a.png", b"image data" * 100)
+        archive.close()
+        self.invalid = os.path.join(self.directory, "invalid.blib")
+        with open(self.invalid, 'wb') as f:
+            f.write(b"not a zip file")
+        self.malformed = os.path.join(self.directory, "malformed.blib")
+        archive = zf.ZipFile(self.malformed, 'w', zf.ZIP_DEFLATED)
+        archive.writestr("structure.xml", b'<blib type="cycles" version="0.1.6" compatible="0.1.6">'
+                                          b'<resources><images><image /></images></resources></blib>')
+        archive.comment = b"0 cycles 0.1.6 0.1.6"
+        archive.close()
+        self.missing = os.path.join(self.directory, "missing.blib")
+    
+    def tearDown(self):
+        shutil.rmtree(self.directory)
+    
+    def run_command(self, *argv):
+        out = io.StringIO()
+        with redirect_stdout(out):
+            status = main(list(argv))
+        return status, json.loads(out.getvalue())
+    
+    def test_dedup_report(self):
+        status, report = self.run_command("dedup-report", self.valid)
+        self.assertEqual(status, 0)
+        self.assertEqual(report["errors"], [])
+        
+        status, report = self.run_command("dedup-report", self.valid, self.invalid)
+        self.assertEqual(status, 1)
+        self.assertEqual([error["path"] for error in report["errors"]], [self.invalid])
+        self.assertEqual(report["files"], 2)
+        self.assertGreater(report["stored_bytes"], 0)
+    
+    def test_invalid_files(self):
+        for command in ["inspect", "verify", "index"]:
+            with self.subTest(command=command):
+                status, data = self.run_command(command, self.invalid)
+                self.assertEqual(status, 1)
+                self.assertIn("error", json.dumps(data))
+    
+    def test_missing_files(self):
+        for command in ["inspect", "verify", "index", "dedup-report"]:
+            with self.subTest(command=command):
+                status, data = self.run_command(command, self.missing)
+                self.assertEqual(status, 1)
+                self.assertIn("error", json.dumps(data))
+        
+        status, data = self.run_command("index", self.valid, self.missing)
+        self.assertEqual([entry["path"] for entry in data["files"]], [self.valid, self.missing])
+        self.assertIn("error", data["files"][1])
+        self.assertNotIn("size", data["files"][1])
+    
+    def test_malformed_structure(self):
+        for command in ["inspect", "index"]:
+            with self.subTest(command=command):
+                status, data = self.run_command(command, self.malformed)
+                self.assertEqual(status, 1)
+                self.assertIn("error", json.dumps(data))
+    
+    def test_repack_errors(self):
+        destination = os.path.join(self.directory, "out.blib")
+        for source, args in [(self.missing, []), (self.invalid, []), (self.malformed, ["--prune"])]:
+            with self.subTest(source=source):
+                status, data = self.run_command("repack", *args + [source, destination])
+                self.assertEqual(status, 1)
+                self.assertEqual(data["source"], source)
+                self.assertIn("error", data)
+                self.assertFalse(os.path.exists(destination))
@@ -0,0 +1,47 @@
+"""Tests of the image metadata recorded on export and read by 'blib.manifest.read_manifest'."""
+
+import os
+import shutil
+import tempfile
+import unittest
+import zipfile as zf
+
+import bpy
+import synthetic
+from blib.cycles.bexport import bexport
+from blib.manifest import read_manifest
+
+class ImageMetadataTest(unittest.TestCase):
+    
+    def setUp(self):
+        self.directory = tempfile.mkdtemp()
+        bpy.reset()
+        mat = synthetic.make_material(self.directory, nodes=5, images=1, frames=6)
+        seq_dir = os.path.join(self.directory, "Synthetic_seq")
+        self.frame_sizes = [os.path.getsize(os.path.join(seq_dir, name)) for name in sorted(os.listdir(seq_dir))]
+        self.filepath = os.path.join(self.directory, "lib.blib")
+        bexport(mat, self.filepath)
+    
+    def tearDown(self):
+        shutil.rmtree(self.directory)
+    
+    def sequence(self, manifest):
+        return [image for image in manifest["images"] if image["source"] == 'SEQUENCE'][0]
+    
+    def test_archive(self):
+        image = self.sequence(read_manifest(self.filepath))
+        self.assertEqual(image["frames"], 6)
+        self.assertEqual(image["size"], sum(self.frame_sizes))
+        self.assertEqual((image["format"], image["width"], image["height"], image["channels"]), ("PNG", 8, 8, 3))
+    
+    def test_recorded_on_export(self):
+        xml_path = os.path.join(self.directory, "structure.xml")
+        with zf.ZipFile(self.filepath, 'r') as archive, open(xml_path, 'wb') as xml_file:
+            xml_file.write(archive.read("structure.xml"))
+        
+        manifest = read_manifest(xml_path)
+        image = self.sequence(manifest)
+        self.assertEqual(image["frames"], 6)
+        self.assertEqual(image["size"], sum(self.frame_sizes))
+        still = [image for image in manifest["images"] if image["source"] == 'FILE'][0]
+        self.assertEqual(still["size"], os.path.getsize(os.path.join(self.directory, "Synthetic_0.png")))
@@ -0,0 +1,111 @@
+"""Tests of 'blib.cycles.plan.PlanCache', the JSON encoding of plans, and the sequence frame windows."""
+
+import json
+import os
+import pickle
+import shutil
+import tempfile
+import unittest
+import zipfile as zf
+import xml.etree.ElementTree as ET
+
+import bpy
+import synthetic
+from blib.cycles.bexport import bexport
+from blib.cycles.plan import ImportPlan, PlanCache, compile_structure, decode_plan, encode_plan, frame_windows
+
+class PlanCacheTest(unittest.TestCase):
+    
+    def setUp(self):
+        self.directory = tempfile.mkdtemp()
+        self.cache_dir = os.path.join(self.directory, "plans")
+        bpy.reset()
+        mat = synthetic.make_material(self.directory, nodes=10, depth=2, images=2, frames=3)
+        filepath = os.path.join(self.directory, "lib.blib")
+        bexport(mat, filepath)
+        with zf.ZipFile(filepath, 'r') as archive:
+            self.plan = compile_structure(ET.fromstring(archive.read("structure.xml")))
+    
+    def tearDown(self):
+        shutil.rmtree(self.directory)
+    
+    def test_encoding_round_trip(self):
+        data = encode_plan(self.plan)
+        plan = decode_plan(json.loads(json.dumps(data)))
+        self.assertIsInstance(plan, ImportPlan)
+        self.assertEqual(encode_plan(plan), data)
+        self.assertEqual(plan.main.nodes[0].attributes.values, self.plan.main.nodes[0].attributes.values)
+        self.assertEqual(decode_plan(encode_plan({"a": ({1, 2}, (3.5, None))})), {"a": ({1, 2}, (3.5, None))})
+    
+    def test_disk_cache(self):
+        PlanCache(directory=self.cache_dir).set("abc", self.plan)
+        self.assertEqual([name[-5:] for name in os.listdir(self.cache_dir)], [".json"])
+        
+        plan = PlanCache(directory=self.cache_dir).get("abc")
+        self.assertIsInstance(plan, ImportPlan)
+        self.assertEqual(encode_plan(plan), encode_plan(self.plan))
+        self.assertIsNone(PlanCache(directory=self.cache_dir).get("other"))
+    
+    def test_invalid_files_are_ignored(self):
+        cache = PlanCache(directory=self.cache_dir)
+        cache.set("abc", self.plan)
+        fpath = os.path.join(self.cache_dir, os.listdir(self.cache_dir)[0])
+        
+        contents = [pickle.dumps(self.plan), b"{", b'{"plan": "PlanCache", "fields": {}}',
+                    b'{"plan": "ImportPlan", "fields": {"__class__": null}}', b"[1, 2]"]
+        for content in contents:
+            with open(fpath, 'wb') as f:
+                f.write(content)
+            with self.subTest(content=content[:40]):
+                self.assertIsNone(PlanCache(directory=self.cache_dir).get("abc"))
+
+def make_tree(*users):
+    xtree = ET.Element("main")
+    xnodes = ET.SubElement(xtree, "nodes")
+    for image, attrib in users:
+        xnode = ET.SubElement(xnodes, "node", {"bl_idname": "ShaderNodeTexImage", "name": image})
+        if image is not None:
+            xnode.set("blib_image", image)
+        ET.SubElement(xnode, "image_user", attrib)
+    return xtree
+
+class FrameWindowsTest(unittest.TestCase):
+    
+    def test_offset(self):
+        xtree = make_tree(("seq", {"frame_offset": "0", "frame_duration": "5"}),
+                          ("other", {"frame_offset": "10", "frame_duration": "3"}),
+                          ("before", {"frame_offset": "-4", "frame_duration": "2"}))
+        self.assertEqual(frame_windows([xtree]), {"seq": [1, 5], "other": [11, 13], "before": [-3, -2]})
+    
+    def test_cyclic(self):
+        #Cyclic sequences loop over the same frames, so the window doesn't extend
+        xtree = make_tree(("seq", {"frame_offset": "2", "frame_duration": "4", "use_cyclic": "True"}))
+        self.assertEqual(frame_windows([xtree]), {"seq": [3, 6]})
+    
+    def test_union(self):
+        xtree = make_tree(("seq", {"frame_offset": "4", "frame_duration": "2"}))
+        xgrp = make_tree(("seq", {"frame_offset": "0", "frame_duration": "2"}),
+                         ("seq", {"frame_offset": "8", "frame_duration": "1"}))
+        self.assertEqual(frame_windows([xtree, xgrp]), {"seq": [1, 9]})
+    
+    def test_unknown(self):
+        xtree = make_tree(("seq", {"frame_offset": "0", "frame_duration": "2"}), ("seq", {"frame_offset": "1"}),
+                          ("seq", {"frame_offset": "4", "frame_duration": "2"}),
+                          ("other", {"frame_offset": "x", "frame_duration": "2"}), (None, {}))
+        self.assertEqual(frame_windows([xtree, ET.Element("group")]), {"seq": None, "other": None})
+    
+    def test_exported(self):
+        directory = tempfile.mkdtemp()
+        try:
+            bpy.reset()
+            mat = synthetic.make_material(directory, nodes=2, images=0, frames=6)
+            tex = [node for node in mat.node_tree.nodes if node.bl_idname == "ShaderNodeTexImage"][0]
+            tex.image_user.frame_offset = 1
+            tex.image_user.frame_duration = 3
+            filepath = os.path.join(directory, "lib.blib")
+            bexport(mat, filepath)
+            with zf.ZipFile(filepath, 'r') as archive:
+                plan = compile_structure(ET.fromstring(archive.read("structure.xml")))
+            self.assertEqual(plan.windows, {tex.image.name: [2, 4]})
+        finally:
+            shutil.rmtree(directory)
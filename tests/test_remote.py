@@ -0,0 +1,140 @@
+"""Tests of 'blib.remote.RemoteFile' against a local HTTP server, with and without Range support."""
+
+import http.server
+import os
+import re
+import shutil
+import tempfile
+import threading
+import unittest
+import zipfile as zf
+
+import blib.remote as remote
+from blib.remote import RemoteFile, open_archive
+
+class Handler(http.server.BaseHTTPRequestHandler):
+    """Serves the files of 'root', honoring Range requests only if 'ranges' is set."""
+    
+    root = None
+    ranges = True
+    requests = []
+    
+    def log_message(self, *args):
+        pass
+    
+    def do_GET(self):
+        fpath = os.path.join(self.root, self.path.lstrip("/"))
+        if not os.path.isfile(fpath):
+            self.send_error(404)
+            return
+        with open(fpath, 'rb') as f:
+            data = f.read()
+        byte_range = self.headers.get("Range")
+        self.requests.append(byte_range)
+        match = re.match(r"bytes=(\d*)-(\d*)$", byte_range or "")
+        if self.ranges and match:
+            if match.group(1) == "":
+                start, end = max(0, len(data) - int(match.group(2))), len(data) - 1
+            else:
+                start = int(match.group(1))
+                end = min(int(match.group(2)), len(data) - 1) if match.group(2) else len(data) - 1
+            self.send_response(206)
+            self.send_header("Content-Range", "bytes {}-{}/{}".format(start, end, len(data)))
+            body = data[start:end + 1]
+        else:
+            self.send_response(200)
+            body = data
+        self.send_header("ETag", '"{}"'.format(len(data)))
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+class RemoteFileTest(unittest.TestCase):
+    
+    def setUp(self):
+        self.directory = tempfile.mkdtemp()
+        self.data = os.urandom(300000)
+        with open(os.path.join(self.directory, "file.bin"), 'wb') as f:
+            f.write(self.data)
+        self.entries = {"structure.xml": b"<blib/>", "images/a.png": os.urandom(100000), "texts/t.txt": b"text" * 1000}
+        archive = zf.ZipFile(os.path.join(self.directory, "lib.blib"), 'w', zf.ZIP_DEFLATED)
+        for name, data in self.entries.items():
+            archive.writestr(name, data)
+        archive.close()
+        
+        Handler.root = self.directory
+        Handler.ranges = True
+        Handler.requests = []
+        self.server = http.server.ThreadingHTTPServer(("127.0.0.1", 0), Handler)
+        self.thread = threading.Thread(target=self.server.serve_forever, args=(0.05,))
+        self.thread.start()
+        self.url = "http://127.0.0.1:{}/".format(self.server.server_address[1])
+        
+        self.settings = (remote.block_size, remote.max_memory, remote.cache_dir)
+        remote.block_size = 4096
+    
+    def tearDown(self):
+        remote.block_size, remote.max_memory, remote.cache_dir = self.settings
+        self.server.shutdown()
+        self.server.server_close()
+        self.thread.join()
+        shutil.rmtree(self.directory)
+    
+    def check_reads(self, rfile):
+        self.assertEqual(rfile.size, len(self.data))
+        for start, size in [(0, 10), (5000, 20000), (299990, 100), (4095, 2), (123456, 0)]:
+            rfile.seek(start)
+            self.assertEqual(rfile.read(size), self.data[start:start + size])
+        rfile.seek(0)
+        self.assertEqual(rfile.read(), self.data)
+    
+    def test_ranges(self):
+        rfile = RemoteFile(self.url + "file.bin")
+        rfile.seek(1000)
+        self.assertEqual(rfile.read(100), self.data[1000:1100])
+        self.assertLess(rfile.fetched, 3 * remote.block_size)
+        self.check_reads(rfile)
+        self.assertTrue(all(request.startswith("bytes=") for request in Handler.requests))
+    
+    def test_no_ranges(self):
+        Handler.ranges = False
+        rfile = RemoteFile(self.url + "file.bin")
+        self.check_reads(rfile)
+        self.assertEqual(rfile.requests, 1)
+    
+    def test_archive(self):
+        for ranges in [True, False]:
+            Handler.ranges = ranges
+            with self.subTest(ranges=ranges), open_archive(self.url + "lib.blib") as archive:
+                self.assertEqual(sorted(archive.namelist()), sorted(self.entries))
+                for name, data in self.entries.items():
+                    self.assertEqual(archive.read(name), data)
+                self.assertIsNone(archive.testzip())
+    
+    def test_memory_is_bounded(self):
+        remote.max_memory = 8 * remote.block_size
+        rfile = RemoteFile(self.url + "file.bin")
+        self.check_reads(rfile)
+        self.assertLessEqual(len(rfile._blocks), 8)
+        
+        #Evicted blocks are fetched again, or loaded from the cache directory if set
+        requests = rfile.requests
+        rfile.seek(0)
+        self.assertEqual(rfile.read(10), self.data[:10])
+        self.assertEqual(rfile.requests, requests + 1)
+        
+        remote.cache_dir = os.path.join(self.directory, "cache")
+        rfile = RemoteFile(self.url + "file.bin")
+        self.check_reads(rfile)
+        requests = rfile.requests
+        rfile.seek(0)
+        self.assertEqual(rfile.read(10), self.data[:10])
+        self.assertEqual(rfile.requests, requests)
+        self.assertLessEqual(len(rfile._blocks), 8)
+    
+    def test_memory_is_unbounded_without_ranges_or_cache(self):
+        Handler.ranges = False
+        remote.max_memory = 8 * remote.block_size
+        rfile = RemoteFile(self.url + "file.bin")
+        self.check_reads(rfile)
+        self.assertEqual(rfile.requests, 1)
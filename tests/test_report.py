@@ -0,0 +1,60 @@
+"""Tests of the failure reports returned by 'blib.cycles.bexport' and 'blib.cycles.bimport'."""
+
+import os
+import shutil
+import tempfile
+import unittest
+import zipfile as zf
+
+import bpy
+import synthetic
+from blib.cycles.bexport import bexport
+from blib.cycles.bimport import bimport
+from blib.cycles.session import ImportSession
+from blib.report import Report
+
+class ReturnedReportTest(unittest.TestCase):
+    
+    def setUp(self):
+        self.directory = tempfile.mkdtemp()
+        self.resources = os.path.join(self.directory, "resources")
+        bpy.reset()
+        self.mat = synthetic.make_material(self.directory, nodes=5, images=2)
+        self.filepath = os.path.join(self.directory, "lib.blib")
+    
+    def tearDown(self):
+        shutil.rmtree(self.directory)
+    
+    def drop_entry(self, name):
+        filepath = os.path.join(self.directory, "broken.blib")
+        with zf.ZipFile(self.filepath, 'r') as src, zf.ZipFile(filepath, 'w') as dst:
+            for info in src.infolist():
+                if info.filename != name:
+                    dst.writestr(info, src.read(info))
+            dst.comment = src.comment
+        return filepath
+    
+    def test_export(self):
+        self.assertIsNone(bexport(self.mat, self.filepath))
+        report = bexport(self.mat, self.filepath, return_report=True)
+        self.assertIsInstance(report, Report)
+        self.assertEqual(report.total, 0)
+        
+        own = Report()
+        self.assertIs(bexport(self.mat, self.filepath, report=own, return_report=True), own)
+    
+    def test_import(self):
+        bexport(self.mat, self.filepath)
+        broken = self.drop_entry("images/Synthetic_0.png")
+        
+        result = bimport(broken, resource_path=self.resources, skip_sha1=True)
+        self.assertIsInstance(result, bpy.types.Material)
+        
+        result, report = bimport(broken, resource_path=self.resources, skip_sha1=True, return_report=True)
+        self.assertIsInstance(result, bpy.types.Material)
+        self.assertEqual(report.counts, {"images": 1})
+        
+        with ImportSession(self.resources, skip_sha1=True) as session:
+            result, report = session.bimport(broken, return_report=True)
+            self.assertIs(report, session.report)
+            self.assertEqual(session.imported, [result])
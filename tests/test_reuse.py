@@ -0,0 +1,98 @@
+"""Tests of the reuse of the datablocks previously imported from the same archive by 'blib.cycles.bimport'."""
+
+import os
+import shutil
+import tempfile
+import unittest
+import zipfile as zf
+
+import bpy
+import synthetic
+from blib.cycles.bexport import bexport
+from blib.cycles.bimport import bimport, find_tagged, tag
+
+class TagTest(unittest.TestCase):
+    
+    def setUp(self):
+        bpy.reset()
+    
+    def test_find_tagged(self):
+        first = bpy.data.node_groups.new("First", "ShaderNodeTree")
+        second = bpy.data.node_groups.new("Second", "ShaderNodeTree")
+        bpy.data.node_groups.new("Untagged", "ShaderNodeTree")
+        tag(first, "a" * 40, "Group")
+        tag(second, "b" * 40, "Group", "blib_path")
+        
+        self.assertEqual(first["blib_checksum"], "a" * 40)
+        self.assertEqual(find_tagged(bpy.data.node_groups, "a" * 40), {"Group": first})
+        self.assertEqual(find_tagged(bpy.data.node_groups, "b" * 40), {})
+        self.assertEqual(find_tagged(bpy.data.node_groups, "b" * 40, "blib_path"), {"Group": second})
+        self.assertEqual(find_tagged(bpy.data.node_groups, None), {"Group": first})
+        self.assertEqual(find_tagged(bpy.data.node_groups, "c" * 40), {})
+
+class ReuseTest(unittest.TestCase):
+    
+    def setUp(self):
+        self.directory = tempfile.mkdtemp()
+        self.resources = os.path.join(self.directory, "resources")
+        bpy.reset()
+        mat = synthetic.make_material(self.directory, nodes=4, depth=2, images=2)
+        frame = mat.node_tree.nodes.new("NodeFrame")
+        frame.name = "Notes"
+        frame.text = bpy.data.texts.new("Notes")
+        frame.text.from_string("Internal notes\n")
+        self.filepath = os.path.join(self.directory, "lib.blib")
+        bexport(mat, self.filepath)
+        
+        #Same datablocks, in an archive with another checksum
+        mat.node_tree.nodes.new("ShaderNodeMath").name = "Extra"
+        self.other = os.path.join(self.directory, "other.blib")
+        bexport(mat, self.other)
+        bpy.reset()
+    
+    def tearDown(self):
+        shutil.rmtree(self.directory)
+    
+    def datablocks(self):
+        return set(bpy.data.node_groups), set(bpy.data.images), set(bpy.data.texts)
+    
+    def resources_of(self, mat):
+        nodes = mat.node_tree.nodes
+        groups = sorted((node.name, node.node_tree) for node in nodes if node.bl_idname == "ShaderNodeGroup")
+        images = sorted((node.name, node.image) for node in nodes if node.bl_idname == "ShaderNodeTexImage")
+        return groups, images, nodes["Notes"].text
+    
+    def test_same_checksum(self):
+        with zf.ZipFile(self.filepath, 'r') as archive:
+            checksum = archive.comment.decode("utf-8").split(" ")[0]
+        first = bimport(self.filepath, resource_path=self.resources, reuse=True)
+        datablocks = self.datablocks()
+        self.assertTrue(all(datablocks))
+        for datablock in set.union(*datablocks):
+            self.assertEqual(datablock["blib_checksum"], checksum)
+        
+        second = bimport(self.filepath, resource_path=self.resources, reuse=True)
+        self.assertIsNot(second, first)
+        self.assertEqual(self.datablocks(), datablocks)
+        self.assertEqual(self.resources_of(second), self.resources_of(first))
+    
+    def test_other_checksum(self):
+        first = bimport(self.filepath, resource_path=self.resources, reuse=True)
+        datablocks = self.datablocks()
+        second = bimport(self.other, resource_path=self.resources, reuse=True)
+        for old, new in zip(datablocks, self.datablocks()):
+            self.assertEqual(len(new), 2 * len(old))
+        groups, images, text = self.resources_of(second)
+        self.assertTrue(datablocks[0].isdisjoint(grp for name, grp in groups))
+        self.assertTrue(datablocks[1].isdisjoint(img for name, img in images))
+        self.assertNotIn(text, datablocks[2])
+    
+    def test_disabled(self):
+        for kwargs in [{}, {"reuse": True, "skip_sha1": True}]:
+            with self.subTest(**kwargs):
+                bpy.reset()
+                bimport(self.filepath, resource_path=self.resources, **kwargs)
+                datablocks = self.datablocks()
+                bimport(self.filepath, resource_path=self.resources, **kwargs)
+                for old, new in zip(datablocks, self.datablocks()):
+                    self.assertEqual(len(new), 2 * len(old))
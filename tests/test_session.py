@@ -0,0 +1,101 @@
+"""Tests of the resources shared by the imports of a 'blib.cycles.session.ImportSession'."""
+
+import os
+import shutil
+import tempfile
+import unittest
+
+import bpy
+import synthetic
+from blib.cycles.bexport import bexport
+from blib.cycles.bimport import bimport
+from blib.cycles.session import ImportSession
+
+class SessionTest(unittest.TestCase):
+    
+    def setUp(self):
+        self.directory = tempfile.mkdtemp()
+        self.resources = os.path.join(self.directory, "resources")
+        script = os.path.join(self.directory, "shader.osl")
+        with open(script, 'w', encoding="utf-8") as f:
+            f.write("shader noop() {}\n")
+        notes = os.path.join(self.directory, "notes.txt")
+        with open(notes, 'w', encoding="utf-8") as f:
+            f.write("External notes\n")
+        
+        self.filepaths = []
+        for name in ["First", "Second"]:
+            bpy.reset()
+            mat = synthetic.make_material(self.directory, name=name, nodes=2, images=2)
+            nodes = mat.node_tree.nodes
+            frame = nodes.new("NodeFrame")
+            frame.name = "Internal"
+            frame.text = bpy.data.texts.new(name + " notes")
+            frame.text.from_string("Internal notes\n")
+            frame = nodes.new("NodeFrame")
+            frame.name = "External"
+            frame.text = bpy.data.texts.load(notes)
+            node = nodes.new("ShaderNodeScript")
+            node.name = "Script"
+            node.mode = 'EXTERNAL'
+            node.filepath = script
+            filepath = os.path.join(self.directory, name + ".blib")
+            bexport(mat, filepath)
+            self.filepaths.append(filepath)
+        bpy.reset()
+    
+    def tearDown(self):
+        shutil.rmtree(self.directory)
+    
+    def resources_of(self, mat):
+        nodes = mat.node_tree.nodes
+        images = sorted(node.image.filepath for node in nodes if node.bl_idname == "ShaderNodeTexImage")
+        return images, nodes["External"].text, nodes["Script"].filepath
+    
+    def test_shared_resources(self):
+        sfv = os.path.join(self.resources, "images", "list.sfv")
+        with ImportSession(self.resources) as session:
+            first = session.bimport(self.filepaths[0])
+            hashes = session.hashes
+            second = session.bimport(self.filepaths[1])
+            self.assertIs(session.hashes, hashes)
+            self.assertFalse(os.path.exists(sfv)) #Only written when the session is closed
+        with open(sfv, 'r', encoding="utf-8") as f:
+            self.assertEqual(len(f.read().splitlines()), 2)
+        
+        self.assertEqual(self.resources_of(first), self.resources_of(second))
+        self.assertEqual(len(session.scripts), 1)
+        self.assertEqual(len(bpy.data.texts), 3) #Internal texts of each file, and the external text once
+        self.assertEqual(os.listdir(os.path.join(self.resources, "texts")), ["1"])
+        self.assertEqual(sorted(os.listdir(os.path.join(self.resources, "texts", "1"))), ["notes.txt", "shader.osl"])
+        self.assertEqual(sorted(os.listdir(os.path.join(self.resources, "images"))), ["1", "list.sfv"])
+    
+    def test_separate_imports(self):
+        first = bimport(self.filepaths[0], resource_path=self.resources)
+        second = bimport(self.filepaths[1], resource_path=self.resources)
+        self.assertNotEqual(self.resources_of(first)[1:], self.resources_of(second)[1:])
+        self.assertEqual(len(bpy.data.texts), 4)
+        self.assertEqual(sorted(os.listdir(os.path.join(self.resources, "texts"))), ["1", "2"])
+    
+    def test_name_clash(self):
+        with open(os.path.join(self.directory, "notes.txt"), 'w', encoding="utf-8") as f:
+            f.write("Other notes\n")
+        bpy.reset()
+        mat = synthetic.make_material(self.directory, name="Third", nodes=2, images=0)
+        frame = mat.node_tree.nodes.new("NodeFrame")
+        frame.name = "External"
+        frame.text = bpy.data.texts.load(os.path.join(self.directory, "notes.txt"))
+        filepath = os.path.join(self.directory, "Third.blib")
+        bexport(mat, filepath)
+        bpy.reset()
+        
+        with ImportSession(self.resources) as session:
+            first = session.bimport(self.filepaths[0])
+            third = session.bimport(filepath)
+        paths = [mat.node_tree.nodes["External"].text.filepath for mat in (first, third)]
+        self.assertEqual([os.path.basename(fpath) for fpath in paths], ["notes.txt", "notes.txt"])
+        self.assertNotEqual(paths[0], paths[1])
+        with open(paths[0], 'r', encoding="utf-8") as f:
+            self.assertEqual(f.read(), "External notes\n")
+        with open(paths[1], 'r', encoding="utf-8") as f:
+            self.assertEqual(f.read(), "Other notes\n")
@@ -0,0 +1,62 @@
+"""Tests of the byte counters and phases recorded in 'blib.stats.Stats' by exports and imports."""
+
+import os
+import shutil
+import tempfile
+import unittest
+import zipfile as zf
+
+import bpy
+import synthetic
+from blib.cache import ExportCache
+from blib.cycles.bexport import bexport
+from blib.cycles.bimport import bimport
+from blib.stats import Stats
+
+class ByteCountersTest(unittest.TestCase):
+    
+    def setUp(self):
+        self.directory = tempfile.mkdtemp()
+        bpy.reset()
+        self.mat = synthetic.make_material(self.directory, nodes=5, images=2)
+        self.filepath = os.path.join(self.directory, "lib.blib")
+    
+    def tearDown(self):
+        shutil.rmtree(self.directory)
+    
+    def test_export(self):
+        stats = Stats()
+        bexport(self.mat, self.filepath, stats=stats)
+        with zf.ZipFile(self.filepath, 'r') as archive:
+            stored = [info for info in archive.infolist() if not (info.file_size == 0 and info.comment)]
+            self.assertEqual(stats.counters["bytes_stored"], sum(info.file_size for info in stored))
+            self.assertEqual(stats.counters["bytes_written"], sum(info.compress_size for info in stored))
+        sizes = [os.path.getsize(os.path.join(self.directory, "Synthetic_{}.png".format(i))) for i in range(2)]
+        self.assertEqual(stats.counters["bytes_read"], 2 * sum(sizes)) #Read once to hash, once to compress
+        self.assertTrue({"hash", "compress", "write"} <= set(stats.phases))
+    
+    def test_cached_export(self):
+        cache = ExportCache()
+        stats = Stats()
+        bexport(self.mat, self.filepath, cache=cache, stats=stats)
+        sizes = [os.path.getsize(os.path.join(self.directory, "Synthetic_{}.png".format(i))) for i in range(2)]
+        self.assertEqual(stats.counters["bytes_read"], sum(sizes))
+        self.assertTrue({"hash", "compress", "write"} <= set(stats.phases))
+        
+        #Unchanged resources are not read again
+        os.remove(self.filepath)
+        stats = Stats()
+        bexport(self.mat, self.filepath, cache=cache, stats=stats)
+        self.assertNotIn("bytes_read", stats.counters)
+        self.assertNotIn("compress", stats.phases)
+    
+    def test_import(self):
+        bexport(self.mat, self.filepath)
+        stats = Stats()
+        bimport(self.filepath, resource_path=os.path.join(self.directory, "resources"), stats=stats)
+        with zf.ZipFile(self.filepath, 'r') as archive:
+            images = [archive.getinfo("images/Synthetic_{}.png".format(i)) for i in range(2)]
+        self.assertEqual(stats.counters["bytes_read"], sum(info.compress_size for info in images))
+        self.assertEqual(stats.counters["bytes_written"], sum(info.file_size for info in images))
+        self.assertNotIn("bytes_stored", stats.counters)
+        self.assertTrue({"groups", "material", "links"} <= set(stats.phases))